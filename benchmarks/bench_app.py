@@ -0,0 +1,119 @@
+"""End-to-end rerun latency of the app, driven through Streamlit's AppTest.
+
+Synthetic records of increasing size and sample count are pasted into the
+text area. For each case, the script run after pasting (empty render cache),
+a rerun with the same input (warm cache) and the peak Python heap during the
+first run are measured and checked against the budgets in app_budgets.json.
+
+Run with: PYTHONPATH=src python benchmarks/bench_app.py
+Exits with status 1 if any budget is exceeded.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import synthetic
+
+APP_PATH = os.path.join(os.path.dirname(__file__), "..", "src", "app.py")
+DEFAULT_BUDGETS = os.path.join(os.path.dirname(__file__), "app_budgets.json")
+
+CASES = {
+    "1 sample, 10 obs": {"num_samples": 1, "num_observations": 10},
+    "2 samples, 100 obs": {"num_samples": 2, "num_observations": 100},
+    "2 samples, 1000 obs": {"num_samples": 2, "num_observations": 1000},
+    "2 samples, 10000 obs": {"num_samples": 2, "num_observations": 10000},
+    "4 samples, 100 obs": {"num_samples": 4, "num_observations": 100},
+    "8 samples, 100 obs": {"num_samples": 8, "num_observations": 100},
+    "100 records": {"num_records": 100},
+    "1000 records": {"num_records": 1000},
+}
+
+
+def paste(text, timeout):
+    """Start the app and paste text, return the AppTest and the run time in seconds"""
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    at.run()
+    at.text_area[0].input(text)
+    start = time.perf_counter()
+    at.run()
+    return at, time.perf_counter() - start
+
+
+def check_errors(at):
+    errors = [e.value for e in at.error] + [e.message for e in at.exception]
+    if errors:
+        raise RuntimeError(f"App failed: {errors}")
+
+
+def measure(text, timeout):
+    st.cache_resource.clear()
+    at, first = paste(text, timeout)
+    check_errors(at)
+
+    start = time.perf_counter()
+    at.run()
+    rerun = time.perf_counter() - start
+    check_errors(at)
+
+    # Separate run, as tracing allocations slows everything down
+    st.cache_resource.clear()
+    tracemalloc.start()
+    try:
+        paste(text, timeout)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"first_ms": first * 1e3, "rerun_ms": rerun * 1e3, "peak_mb": peak / 1024**2}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--budgets", default=DEFAULT_BUDGETS)
+    parser.add_argument("--case", choices=list(CASES), action="append")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--save", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    with open(args.budgets) as f:
+        budgets = json.load(f)
+
+    # Load the lazily imported libraries first, their cost is tracked by
+    # bench_import.py
+    paste(synthetic.vcf_text(header=False), args.timeout)
+
+    results = {}
+    exceeded = []
+    print(f"{'case':<24} {'first [ms]':>11} {'rerun [ms]':>11} {'peak [MB]':>10}")
+    for name in args.case or list(CASES):
+        text = synthetic.vcf_text(header=False, **CASES[name])
+        results[name] = result = measure(text, args.timeout)
+
+        line = (
+            f"{name:<24} {result['first_ms']:>11.1f} {result['rerun_ms']:>11.1f} "
+            f"{result['peak_mb']:>10.1f}"
+        )
+        for metric, budget in budgets.get(name, {}).items():
+            if result[metric] > budget:
+                exceeded.append(f"{name}: {metric} {result[metric]:.1f} > {budget}")
+        print(line)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if exceeded:
+        print("\nBudgets exceeded:")
+        print("\n".join(exceeded))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
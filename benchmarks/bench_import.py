@@ -0,0 +1,87 @@
+"""Cold-start import cost of the app, measured with python -X importtime.
+
+Each module is imported in a fresh interpreter. Reports the cumulative import
+time, the heaviest top-level packages and whether pandas, altair and pysam
+were (wrongly) loaded before a record was submitted.
+
+Run with: PYTHONPATH=src python benchmarks/bench_import.py [--budget-ms 600]
+"""
+
+import argparse
+import collections
+import os
+import re
+import subprocess
+import sys
+
+DEFAULT_MODULES = ["streamlit", "varlociraptor_inspect.views.main"]
+
+# Only needed once a record has been submitted
+DEFERRED = ["pandas", "altair", "pysam"]
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_times(module):
+    """Parse -X importtime output of importing module in a fresh interpreter.
+
+    Returns (self, cumulative, depth, name) tuples with times in microseconds.
+    """
+    env = dict(os.environ)
+    src = os.path.join(os.path.dirname(__file__), "..", "src")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [src, env.get("PYTHONPATH")]))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    return [
+        (int(own), int(cumulative), len(indent) // 2, name)
+        for own, cumulative, indent, name in IMPORTTIME_LINE.findall(result.stderr)
+    ]
+
+
+def summarize(times):
+    """Total import time and cumulative time per top-level package (in ms)"""
+    total = sum(cumulative for _, cumulative, depth, _ in times if depth == 0)
+    packages = collections.Counter()
+    for own, _, _, name in times:
+        packages[name.split(".")[0]] += own
+    return total / 1e3, {name: us / 1e3 for name, us in packages.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=5, help="Keep the fastest run")
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        help="Fail if importing the last module takes longer",
+    )
+    args = parser.parse_args()
+
+    for module in args.modules:
+        runs = [import_times(module) for _ in range(args.repeat)]
+        times = min(runs, key=lambda run: summarize(run)[0])
+        total, packages = summarize(times)
+        loaded = {name.split(".")[0] for _, _, _, name in times}
+
+        print(f"{module}: {total:.1f} ms")
+        for name, ms in sorted(packages.items(), key=lambda item: -item[1])[: args.top]:
+            print(f"  {name:<32} {ms:>8.1f} ms")
+        eager = [name for name in DEFERRED if name in loaded]
+        if eager:
+            print(f"  loaded eagerly: {', '.join(eager)}")
+        print()
+
+    if args.budget_ms is not None and total > args.budget_ms:
+        print(f"{args.modules[-1]} takes {total:.1f} ms > {args.budget_ms} ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""Micro-benchmarks of the parsing and plotting stages on synthetic records.
+
+Each record dimension (samples, OBS length, AFD grid density, PROB_ events) is
+swept on its own while the others keep their defaults.
+
+Run with: PYTHONPATH=src python benchmarks/bench_micro.py [--save results.json]
+Compare against an earlier run with --compare results.json.
+"""
+
+import argparse
+import datetime
+import json
+import platform
+import random
+import sys
+import tempfile
+import timeit
+
+import altair as alt
+import numpy as np
+import pysam
+
+import synthetic
+from varlociraptor_inspect import parsing, plotting, specs, vcfrecord
+
+DEFAULTS = {"samples": 2, "observations": 50, "afd_points": 50, "events": 4}
+
+SWEEPS = {
+    "samples": [1, 2, 4, 8, 16],
+    "observations": [10, 100, 1000, 10000],
+    "afd_points": [10, 100, 1000],
+    "events": [2, 4, 16, 64],
+}
+
+# Slowdowns smaller than this are timer noise, not regressions
+NOISE_FLOOR_MS = 0.02
+
+
+def best_of(func, repeat, min_time=0.05):
+    """Best time of func in seconds, calling it often enough to run min_time"""
+    elapsed = timeit.timeit(func, number=1)
+    number = max(1, int(min_time / max(elapsed, 1e-9)))
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def stages(config):
+    """Name and function of each benchmarked stage for a record configuration"""
+    rng = random.Random(42)
+    data_line = synthetic.record_line(
+        rng,
+        config["samples"],
+        config["observations"],
+        config["afd_points"],
+        config["events"],
+    )
+    # Pasted records are often space-separated
+    pasted = data_line.replace("\t", "  ")
+    header_text = "\n".join(synthetic.header_lines(config["samples"], config["events"]))
+    events = synthetic.event_names(config["events"])
+    num_columns = len(data_line.split("\t"))
+
+    record = parsing.parse_record(header_text, data_line)
+    sample = next(iter(record.samples.keys()), None)
+
+    def parse_cold():
+        vcfrecord.header_fields.cache_clear()
+        return parsing.parse_record(header_text, data_line)
+
+    def parse_pysam():
+        with tempfile.NamedTemporaryFile("w", suffix=".vcf") as tmp:
+            tmp.write(header_text + "\n" + data_line + "\n")
+            tmp.flush()
+            with pysam.VariantFile(tmp.name) as vcf:
+                return next(vcf)
+
+    result = {
+        "normalize_whitespace": lambda: parsing.normalize_whitespace(pasted),
+        "synthesize_header": lambda: parsing.synthesize_header(
+            {"chr1": 1000}, events, num_columns
+        ),
+        "scan_vcf_text": lambda: parsing.scan_vcf_text(data_line),
+        "parse_record (cold header)": parse_cold,
+        "parse_record (cached header)": lambda: parsing.parse_record(
+            header_text, data_line
+        ),
+        "pysam parse (tempfile)": parse_pysam,
+        "visualize_event_probabilities": lambda: plotting.visualize_event_probabilities(
+            record
+        ),
+        "specs.event_probabilities": lambda: specs.event_probabilities(record),
+    }
+    if sample is not None:
+        result.update(
+            {
+                "visualize_allele_frequency_distribution": lambda: (
+                    plotting.visualize_allele_frequency_distribution(record, sample)
+                ),
+                "visualize_observations": lambda: plotting.visualize_observations(
+                    record, sample
+                ),
+                "specs.allele_frequency_distribution": lambda: (
+                    specs.allele_frequency_distribution(record, sample)
+                ),
+                "specs.observations": lambda: specs.observations(record, sample),
+            }
+        )
+    return result
+
+
+def run(dimensions, repeat):
+    results = []
+    for dimension in dimensions:
+        for value in SWEEPS[dimension]:
+            config = {**DEFAULTS, dimension: value}
+            for stage, func in stages(config).items():
+                results.append(
+                    {
+                        "dimension": dimension,
+                        "value": value,
+                        "stage": stage,
+                        "ms": best_of(func, repeat) * 1e3,
+                    }
+                )
+    return results
+
+
+def print_results(results, baseline=None, threshold=1.25):
+    """Print result tables, with the ratio to the baseline if given.
+
+    Returns the number of stages slower than threshold times the baseline.
+    """
+    baseline_ms = {
+        (r["dimension"], r["value"], r["stage"]): r["ms"]
+        for r in (baseline or {}).get("results", [])
+    }
+    regressions = 0
+    dimension = None
+
+    for result in results:
+        if result["dimension"] != dimension:
+            dimension = result["dimension"]
+            print()
+            print(f"{dimension:>12} {'stage':<42} {'time [ms]':>10}", end="")
+            print(f" {'baseline':>10} {'ratio':>7}" if baseline else "")
+
+        line = f"{result['value']:>12} {result['stage']:<42} {result['ms']:>10.3f}"
+        previous = baseline_ms.get((dimension, result["value"], result["stage"]))
+        if previous:
+            ratio = result["ms"] / previous
+            line += f" {previous:>10.3f} {ratio:>6.2f}x"
+            if ratio > threshold and result["ms"] - previous > NOISE_FLOOR_MS:
+                line += "  REGRESSION"
+                regressions += 1
+        print(line)
+
+    return regressions
+
+
+def environment():
+    return {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "numpy": np.__version__,
+        "pysam": pysam.__version__,
+        "altair": alt.__version__,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--dimension",
+        choices=list(SWEEPS),
+        action="append",
+        help="Only sweep this dimension (repeatable)",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of an earlier run")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="Slowdown against --compare reported as regression",
+    )
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = run(args.dimension or list(SWEEPS), args.repeat)
+    regressions = print_results(results, baseline, args.threshold)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(
+                {
+                    "environment": environment(),
+                    "defaults": DEFAULTS,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+    if regressions:
+        print(f"\n{regressions} stage(s) slower than {args.threshold}x the baseline")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Benchmark the columnar OBS decoder against the former per-match regex path.
+
+Run with: PYTHONPATH=src python benchmarks/bench_obs.py
+"""
+
+import random
+import re
+import timeit
+
+import numpy as np
+import pandas as pd
+
+import synthetic
+from varlociraptor_inspect.obs import decode_obs, decode_obs_batch, obs_labels
+
+METRICS = {
+    "Posterior Odds": "odds",
+    "MAPQ": "mapq",
+    "Strand": "strand",
+    "Read Position": "read_position",
+    "Orientation": "orientation",
+    "Softclip": "softclip",
+    "Indel": "indel",
+    "Edit Distance": "edit_distance",
+}
+
+
+def regex_observations(obs_string):
+    """Former decoding: regex matches -> dict per observation"""
+    pattern = r"(\d+)([a-zA-Z]{2})(.)(.)(.)(.)(.)(.)(.)(.)"
+    strand_map = {"+": "Forward strand", "-": "Reverse strand", "*": "Both strands"}
+    read_pos_map = {
+        "^": "Most common position",
+        "*": "Other position",
+        ".": "Irrelevant position",
+    }
+    orientation_map = {
+        ">": "F1R2 orientation",
+        "<": "F2R1 orientation",
+        "*": "Unknown orientation",
+        "!": "Non-standard orientation",
+    }
+    softclip_map = {"$": "Soft clipped", ".": "No soft clipping"}
+    indel_map = {"*": "Contains indel", ".": "No indel"}
+
+    observations = []
+    for idx, match in enumerate(re.findall(pattern, obs_string)):
+        kass = match[1][1]
+        kr_names = {
+            "N": "None",
+            "E": "Equal",
+            "B": "Barely",
+            "P": "Positive",
+            "S": "Strong",
+            "V": "Very Strong",
+            "n": "None",
+            "e": "Equal",
+            "b": "Barely",
+            "p": "Positive",
+            "s": "Strong",
+            "v": "Very Strong",
+        }
+        edit_distance_char = match[2]
+        observations.append(
+            {
+                "obs_index": idx,
+                "count": int(match[0]),
+                "Allele": "ALT" if match[1][0].upper() == "A" else "REF",
+                "Posterior Odds": kr_names.get(kass, kass.upper()),
+                "MAPQ": "High MAPQ" if kass.isupper() else "Low MAPQ",
+                "Strand": strand_map.get(match[5], match[5]),
+                "Read Position": read_pos_map.get(match[7], match[7]),
+                "Orientation": orientation_map.get(match[6], match[6]),
+                "Softclip": softclip_map.get(match[8], match[8]),
+                "Indel": indel_map.get(match[9], match[9]),
+                "Edit Distance": int(edit_distance_char)
+                if edit_distance_char.isdigit()
+                else 0,
+            }
+        )
+    return observations
+
+
+def regex_rows(obs_string):
+    """Former path: dict per observation -> dict per metric -> DataFrame"""
+    rows = [
+        {
+            "Metric": metric,
+            "Category": str(obs[metric]),
+            "Count": obs["count"],
+            "obs_index": obs["obs_index"],
+        }
+        for obs in regex_observations(obs_string)
+        for metric in METRICS
+    ]
+    return pd.DataFrame(rows)
+
+
+def columnar_rows(obs_string):
+    """Current path: columnar decoding -> column-wise DataFrame"""
+    decoded = decode_obs(obs_string)
+    categories = np.column_stack(
+        [obs_labels(decoded, column) for column in METRICS.values()]
+    )
+    n = len(decoded["count"])
+    return pd.DataFrame(
+        {
+            "Metric": np.tile(list(METRICS), n),
+            "Category": categories.ravel(),
+            "Count": np.repeat(decoded["count"], len(METRICS)),
+            "obs_index": np.repeat(np.arange(n), len(METRICS)),
+        }
+    )
+
+
+def best_of(func, number, repeat=5):
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def main():
+    rng = random.Random(42)
+
+    print("Single OBS string -> panel rows")
+    print(
+        f"{'observations':>12} {'regex [ms]':>12} {'columnar [ms]':>14} {'speedup':>8}"
+    )
+    for num_observations in [10, 100, 1000, 10000]:
+        obs_string = synthetic.obs_string(rng, num_observations)
+        number = max(1, 2000 // num_observations)
+        regex_time = best_of(lambda: regex_rows(obs_string), number)
+        columnar_time = best_of(lambda: columnar_rows(obs_string), number)
+        print(
+            f"{num_observations:>12} {regex_time * 1e3:>12.3f} "
+            f"{columnar_time * 1e3:>14.3f} {regex_time / columnar_time:>7.1f}x"
+        )
+
+    print()
+    print("Batch decoding (1000 strings x 50 observations)")
+    obs_strings = [synthetic.obs_string(rng, 50) for _ in range(1000)]
+    regex_time = best_of(
+        lambda: [regex_observations(s) for s in obs_strings], 1, repeat=3
+    )
+    batch_time = best_of(lambda: decode_obs_batch(obs_strings), 1, repeat=3)
+    print(
+        f"regex {regex_time * 1e3:.1f} ms, batch {batch_time * 1e3:.1f} ms, "
+        f"speedup {regex_time / batch_time:.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Generator of realistic synthetic Varlociraptor records for benchmarks."""
+
+import math
+import random
+
+from varlociraptor_inspect.parsing import FORMAT_HEADER_LINES, VCF_COLUMNS
+
+EVENT_NAMES = [
+    "SOMATIC_TUMOR_HIGH",
+    "SOMATIC_TUMOR_LOW",
+    "SOMATIC_NORMAL",
+    "GERMLINE",
+    "ABSENT",
+    "ARTIFACT",
+]
+
+
+def event_names(num_events):
+    """num_events PROB_* event names (common Varlociraptor events first)"""
+    extra = [f"EVENT{i}" for i in range(max(0, num_events - len(EVENT_NAMES)))]
+    return (EVENT_NAMES + extra)[:num_events]
+
+
+def obs_string(rng, num_observations):
+    """Random OBS string with num_observations entries"""
+    return "".join(
+        str(rng.randint(1, 40))
+        + rng.choice("rRaA")
+        + rng.choice("NEBPSVnebpsv")
+        + rng.choice(".0123")
+        + ".."
+        + rng.choice("+-*")
+        + rng.choice("><*!")
+        + rng.choice("^*.")
+        + rng.choice("$.")
+        + rng.choice("*.")
+        for _ in range(num_observations)
+    )
+
+
+def afd_string(rng, allele_frequency, num_points):
+    """AFD string over a grid of num_points frequencies, peaking at allele_frequency"""
+    points = []
+    for i in range(num_points):
+        freq = i / max(1, num_points - 1)
+        phred = 200 * (freq - allele_frequency) ** 2 + rng.uniform(0, 0.5)
+        points.append(f"{freq:g}={phred:.2f}")
+    return ",".join(points)
+
+
+def prob_field(rng, events):
+    """INFO field with PHRED scaled probabilities of events summing to one"""
+    weights = [rng.expovariate(1) ** 4 for _ in events]
+    total = sum(weights)
+    fields = []
+    for event, weight in zip(events, weights):
+        prob = weight / total
+        phred = "inf" if prob == 0 else f"{-10 * math.log10(prob):.3g}"
+        fields.append(f"PROB_{event}={phred}")
+    return ";".join(fields)
+
+
+def sample_field(rng, num_observations, afd_points):
+    allele_frequency = rng.random()
+    depth = num_observations * 2
+    return ":".join(
+        [
+            f"{allele_frequency:.3f}",
+            afd_string(rng, allele_frequency, afd_points),
+            obs_string(rng, num_observations),
+            str(depth),
+        ]
+    )
+
+
+def record_line(
+    rng,
+    num_samples=2,
+    num_observations=50,
+    afd_points=50,
+    num_events=4,
+    chrom="chr1",
+    pos=1000,
+):
+    """Tab-separated Varlociraptor data line"""
+    ref, alt = rng.sample("ACGT", 2)
+    fields = [
+        chrom,
+        str(pos),
+        ".",
+        ref,
+        alt,
+        ".",
+        ".",
+        prob_field(rng, event_names(num_events)),
+    ]
+    if num_samples:
+        fields.append("AF:AFD:OBS:DP")
+        fields.extend(
+            sample_field(rng, num_observations, afd_points) for _ in range(num_samples)
+        )
+    return "\t".join(fields)
+
+
+def header_lines(num_samples=2, num_events=4, contigs=(("chr1", 100_000_000),)):
+    """Full VCF header matching the records of record_line"""
+    lines = ["##fileformat=VCFv4.2"]
+    lines.extend(f"##contig=<ID={chrom},length={length}>" for chrom, length in contigs)
+    lines.extend(
+        f"##INFO=<ID=PROB_{event},Number=.,Type=Float>"
+        for event in event_names(num_events)
+    )
+    lines.extend(FORMAT_HEADER_LINES)
+    columns = list(VCF_COLUMNS)
+    if num_samples:
+        columns.extend(["FORMAT", *(f"sample{i + 1}" for i in range(num_samples))])
+    lines.append("\t".join(columns))
+    return lines
+
+
+def vcf_text(
+    num_records=1,
+    num_samples=2,
+    num_observations=50,
+    afd_points=50,
+    num_events=4,
+    header=True,
+    seed=42,
+):
+    """Synthetic VCF text with num_records records, with or without a header"""
+    rng = random.Random(seed)
+    lines = header_lines(num_samples, num_events) if header else []
+    lines.extend(
+        record_line(
+            rng,
+            num_samples,
+            num_observations,
+            afd_points,
+            num_events,
+            pos=1000 + 100 * i,
+        )
+        for i in range(num_records)
+    )
+    return "\n".join(lines) + "\n"
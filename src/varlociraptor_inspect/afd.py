@@ -0,0 +1,103 @@
+import re
+from typing import Sequence
+
+import numpy as np
+
+from varlociraptor_inspect.phred import phred_to_probs
+
+# A comma separated FREQ=PHRED point (points with more than one "=" are malformed)
+AFD_POINT_PATTERN = re.compile(r"(?<![^,])([^,=]*)=([^,=]*)(?![^,])")
+
+# AFD strings in which every point is well-formed
+_WELL_FORMED_AFD = re.compile(r"[^,=]*=[^,=]*(?:,[^,=]*=[^,=]*)*")
+
+
+def _afd_tokens(afd_string):
+    """Alternating FREQ and PHRED strings of the well-formed points of an AFD string"""
+    if _WELL_FORMED_AFD.fullmatch(afd_string):
+        return afd_string.replace("=", ",").split(",")
+    return [token for point in AFD_POINT_PATTERN.findall(afd_string) for token in point]
+
+
+def afd_strings(afd):
+    """Normalize the AFD value of a sample (None, string or sequence) to strings"""
+    if afd is None:
+        return []
+    if isinstance(afd, str) or not isinstance(afd, Sequence):
+        afd = [afd]
+    return [entry for entry in afd if isinstance(entry, str)]
+
+
+def _to_floats(tokens):
+    """Convert strings to floats, returning the values and a validity mask"""
+    try:
+        floats = np.fromiter(map(float, tokens), dtype=np.float64, count=len(tokens))
+        return floats, np.ones(len(tokens), dtype=bool)
+    except ValueError:
+        floats = np.full(len(tokens), np.nan)
+        valid = np.zeros(len(tokens), dtype=bool)
+        for i, token in enumerate(tokens):
+            try:
+                floats[i] = float(token)
+                valid[i] = True
+            except ValueError:
+                continue
+        return floats, valid
+
+
+def decode_afd_batch(afd_values):
+    """Decode the AFD values of many samples into NumPy arrays.
+
+    Returns a dict of equally long arrays with one entry per distribution
+    point: "index" (position of the AFD value in afd_values), "freq",
+    "phred" and "prob". Malformed points are skipped.
+    """
+    tokens = []
+    lengths = []
+
+    for afd in afd_values:
+        afd_tokens = _afd_tokens(",".join(afd_strings(afd)))
+        lengths.append(len(afd_tokens) // 2)
+        tokens.extend(afd_tokens)
+
+    index = np.repeat(np.arange(len(lengths)), lengths)
+    values, valid = _to_floats(tokens)
+    freq = values[0::2]
+    phred = values[1::2]
+    valid = valid[0::2] & valid[1::2]
+
+    return {
+        "index": index[valid],
+        "freq": freq[valid],
+        "phred": phred[valid],
+        "prob": phred_to_probs(phred[valid]),
+    }
+
+
+def decode_afd(afd):
+    """Decode the AFD value of a single sample (see decode_afd_batch)"""
+    return decode_afd_batch([afd])
+
+
+def ml_estimates(columns, num_values):
+    """Position of the maximum likelihood point of each decoded AFD value.
+
+    Returns an array with one entry per AFD value passed to
+    decode_afd_batch; values without any valid point get -1. Ties resolve
+    to the first point, as with np.argmax.
+    """
+    ml = np.full(num_values, -1, dtype=np.int64)
+    index = columns["index"]
+    if len(index) == 0:
+        return ml
+
+    # Points are grouped by value, so each group maximum is a reduceat
+    starts = np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+    group_max = np.maximum.reduceat(columns["prob"], starts)
+    lengths = np.diff(np.r_[starts, len(index)])
+    candidates = np.flatnonzero(columns["prob"] == np.repeat(group_max, lengths))
+
+    groups = index[candidates]
+    first = candidates[np.r_[True, groups[1:] != groups[:-1]]]
+    ml[index[first]] = first
+    return ml
@@ -0,0 +1,387 @@
+"""Headless batch rendering of Varlociraptor records to static HTML or Vega-Lite JSON.
+
+Usage: python -m varlociraptor_inspect.batch calls.bcf -o reports/
+
+With --sharded (or --shard-size), an indexed file is split into contig (or
+fixed-size region) shards that each worker reads through its own file handle.
+With --shard i/N, only the i-th of N slices of the records is rendered (e.g.
+by one task of a cluster array job). Each run writes a manifest of its files
+and a summary of its records, which varlociraptor_inspect.report merges into
+one report index.
+"""
+
+import argparse
+import collections
+import html
+import itertools
+import json
+import operator
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import altair as alt
+import pysam
+
+from varlociraptor_inspect import parsing, specs
+from varlociraptor_inspect.filters import compile_filter, filter_records
+from varlociraptor_inspect.shards import make_shards, map_shards, shard_records
+from varlociraptor_inspect.summary import Summary
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+  <meta charset="UTF-8">
+  <title>{title}</title>
+  <script src="https://cdn.jsdelivr.net/npm/vega@{vega_version}"></script>
+  <script src="https://cdn.jsdelivr.net/npm/vega-lite@{vegalite_version}"></script>
+  <script src="https://cdn.jsdelivr.net/npm/vega-embed@{vegaembed_version}"></script>
+</head>
+<body>
+  <h1>{title}</h1>
+{sections}
+  <script>
+    const specs = {specs};
+    for (const [id, spec] of Object.entries(specs)) {{
+      vegaEmbed("#" + id, spec);
+    }}
+  </script>
+</body>
+</html>
+"""
+
+# Per-process state set up by _init_worker
+_worker = {}
+
+
+def record_charts(record, validate=False):
+    """Vega-Lite specs of all charts of a record (AFD specs may be None)"""
+    return {
+        "events": specs.event_probabilities(record, validate),
+        "samples": {
+            sample_name: {
+                "afd": specs.allele_frequency_distribution(
+                    record, sample_name, validate
+                ),
+                "obs": specs.observations(record, sample_name, validate),
+            }
+            for sample_name in record.samples.keys()
+        },
+    }
+
+
+def record_title(record):
+    return f"{record.chrom}:{record.pos} {record.ref}>{','.join(record.alts or ['.'])}"
+
+
+def render_html(title, charts):
+    """Standalone HTML page embedding all charts of a record"""
+    sections = ['  <h2>Event Probabilities</h2>\n  <div id="events"></div>']
+    specs = {"events": charts["events"]}
+
+    for idx, (sample_name, sample_charts) in enumerate(charts["samples"].items(), 1):
+        sections.append(f"  <h2>Sample {idx}: {html.escape(sample_name)}</h2>")
+        if sample_charts["afd"] is None:
+            sections.append("  <p>AF field is missing or invalid.</p>")
+        else:
+            sections.append(f'  <div id="afd{idx}"></div>')
+            specs[f"afd{idx}"] = sample_charts["afd"]
+        sections.append(f'  <div id="obs{idx}"></div>')
+        specs[f"obs{idx}"] = sample_charts["obs"]
+
+    return HTML_TEMPLATE.format(
+        title=html.escape(title),
+        sections="\n".join(sections),
+        specs=json.dumps(specs),
+        vega_version=alt.VEGA_VERSION,
+        vegalite_version=alt.VEGALITE_VERSION,
+        vegaembed_version=alt.VEGAEMBED_VERSION,
+    )
+
+
+def output_name(index, record, output_format, shard=None):
+    """File name of a rendered record, unique by its index in the input (or shard)"""
+    chrom = re.sub(r"[^\w.-]", "_", record.chrom)
+    prefix = f"{index:08d}" if shard is None else f"{shard:05d}_{index:08d}"
+    return f"{prefix}_{chrom}_{record.pos}.{output_format}"
+
+
+def manifest_name(shard=None):
+    """Manifest file name of a run rendering all records (or slice i of N)"""
+    if shard is None:
+        return "manifest.json"
+    return f"manifest-{shard[0]}-of-{shard[1]}.json"
+
+
+def write_record(record, path, output_format, validate):
+    charts = record_charts(record, validate)
+
+    if output_format == "html":
+        content = render_html(record_title(record), charts)
+    else:
+        content = json.dumps({"record": record_title(record), "charts": charts})
+
+    with open(path, "w") as out:
+        out.write(content)
+
+
+def _init_worker(header_text, output_dir, output_format, validate):
+    _worker.update(
+        header_text=header_text,
+        output_dir=output_dir,
+        output_format=output_format,
+        validate=validate,
+    )
+
+
+def render_chunk(chunk):
+    """Render a chunk of (index, record line) pairs.
+
+    Returns the manifest entries of the written files (with the index of
+    their record) and a summary of the records.
+    """
+    records = []
+    entries = []
+    for index, data_line in chunk:
+        record = parsing.parse_record(_worker["header_text"], data_line)
+        name = output_name(index, record, _worker["output_format"])
+        write_record(
+            record,
+            os.path.join(_worker["output_dir"], name),
+            _worker["output_format"],
+            _worker["validate"],
+        )
+        records.append(record)
+        entries.append({"file": name, "record": record_title(record), "index": index})
+
+    return entries, Summary().add_records(records)
+
+
+def filtered(indexed_records, expression, sample_names):
+    """(index, record) pairs passing a filter expression (all if None)"""
+    if expression is None:
+        return indexed_records
+    return filter_records(
+        compile_filter(expression),
+        indexed_records,
+        sample_names,
+        key=operator.itemgetter(1),
+    )
+
+
+def render_shard(
+    vcf, numbered_shard, output_dir, output_format, validate, expression=None
+):
+    """Render the records of a (shard number, shard) pair like render_chunk.
+
+    Manifest entries hold the shard number and the index of the record
+    within the shard.
+    """
+    shard_number, shard = numbered_shard
+    header_text = str(vcf.header).rstrip("\n")
+    records = []
+    entries = []
+    for index, variant in filtered(
+        enumerate(shard_records(vcf, shard)), expression, list(vcf.header.samples)
+    ):
+        # Parsed from text like in render_chunk, so both modes write the same files
+        record = parsing.parse_record(header_text, str(variant).rstrip("\n"))
+        name = output_name(index, record, output_format, shard_number)
+        write_record(record, os.path.join(output_dir, name), output_format, validate)
+        records.append(record)
+        entries.append(
+            {
+                "file": name,
+                "record": record_title(record),
+                "shard": shard_number,
+                "index": index,
+            }
+        )
+
+    return entries, Summary().add_records(records)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def bounded_map(pool, func, iterable, max_pending):
+    """Like pool.map, but only keeps max_pending tasks in flight"""
+    pending = collections.deque()
+    for item in iterable:
+        pending.append(pool.submit(func, item))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def shard_spec(value):
+    """Parse an i/N shard argument (1 <= i <= N)"""
+    index, _, count = value.partition("/")
+    try:
+        shard = int(index), int(count)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, got {value!r}")
+    if not 1 <= shard[0] <= shard[1]:
+        raise argparse.ArgumentTypeError(f"expected 1 <= i <= N, got {value!r}")
+    return shard
+
+
+def render_stream(args):
+    """Render records read by the main process, yield the results of render_chunk.
+
+    With --shard i/N, records whose index in the input is i - 1 modulo N are
+    rendered. Records not passing --filter are skipped.
+    """
+    with pysam.VariantFile(args.vcf) as vcf:
+        header_text = str(vcf.header).rstrip("\n")
+        records = enumerate(vcf.fetch(region=args.region) if args.region else vcf)
+        if args.shard is not None:
+            index, count = args.shard
+            records = itertools.islice(records, index - 1, None, count)
+        records = filtered(records, args.filter, list(vcf.header.samples))
+        lines = ((i, str(record).rstrip("\n")) for i, record in records)
+
+        with ProcessPoolExecutor(
+            max_workers=args.jobs,
+            initializer=_init_worker,
+            initargs=(header_text, args.output_dir, args.format, args.validate),
+        ) as pool:
+            yield from bounded_map(
+                pool,
+                render_chunk,
+                chunked(lines, args.chunk_size),
+                args.jobs * 4,
+            )
+
+
+def render_shards(args):
+    """Render the region shards of this run, return the results of render_shard.
+
+    With --shard i/N, shards whose number is i - 1 modulo N are rendered, so
+    only their part of the file is read.
+    """
+    with pysam.VariantFile(args.vcf) as vcf:
+        shards = list(enumerate(make_shards(vcf, args.region, args.shard_size)))
+    if args.shard is not None:
+        index, count = args.shard
+        shards = shards[index - 1 :: count]
+
+    return map_shards(
+        args.vcf,
+        render_shard,
+        shards,
+        args.jobs,
+        args=(args.output_dir, args.format, args.validate, args.filter),
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Render Varlociraptor records to static HTML or Vega-Lite JSON."
+    )
+    parser.add_argument("vcf", help="Varlociraptor VCF/BCF file")
+    parser.add_argument("-o", "--output-dir", required=True)
+    parser.add_argument("--format", choices=["html", "json"], default="html")
+    parser.add_argument(
+        "--region", help="Only render records in this region (requires an index)"
+    )
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="Build charts through Altair with schema validation (slow)",
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count() or 1, help="Worker processes"
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=16, help="Records sent to a worker at once"
+    )
+    parser.add_argument(
+        "--sharded",
+        action="store_true",
+        help="Split an indexed file into contig shards, read by each worker itself",
+    )
+    parser.add_argument(
+        "--shard-size",
+        type=int,
+        help="Split contigs into shards of this many bases (implies --sharded)",
+    )
+    parser.add_argument(
+        "--shard",
+        type=shard_spec,
+        metavar="i/N",
+        help="Only render the i-th of N slices of the records (e.g. 3/10)",
+    )
+    parser.add_argument(
+        "--shard-by",
+        choices=["region", "index"],
+        default="region",
+        help="Slice --shard by region shards of an indexed file (only reading "
+        "them) or by record index modulo N (reading the whole file)",
+    )
+    parser.add_argument(
+        "--filter",
+        help="Only render records passing this filter expression, e.g. "
+        '"PROB_SOMATIC < 3 and ML_AF[tumor] > 0.1" (see filters.py)',
+    )
+    args = parser.parse_args(argv)
+
+    if args.filter is not None:
+        try:
+            with pysam.VariantFile(args.vcf) as vcf:
+                compile_filter(args.filter).check_samples(list(vcf.header.samples))
+        except ValueError as e:
+            parser.error(str(e))
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    start = time.perf_counter()
+
+    by_region = (
+        args.sharded
+        or args.shard_size
+        or (args.shard is not None and args.shard_by == "region")
+    )
+    entries = []
+    summary = Summary()
+    try:
+        # render_stream only opens the file (and fetches the region) once
+        # iterated
+        results = render_shards(args) if by_region else render_stream(args)
+        for chunk_entries, chunk_summary in results:
+            entries.extend(chunk_entries)
+            summary.merge(chunk_summary)
+    except ValueError as e:
+        parser.error(str(e))
+
+    with open(os.path.join(args.output_dir, manifest_name(args.shard)), "w") as out:
+        json.dump(
+            {
+                "input": os.path.abspath(args.vcf),
+                "region": args.region,
+                "shard": args.shard,
+                "shard_by": "region" if by_region else "index",
+                "format": args.format,
+                "filter": args.filter,
+                "records": entries,
+                "summary": summary.to_dict(),
+            },
+            out,
+        )
+
+    rendered = len(entries)
+    elapsed = time.perf_counter() - start
+    print(
+        f"Rendered {rendered} records in {elapsed:.1f}s "
+        f"({rendered / elapsed:.1f} records/s)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
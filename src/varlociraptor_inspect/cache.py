@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any
+
+# Memory budget of the shared render cache, in megabytes
+CACHE_BUDGET_ENV = "VARLOCIRAPTOR_INSPECT_CACHE_MB"
+DEFAULT_CACHE_BUDGET_MB = 256
+
+_MISSING = object()
+
+
+def content_key(*parts):
+    """Hash key for the given text parts (e.g. header, record line, sample name)"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def json_size(value):
+    """Approximate memory footprint of a JSON-like value (chart spec, summary)"""
+    return len(json.dumps(value, default=str))
+
+
+def cache_budget():
+    """Cache budget in bytes, configurable through VARLOCIRAPTOR_INSPECT_CACHE_MB"""
+    return int(
+        float(os.environ.get(CACHE_BUDGET_ENV, DEFAULT_CACHE_BUDGET_MB)) * 1024**2
+    )
+
+
+class LRUCache:
+    """Thread-safe LRU cache evicting entries once their total size exceeds max_bytes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size):
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+
+            # Values larger than the whole budget are not cached at all
+            if size > self.max_bytes:
+                return
+
+            self._entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+
+    def get_or_build(self, key, build, size_of=json_size) -> Any:
+        """Return the cached value for key, building and caching it on a miss"""
+        entry = self.get(key, _MISSING)
+        if entry is not _MISSING:
+            return entry
+
+        value = build()
+        self.put(key, value, size_of(value))
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
@@ -0,0 +1,298 @@
+"""Export of decoded Varlociraptor records to Parquet or Arrow tables.
+
+Usage: python -m varlociraptor_inspect.export calls.bcf -o tables/
+
+Records are streamed in chunks through the vectorized PHRED, AFD and OBS
+decoders and written to four tables, one row group (or record batch) per
+chunk, linked by the index of the record in the input:
+
+- records: chrom, pos, ref and alt of each record
+- events: the PROB_* event probabilities of each record
+- afd: the allele frequency distribution points of each sample
+- obs: the observations of each sample
+
+Categorical columns (chrom, event, sample and the OBS attributes) are
+dictionary-encoded. Arrow tables are written in the IPC stream format
+(.arrows), as dictionaries may differ between chunks.
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet as pq
+import pysam
+
+from varlociraptor_inspect.afd import decode_afd_batch, ml_estimates
+from varlociraptor_inspect.obs import OBS_LABELS, decode_obs_batch, obs_string
+from varlociraptor_inspect.phred import phred_to_probs, phred_value
+
+CHUNK_SIZE = 10000
+
+_CATEGORY = pa.dictionary(pa.int32(), pa.string())
+
+# OBS code columns with their labels, in table order
+_OBS_CATEGORIES = [
+    "allele",
+    "mapq",
+    "odds",
+    "strand",
+    "orientation",
+    "read_position",
+    "softclip",
+    "indel",
+]
+
+SCHEMAS = {
+    "records": pa.schema(
+        [
+            ("record", pa.int64()),
+            ("chrom", _CATEGORY),
+            ("pos", pa.int64()),
+            ("ref", pa.string()),
+            ("alt", pa.string()),
+        ]
+    ),
+    "events": pa.schema(
+        [
+            ("record", pa.int64()),
+            ("event", _CATEGORY),
+            ("phred", pa.float64()),
+            ("prob", pa.float64()),
+        ]
+    ),
+    "afd": pa.schema(
+        [
+            ("record", pa.int64()),
+            ("sample", _CATEGORY),
+            ("freq", pa.float64()),
+            ("phred", pa.float64()),
+            ("prob", pa.float64()),
+            ("ml", pa.bool_()),
+        ]
+    ),
+    "obs": pa.schema(
+        [
+            ("record", pa.int64()),
+            ("sample", _CATEGORY),
+            ("count", pa.int64()),
+            *[(name, _CATEGORY) for name in _OBS_CATEGORIES],
+            ("edit_distance", pa.int16()),
+        ]
+    ),
+}
+
+EXTENSIONS = {"parquet": "parquet", "arrow": "arrows"}
+
+
+def _categories(values):
+    return pa.array(values, pa.string()).dictionary_encode().cast(_CATEGORY)
+
+
+def _code_categories(codes, labels):
+    """Dictionary array of the labels of category codes.
+
+    Only the labels that occur are kept, and codes sharing a label (e.g.
+    unknown characters) are merged.
+    """
+    codes, indices = np.unique(codes, return_inverse=True)
+    dictionary, label_indices = np.unique(labels[codes], return_inverse=True)
+    return pa.DictionaryArray.from_arrays(
+        pa.array(label_indices[indices], pa.int32()),
+        pa.array(dictionary.tolist(), pa.string()),
+    )
+
+
+def _sample_column(index, sample_names):
+    """Sample of each entry decoded from the per (record, sample) value at index"""
+    return pa.DictionaryArray.from_arrays(
+        pa.array(index % len(sample_names), pa.int32()),
+        pa.array(sample_names, pa.string()),
+    )
+
+
+def decode_records(records, first_index, sample_names):
+    """Decode a chunk of records into one table per SCHEMAS entry.
+
+    Records are numbered from first_index on.
+    """
+    record_ids = np.arange(first_index, first_index + len(records))
+    event_records = []
+    event_names = []
+    phreds = []
+    afds = []
+    obs = []
+
+    for record_id, record in zip(record_ids, records):
+        for key, value in record.info.items():
+            if key.startswith("PROB_"):
+                value = phred_value(value)
+                if value is not None:
+                    event_records.append(record_id)
+                    event_names.append(key[len("PROB_") :])
+                    phreds.append(value)
+
+        for sample_name in sample_names:
+            sample = record.samples[sample_name]
+            afds.append(sample.get("AFD"))
+            obs.append(obs_string(sample.get("OBS")))
+
+    tables = {
+        "records": pa.table(
+            {
+                "record": record_ids,
+                "chrom": _categories([record.chrom for record in records]),
+                "pos": [record.pos for record in records],
+                "ref": [record.ref for record in records],
+                "alt": [",".join(record.alts or ["."]) for record in records],
+            },
+            schema=SCHEMAS["records"],
+        ),
+        "events": pa.table(
+            {
+                "record": np.array(event_records, dtype=np.int64),
+                "event": _categories(event_names),
+                "phred": np.array(phreds, dtype=np.float64),
+                "prob": phred_to_probs(phreds),
+            },
+            schema=SCHEMAS["events"],
+        ),
+    }
+
+    if not sample_names:
+        tables["afd"] = SCHEMAS["afd"].empty_table()
+        tables["obs"] = SCHEMAS["obs"].empty_table()
+        return tables
+
+    columns = decode_afd_batch(afds)
+    ml = np.zeros(len(columns["index"]), dtype=bool)
+    positions = ml_estimates(columns, len(afds))
+    ml[positions[positions >= 0]] = True
+    tables["afd"] = pa.table(
+        {
+            "record": record_ids[columns["index"] // len(sample_names)],
+            "sample": _sample_column(columns["index"], sample_names),
+            "freq": columns["freq"],
+            "phred": columns["phred"],
+            "prob": columns["prob"],
+            "ml": ml,
+        },
+        schema=SCHEMAS["afd"],
+    )
+
+    columns = decode_obs_batch(obs)
+    tables["obs"] = pa.table(
+        {
+            "record": record_ids[columns["index"] // len(sample_names)],
+            "sample": _sample_column(columns["index"], sample_names),
+            "count": columns["count"],
+            **{
+                name: _code_categories(columns[name], OBS_LABELS[name])
+                for name in _OBS_CATEGORIES
+            },
+            "edit_distance": columns["edit_distance"],
+        },
+        schema=SCHEMAS["obs"],
+    )
+    return tables
+
+
+class TableWriters:
+    """Parquet or Arrow IPC stream writers of all tables in output_dir"""
+
+    def __init__(self, output_dir, output_format="parquet"):
+        self.output_format = output_format
+        self.writers = {}
+        for name, schema in SCHEMAS.items():
+            path = os.path.join(output_dir, f"{name}.{EXTENSIONS[output_format]}")
+            if output_format == "parquet":
+                self.writers[name] = pq.ParquetWriter(path, schema)
+            else:
+                self.writers[name] = pa.ipc.new_stream(path, schema)
+
+    def write(self, tables):
+        """Write each table as a single row group (or record batch)"""
+        for name, table in tables.items():
+            if len(table) == 0:
+                continue
+            if self.output_format == "parquet":
+                self.writers[name].write_table(table, row_group_size=len(table))
+            else:
+                self.writers[name].write_table(table, max_chunksize=len(table))
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def export_vcf(
+    path,
+    output_dir,
+    region=None,
+    output_format="parquet",
+    chunk_size=CHUNK_SIZE,
+    progress=None,
+):
+    """Export all records of a VCF/BCF file (or of a region, given an index).
+
+    progress is called with the number of records exported so far after each
+    chunk. Returns the number of exported records.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    exported = 0
+
+    with pysam.VariantFile(path) as vcf, TableWriters(output_dir, output_format) as out:
+        sample_names = list(vcf.header.samples)
+        records = iter(vcf.fetch(region=region) if region else vcf)
+        while chunk := list(itertools.islice(records, chunk_size)):
+            out.write(decode_records(chunk, exported, sample_names))
+            exported += len(chunk)
+            if progress is not None:
+                progress(exported)
+
+    return exported
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Export decoded Varlociraptor records to Parquet or Arrow tables."
+    )
+    parser.add_argument("vcf", help="Varlociraptor VCF/BCF file")
+    parser.add_argument("-o", "--output-dir", required=True)
+    parser.add_argument("--format", choices=list(EXTENSIONS), default="parquet")
+    parser.add_argument(
+        "--region", help="Only export records in this region (requires an index)"
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=CHUNK_SIZE,
+        help="Records per row group (or record batch)",
+    )
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    exported = export_vcf(
+        args.vcf, args.output_dir, args.region, args.format, args.chunk_size
+    )
+    elapsed = time.perf_counter() - start
+    print(
+        f"Exported {exported} records in {elapsed:.1f}s "
+        f"({exported / elapsed:.1f} records/s)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""Expected false discovery rate (FDR) curves of Varlociraptor callsets.
+
+Usage: python -m varlociraptor_inspect.fdr calls.bcf --events SOMATIC_TUMOR -o fdr.html
+
+For a set of events, the probability that a record is a false discovery is
+the summed probability of all other PROB_* events. Calling the records whose
+false discovery probability is at most a threshold, the expected FDR is the
+mean false discovery probability of the called records.
+
+False discovery probabilities are computed from the PHRED scores in log
+space (a log-sum-exp over the other, normalized events), so very confident
+calls do not underflow to 0. Records are streamed in batches and only counted into fixed
+PHRED buckets, so memory does not grow with the number of records.
+"""
+
+import argparse
+import html
+import itertools
+import json
+import os
+import sys
+import time
+
+import altair as alt
+import numpy as np
+
+from varlociraptor_inspect import plotting
+from varlociraptor_inspect.batch import HTML_TEMPLATE
+from varlociraptor_inspect.phred import (
+    LOG_PROB_PER_PHRED,
+    event_phreds,
+    log_sum_exp,
+    normalize_log_probs,
+    phred_to_log_probs,
+)
+from varlociraptor_inspect.shards import make_shards, map_shards, shard_records
+
+# Buckets of the PHRED scaled false discovery probability: 0-0.1, 0.1-0.2,
+# ..., with higher scores (down to a probability of 0) in the last one
+BUCKET_WIDTH = 0.1
+NUM_BUCKETS = 10000
+
+BATCH_SIZE = 10000
+
+_PHRED_PER_LOG = 1 / LOG_PROB_PER_PHRED
+
+
+def bucket_log_bounds():
+    """Natural log of the upper probability bound of each bucket"""
+    return np.arange(NUM_BUCKETS) * BUCKET_WIDTH / _PHRED_PER_LOG
+
+
+class ExpectedFdr:
+    """Histogram of the false discovery probabilities of records for a set of events.
+
+    counts holds the number of records per bucket and sums their false
+    discovery probabilities, each divided by the upper bound of its bucket
+    (so the sums neither overflow nor underflow). The last bucket is
+    unbounded, so its sum is kept as a log-sum-exp in last_log_sum.
+    """
+
+    def __init__(self, events):
+        self.events = list(events)
+        self.records = 0
+        self.counts = np.zeros(NUM_BUCKETS, dtype=np.int64)
+        self.sums = np.zeros(NUM_BUCKETS)
+        self.last_log_sum = -np.inf
+
+    def add_records(self, records):
+        """Add a batch of records (pysam.VariantRecord or VcfRecord).
+
+        The event probabilities of each record are normalized to sum to 1
+        (removing the rounding of the PHRED scores). Records without any
+        PROB_* event are skipped.
+        """
+        keys, phreds = event_phreds(records)
+        log_probs = normalize_log_probs(phred_to_log_probs(phreds))
+        known = ~np.all(np.isnan(log_probs), axis=1)
+        other = [key[len("PROB_") :] not in self.events for key in keys]
+        # Missing events have probability 0
+        log_false = np.nan_to_num(
+            log_sum_exp(log_probs[:, other]), nan=-np.inf, neginf=-np.inf
+        )
+        self.add_log_probs(log_false[known])
+        return self
+
+    def add_log_probs(self, log_false):
+        """Add records by the natural log of their false discovery probability"""
+        # A probability of 0 (log -inf) goes to the last bucket
+        bucket = np.clip(
+            log_false * _PHRED_PER_LOG / BUCKET_WIDTH, 0, NUM_BUCKETS - 1
+        ).astype(np.int64)
+        scaled = np.exp(log_false - bucket_log_bounds()[bucket])
+        self.records += len(log_false)
+        self.counts += np.bincount(bucket, minlength=NUM_BUCKETS)
+        self.sums += np.bincount(bucket, weights=scaled, minlength=NUM_BUCKETS)
+        self.last_log_sum = np.logaddexp.reduce(
+            log_false[bucket == NUM_BUCKETS - 1], initial=self.last_log_sum
+        )
+        return self
+
+    def merge(self, other):
+        """Add the histogram of another ExpectedFdr (of the same events) to this one"""
+        self.records += other.records
+        self.counts += other.counts
+        self.sums += other.sums
+        self.last_log_sum = np.logaddexp(self.last_log_sum, other.last_log_sum)
+        return self
+
+    def curve(self):
+        """Expected FDR at the lower bound of each non-empty bucket as a threshold.
+
+        Returns columns threshold (PHRED scaled maximum false discovery
+        probability of called records), calls, log_false_discoveries (natural
+        log of the expected number of false discoveries) and fdr.
+        """
+        with np.errstate(divide="ignore"):
+            log_sums = np.log(self.sums) + bucket_log_bounds()
+        log_sums[-1] = self.last_log_sum
+        # The records of a bucket and of all higher ones (with lower false
+        # discovery probabilities) are called at its threshold
+        calls = np.cumsum(self.counts[::-1])[::-1]
+        log_false_discoveries = np.logaddexp.accumulate(log_sums[::-1])[::-1]
+        buckets = np.flatnonzero(self.counts)
+        return {
+            # Rounded, as e.g. 131 * 0.1 is 13.100000000000001
+            "threshold": np.round(buckets * BUCKET_WIDTH, 1),
+            "calls": calls[buckets],
+            "log_false_discoveries": log_false_discoveries[buckets],
+            "fdr": np.exp(log_false_discoveries[buckets] - np.log(calls[buckets])),
+        }
+
+
+def expected_fdr_records(events, records, batch_size=BATCH_SIZE, progress=None):
+    """Stream records into an ExpectedFdr, batch_size records at a time"""
+    fdr = ExpectedFdr(events)
+    iterator = iter(records)
+    read = 0
+    while batch := list(itertools.islice(iterator, batch_size)):
+        fdr.add_records(batch)
+        read += len(batch)
+        if progress is not None:
+            progress(read)
+    return fdr
+
+
+def expected_fdr_shard(vcf, shard, events, batch_size=BATCH_SIZE):
+    return expected_fdr_records(events, shard_records(vcf, shard), batch_size)
+
+
+def expected_fdr_vcf(
+    path,
+    events,
+    region=None,
+    batch_size=BATCH_SIZE,
+    progress=None,
+    jobs=1,
+    shard_size=None,
+):
+    """ExpectedFdr of the records of a VCF/BCF file (or of a region, given an index).
+
+    events are event names without the PROB_ prefix, a ValueError is raised
+    for events not in the header. Shards are processed like in
+    summary.summarize_vcf.
+    """
+    # pysam is only needed for binary and indexed access
+    import pysam
+
+    with pysam.VariantFile(path) as vcf:
+        unknown = [event for event in events if f"PROB_{event}" not in vcf.header.info]
+        if unknown:
+            raise ValueError(f"Unknown event(s): {', '.join(unknown)}")
+        if jobs <= 1 and not shard_size:
+            records = vcf.fetch(region=region) if region else vcf
+            return expected_fdr_records(events, records, batch_size, progress)
+        shards = make_shards(vcf, region, shard_size)
+
+    fdr = ExpectedFdr(events)
+    for shard_fdr in map_shards(
+        path, expected_fdr_shard, shards, jobs, args=(events, batch_size)
+    ):
+        fdr.merge(shard_fdr)
+        if progress is not None:
+            progress(fdr.records)
+    return fdr
+
+
+def render_html(title, fdr):
+    """Standalone HTML page with the expected FDR curve"""
+    return HTML_TEMPLATE.format(
+        title=html.escape(title),
+        sections=f"  <h2>{html.escape(' or '.join(fdr.events))} "
+        f'({fdr.records} records)</h2>\n  <div id="fdr"></div>',
+        specs=json.dumps({"fdr": plotting.visualize_expected_fdr(fdr).to_dict()}),
+        vega_version=alt.VEGA_VERSION,
+        vegalite_version=alt.VEGALITE_VERSION,
+        vegaembed_version=alt.VEGAEMBED_VERSION,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compute the expected FDR curve of a set of Varlociraptor events."
+    )
+    parser.add_argument("vcf", help="Varlociraptor VCF/BCF file")
+    parser.add_argument(
+        "--events",
+        nargs="+",
+        required=True,
+        help="Events counted as true discoveries (without the PROB_ prefix)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        help="Chart page (.html) or table of the curve (.tsv)",
+    )
+    parser.add_argument(
+        "--region", help="Only count records in this region (requires an index)"
+    )
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Worker processes")
+    parser.add_argument(
+        "--shard-size",
+        type=int,
+        help="Split contigs of an indexed file into shards of this many bases",
+    )
+    args = parser.parse_args(argv)
+    if not args.output.endswith((".html", ".tsv")):
+        parser.error("--output must end with .html or .tsv")
+
+    start = time.perf_counter()
+    try:
+        fdr = expected_fdr_vcf(
+            args.vcf,
+            args.events,
+            args.region,
+            jobs=args.jobs,
+            shard_size=args.shard_size,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    with open(args.output, "w") as out:
+        if args.output.endswith(".tsv"):
+            plotting.expected_fdr_data(fdr).to_csv(out, sep="\t", index=False)
+        else:
+            out.write(render_html(os.path.basename(args.vcf), fdr))
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Counted {fdr.records} records in {elapsed:.1f}s "
+        f"({fdr.records / elapsed:.1f} records/s)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""Filter expressions over decoded record fields, evaluated on batches of records.
+
+Expressions use Python syntax, e.g.
+
+    PROB_SOMATIC_TUMOR < 3 and ML_AF[tumor] > 0.1 and ALT_FWD[tumor] > 2
+
+with and, or, not, comparisons (also chained), + - * /, min, max, abs and
+the fields
+
+- PROB_<EVENT>: PHRED scaled probability of an event (INFO field)
+- ML_AF: maximum likelihood allele frequency of the AFD
+- DP: read depth (FORMAT field)
+- REF_OBS, ALT_OBS: number of REF and ALT observations in OBS
+- REF_FWD, REF_REV, ALT_FWD, ALT_REV: number of REF and ALT observations on
+  the forward and reverse strand (observations on both strands count for
+  both)
+
+Sample fields take the sample as an index (ML_AF[tumor] or, for names that
+are not identifiers, ML_AF["tumor-1"]). Without one, a comparison holds if
+it holds for any sample. Comparisons with missing values are false.
+
+Expressions are compiled once into functions of columnar NumPy arrays, so
+records are filtered batch_size at a time without evaluating per record.
+"""
+
+import ast
+import itertools
+import operator
+import re
+from typing import Any, Callable
+
+import numpy as np
+
+from varlociraptor_inspect.afd import decode_afd_batch, ml_estimates
+from varlociraptor_inspect.obs import decode_obs_batch, obs_string
+from varlociraptor_inspect.phred import event_phreds
+
+BATCH_SIZE = 10000
+
+SAMPLE_FIELDS = [
+    "ML_AF",
+    "DP",
+    "REF_OBS",
+    "ALT_OBS",
+    "REF_FWD",
+    "REF_REV",
+    "ALT_FWD",
+    "ALT_REV",
+]
+
+# Strand codes of decode_obs_batch (see obs.STRAND_NAMES)
+FORWARD = 0
+REVERSE = 1
+BOTH = 2
+
+_EVENT_PATTERN = re.compile(r"PROB_\w+")
+
+_COMPARISONS: dict[type, Callable] = {
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+}
+_ARITHMETIC: dict[type, Callable] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+}
+_FUNCTIONS: dict[str, Any] = {"min": np.minimum, "max": np.maximum, "abs": np.abs}
+
+
+class RecordFilter:
+    """A compiled filter expression.
+
+    fields is the set of (field, sample) columns it reads, with sample None
+    for INFO fields and for sample fields without a sample.
+    """
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.fields = set()
+        try:
+            tree = ast.parse(expression.strip(), mode="eval")
+        except SyntaxError as e:
+            raise ValueError(f"Invalid filter expression: {e.msg}") from None
+        self._predicate = self._condition(tree.body)
+
+    def __call__(self, columns):
+        """Boolean mask of the records passing the filter"""
+        return self._predicate(columns)
+
+    def check_samples(self, sample_names):
+        """Raise a ValueError if the filter reads a sample not in sample_names"""
+        unknown = {sample for _, sample in self.fields if sample is not None} - set(
+            sample_names
+        )
+        if unknown:
+            raise ValueError(f"Unknown sample(s) in filter: {', '.join(unknown)}")
+
+    def _condition(self, node):
+        """Compile a node evaluating to one boolean per record"""
+        if isinstance(node, ast.BoolOp):
+            parts = [self._condition(value) for value in node.values]
+            combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            return lambda columns: combine.reduce([part(columns) for part in parts])
+
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            part = self._condition(node.operand)
+            return lambda columns: ~part(columns)
+
+        if isinstance(node, ast.Compare):
+            # Function names like min are not fields
+            functions = {
+                id(child.func)
+                for child in ast.walk(node)
+                if isinstance(child, ast.Call)
+            }
+            if not any(
+                isinstance(child, ast.Name) and id(child) not in functions
+                for child in ast.walk(node)
+            ):
+                raise ValueError(f"Comparison without a field: {ast.unparse(node)}")
+            ops = []
+            for op in node.ops:
+                if type(op) not in _COMPARISONS:
+                    raise ValueError(f"Unsupported comparison: {ast.unparse(node)}")
+                ops.append(_COMPARISONS[type(op)])
+            operands = [self._value(node.left)] + [
+                self._value(comparator) for comparator in node.comparators
+            ]
+
+            def compare(columns):
+                values = [operand(columns) for operand in operands]
+                result = True
+                for op, left, right in zip(ops, values, values[1:]):
+                    # NaN != x is true, but missing values never pass
+                    missing = np.isnan(left) | np.isnan(right)
+                    result = result & op(left, right) & np.logical_not(missing)
+                # One column per sample for sample fields without a sample
+                return np.any(result, axis=1)
+
+            return compare
+
+        raise ValueError(f"Expected a condition: {ast.unparse(node)}")
+
+    def _value(self, node):
+        """Compile a node evaluating to a (records, samples) array of numbers"""
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            value = float(node.value)
+            return lambda columns: value
+
+        if isinstance(node, ast.Name):
+            return self._field(node.id, None)
+
+        if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name):
+            if isinstance(node.slice, ast.Name):
+                return self._field(node.value.id, node.slice.id)
+            if isinstance(node.slice, ast.Constant) and isinstance(
+                node.slice.value, str
+            ):
+                return self._field(node.value.id, node.slice.value)
+
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            operand = self._value(node.operand)
+            return lambda columns: -operand(columns)
+
+        if isinstance(node, ast.BinOp) and type(node.op) in _ARITHMETIC:
+            op = _ARITHMETIC[type(node.op)]
+            left = self._value(node.left)
+            right = self._value(node.right)
+
+            def arithmetic(columns):
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    return op(left(columns), right(columns))
+
+            return arithmetic
+
+        if (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Name)
+            and node.func.id in _FUNCTIONS
+            and not node.keywords
+            and node.args
+        ):
+            func = _FUNCTIONS[node.func.id]
+            args = [self._value(arg) for arg in node.args]
+            if func is np.abs:
+                if len(args) != 1:
+                    raise ValueError(f"abs takes one argument: {ast.unparse(node)}")
+                return lambda columns: np.abs(args[0](columns))
+            return lambda columns: func.reduce(
+                np.broadcast_arrays(*[arg(columns) for arg in args])
+            )
+
+        raise ValueError(f"Unsupported expression: {ast.unparse(node)}")
+
+    def _field(self, name, sample):
+        if _EVENT_PATTERN.fullmatch(name):
+            if sample is not None:
+                raise ValueError(f"{name} is not a sample field")
+        elif name not in SAMPLE_FIELDS:
+            raise ValueError(f"Unknown field: {name}")
+
+        key = (name, sample)
+        self.fields.add(key)
+        return lambda columns: columns[key]
+
+
+def compile_filter(expression):
+    """Compile a filter expression (see module docstring), raise ValueError if invalid"""
+    return RecordFilter(expression)
+
+
+def _number(value):
+    """Float of a FORMAT value (the first of a sequence), NaN if missing"""
+    if isinstance(value, tuple):
+        value = value[0] if value else None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _sample_columns(records, sample_name, names):
+    """Columns of the sample fields in names of one sample"""
+    samples = [record.samples[sample_name] for record in records]
+    columns = {}
+
+    if "ML_AF" in names:
+        afd = decode_afd_batch([sample.get("AFD") for sample in samples])
+        ml = ml_estimates(afd, len(samples))
+        # Samples without a valid point (ml -1) get the NaN appended last
+        columns["ML_AF"] = np.append(afd["freq"], np.nan)[ml]
+
+    if "DP" in names:
+        columns["DP"] = np.array(
+            [_number(sample.get("DP")) for sample in samples], dtype=np.float64
+        )
+
+    if names & {"REF_OBS", "ALT_OBS", "REF_FWD", "REF_REV", "ALT_FWD", "ALT_REV"}:
+        obs = decode_obs_batch([obs_string(sample.get("OBS")) for sample in samples])
+        forward = np.isin(obs["strand"], [FORWARD, BOTH])
+        reverse = np.isin(obs["strand"], [REVERSE, BOTH])
+        for allele, is_allele in [
+            ("REF", obs["allele"] == 0),
+            ("ALT", obs["allele"] == 1),
+        ]:
+            for suffix, selected in [
+                ("OBS", is_allele),
+                ("FWD", is_allele & forward),
+                ("REV", is_allele & reverse),
+            ]:
+                columns[f"{allele}_{suffix}"] = np.bincount(
+                    obs["index"],
+                    weights=obs["count"] * selected,
+                    minlength=len(samples),
+                )
+
+    return columns
+
+
+def decode_columns(records, sample_names, fields):
+    """Columnar arrays of the given (field, sample) fields of a batch of records.
+
+    Every column has one row per record and one column per sample for sample
+    fields without a sample, one column otherwise. Missing values are NaN.
+    """
+    columns: dict[tuple[str, str | None], np.ndarray] = {}
+
+    events, phreds = event_phreds(
+        records, {name for name, _ in fields if _EVENT_PATTERN.fullmatch(name)}
+    )
+    for j, event in enumerate(events):
+        columns[(event, None)] = phreds[:, [j]]
+
+    samples: dict[str, set[str]] = {}
+    for name, sample in fields:
+        if not _EVENT_PATTERN.fullmatch(name):
+            for sample_name in sample_names if sample is None else [sample]:
+                samples.setdefault(sample_name, set()).add(name)
+
+    decoded = {
+        sample_name: _sample_columns(records, sample_name, names)
+        for sample_name, names in samples.items()
+    }
+    for name, sample in fields:
+        if _EVENT_PATTERN.fullmatch(name):
+            continue
+        sample_columns = sample_names if sample is None else [sample]
+        columns[(name, sample)] = np.array(
+            [decoded[sample_name][name] for sample_name in sample_columns],
+            dtype=np.float64,
+        ).T.reshape(len(records), len(sample_columns))
+
+    return columns
+
+
+def filter_records(record_filter, items, sample_names, batch_size=BATCH_SIZE, key=None):
+    """Yield the items whose record passes the filter, in their original order.
+
+    key extracts the record from an item (e.g. from (index, record) pairs).
+    """
+    record_filter.check_samples(sample_names)
+    iterator = iter(items)
+    while batch := list(itertools.islice(iterator, batch_size)):
+        records = batch if key is None else [key(item) for item in batch]
+        mask = record_filter(
+            decode_columns(records, sample_names, record_filter.fields)
+        )
+        yield from itertools.compress(batch, mask)
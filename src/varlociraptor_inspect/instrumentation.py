@@ -0,0 +1,97 @@
+import contextvars
+import json
+import logging
+import os
+import sys
+import time
+
+# Set to 1/true/yes/on to enable diagnostics by default
+DIAGNOSTICS_ENV = "VARLOCIRAPTOR_INSPECT_DIAGNOSTICS"
+
+logger = logging.getLogger("varlociraptor_inspect.diagnostics")
+
+_active_recorder: contextvars.ContextVar["StageRecorder | None"] = (
+    contextvars.ContextVar("active_recorder", default=None)
+)
+
+
+def diagnostics_enabled():
+    """Whether diagnostics are enabled through VARLOCIRAPTOR_INSPECT_DIAGNOSTICS"""
+    return os.environ.get(DIAGNOSTICS_ENV, "").lower() in ("1", "true", "yes", "on")
+
+
+class StageRecorder:
+    """Collects timings of the stages run while it is active (used as a context manager)"""
+
+    def __init__(self):
+        self.stages = []
+        self.start = None
+        self._token = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self._token = _active_recorder.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._token is not None:
+            _active_recorder.reset(self._token)
+            self._token = None
+
+    def sorted_stages(self):
+        """Stages in the order they started"""
+        return sorted(self.stages, key=lambda stage: stage["start_ms"])
+
+    def log(self, **fields):
+        """Emit one JSON log line per stage"""
+        if not logger.handlers and not logging.getLogger().handlers:
+            handler = logging.StreamHandler(sys.stderr)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+
+        for stage in self.sorted_stages():
+            logger.info(json.dumps({"event": "stage", **fields, **stage}))
+
+
+class _Stage:
+    __slots__ = ("name", "fields", "recorder", "start")
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+        self.recorder = None
+
+    @property
+    def active(self):
+        return self.recorder is not None
+
+    def set(self, **fields):
+        """Attach extra fields (e.g. payload size) to the stage"""
+        self.fields.update(fields)
+
+    def __enter__(self):
+        self.recorder = _active_recorder.get()
+        if self.recorder is not None:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.recorder is not None:
+            end = time.perf_counter()
+            self.recorder.stages.append(
+                {
+                    "stage": self.name,
+                    "start_ms": (self.start - self.recorder.start) * 1e3,
+                    "ms": (end - self.start) * 1e3,
+                    **self.fields,
+                }
+            )
+
+
+def stage(name, **fields):
+    """Time the enclosed block as a stage of the active StageRecorder.
+
+    Does nothing but a context variable lookup when no recorder is active.
+    """
+    return _Stage(name, fields)
@@ -0,0 +1,160 @@
+import re
+from typing import Sequence
+
+import numpy as np
+
+# Pattern: COUNT + 2-letter odds + 8 single chars
+OBS_PATTERN = re.compile(r"(\d+)([a-zA-Z]{2}.{8})")
+
+# Offsets of the fields within the 10 characters following the count
+ALLELE = 0
+KASS = 1
+EDIT_DISTANCE = 2
+STRAND = 5
+ORIENTATION = 6
+READ_POSITION = 7
+SOFTCLIP = 8
+INDEL = 9
+
+ALLELES = ["REF", "ALT"]
+MAPQ_CLASSES = ["High MAPQ", "Low MAPQ"]
+
+ODDS_NAMES = {
+    "N": "None",
+    "E": "Equal",
+    "B": "Barely",
+    "P": "Positive",
+    "S": "Strong",
+    "V": "Very Strong",
+}
+STRAND_NAMES = {"+": "Forward strand", "-": "Reverse strand", "*": "Both strands"}
+READ_POSITION_NAMES = {
+    "^": "Most common position",
+    "*": "Other position",
+    ".": "Irrelevant position",
+}
+ORIENTATION_NAMES = {
+    ">": "F1R2 orientation",
+    "<": "F2R1 orientation",
+    "*": "Unknown orientation",
+    "!": "Non-standard orientation",
+}
+SOFTCLIP_NAMES = {"$": "Soft clipped", ".": "No soft clipping"}
+INDEL_NAMES = {"*": "Contains indel", ".": "No indel"}
+
+
+def _lookup_table(names, fallback=str):
+    """Byte -> category code table plus the labels of all codes.
+
+    Characters without a name get their own code, labelled with the
+    character itself (passed through fallback).
+    """
+    known = list(dict.fromkeys(names.values()))
+    codes = np.empty(256, dtype=np.uint16)
+    for byte in range(256):
+        char = chr(byte)
+        codes[byte] = known.index(names[char]) if char in names else len(known) + byte
+    labels = np.array(
+        known + [fallback(chr(byte)) for byte in range(256)], dtype=object
+    )
+    return codes, labels
+
+
+_BYTES = np.arange(256, dtype=np.uint8).tobytes().decode("latin-1")
+
+_ALLELE_CODES = np.array([char.upper() == "A" for char in _BYTES], dtype=np.uint8)
+_MAPQ_CODES = np.array([not char.isupper() for char in _BYTES], dtype=np.uint8)
+_EDIT_DISTANCES = np.array(
+    [int(char) if char in "0123456789" else 0 for char in _BYTES], dtype=np.int16
+)
+
+_CATEGORICAL_FIELDS = {
+    "odds": (
+        KASS,
+        *_lookup_table(
+            {**ODDS_NAMES, **{k.lower(): v for k, v in ODDS_NAMES.items()}},
+            str.upper,
+        ),
+    ),
+    "strand": (STRAND, *_lookup_table(STRAND_NAMES)),
+    "orientation": (ORIENTATION, *_lookup_table(ORIENTATION_NAMES)),
+    "read_position": (READ_POSITION, *_lookup_table(READ_POSITION_NAMES)),
+    "softclip": (SOFTCLIP, *_lookup_table(SOFTCLIP_NAMES)),
+    "indel": (INDEL, *_lookup_table(INDEL_NAMES)),
+}
+
+# Labels for the code columns returned by decode_obs_batch
+OBS_LABELS = {
+    "allele": np.array(ALLELES, dtype=object),
+    "mapq": np.array(MAPQ_CLASSES, dtype=object),
+    "edit_distance": np.array([str(i) for i in range(10)], dtype=object),
+    **{name: labels for name, (_, _, labels) in _CATEGORICAL_FIELDS.items()},
+}
+
+
+def obs_string(obs):
+    """Normalize the OBS value of a sample (None, string or sequence) to a string"""
+    if obs is None:
+        return ""
+    if not isinstance(obs, str):
+        if isinstance(obs, Sequence):
+            obs = obs[0] if len(obs) > 0 else ""
+        else:
+            obs = str(obs)
+
+    # Handle None or missing values
+    if obs is None or obs == ".":
+        return ""
+    return obs
+
+
+def decode_obs_batch(obs_strings):
+    """Decode many OBS strings into columnar arrays, one entry per observation.
+
+    Returns a dict of equally long NumPy arrays: "index" (position of the
+    source string in obs_strings), "count", "allele" (0 = REF, 1 = ALT),
+    "odds", "mapq", "strand", "orientation", "read_position", "softclip",
+    "indel" (category codes, see OBS_LABELS) and "edit_distance".
+    """
+    counts = []
+    codes = []
+    lengths = []
+
+    for obs_string in obs_strings:
+        matches = OBS_PATTERN.findall(obs_string) if obs_string else []
+        lengths.append(len(matches))
+        if matches:
+            match_counts, match_codes = zip(*matches)
+            counts.extend(match_counts)
+            codes.extend(match_codes)
+
+    # OBS strings are ASCII, anything else decodes as "?"
+    chars = np.frombuffer(
+        "".join(codes).encode("ascii", errors="replace"), dtype=np.uint8
+    ).reshape(-1, 10)
+
+    columns: dict[str, np.ndarray] = {
+        "index": np.repeat(np.arange(len(lengths)), lengths),
+        "count": (
+            np.fromstring(" ".join(counts), dtype=np.int64, sep=" ")
+            if counts
+            else np.empty(0, dtype=np.int64)
+        ),
+        "allele": _ALLELE_CODES[chars[:, ALLELE]],
+        "mapq": _MAPQ_CODES[chars[:, KASS]],
+    }
+    for name, (offset, lookup, _) in _CATEGORICAL_FIELDS.items():
+        columns[name] = lookup[chars[:, offset]]
+    columns["edit_distance"] = _EDIT_DISTANCES[chars[:, EDIT_DISTANCE]]
+
+    return columns
+
+
+def decode_obs(obs_string):
+    """Decode a single OBS string into columnar arrays (see decode_obs_batch)"""
+    return decode_obs_batch([obs_string])
+
+
+def obs_labels(columns, name):
+    """Human readable labels for a code column returned by decode_obs_batch"""
+    return OBS_LABELS[name][columns[name]]
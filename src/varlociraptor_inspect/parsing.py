@@ -0,0 +1,190 @@
+import itertools
+import re
+
+import numpy as np
+
+from varlociraptor_inspect.instrumentation import stage
+from varlociraptor_inspect.phred import event_phreds, phred_to_log_probs, phred_to_probs
+from varlociraptor_inspect.vcfrecord import VcfRecord
+
+VCF_COLUMNS = ["#CHROM", "POS", "ID", "REF", "ALT", "QUAL", "FILTER", "INFO"]
+
+# Standard Varlociraptor FORMAT fields
+FORMAT_HEADER_LINES = [
+    "##FORMAT=<ID=DP,Number=1,Type=Integer>",
+    "##FORMAT=<ID=AF,Number=1,Type=Float>",
+    "##FORMAT=<ID=AFD,Number=.,Type=String>",
+    "##FORMAT=<ID=OBS,Number=1,Type=String>",
+    "##FORMAT=<ID=HINTS,Number=.,Type=String>",
+]
+
+_PROB_PATTERN = re.compile(r"PROB_(\w+)=([^;]*)")
+_PROB_NAME_PATTERN = re.compile(r"PROB_(\w+)=")
+
+
+def normalize_whitespace(text):
+    """Normalize whitespace in VCF records - replace multiple spaces with single tabs"""
+    lines = []
+    for line in text.split("\n"):
+        if line.startswith("#"):
+            # Header lines - keep as is
+            lines.append(line)
+        else:
+            # Data lines - replace multiple spaces with single tab
+            normalized = "\t".join(line.split())
+            lines.append(normalized)
+    return "\n".join(lines)
+
+
+def synthesize_header(contigs, prob_fields, num_columns, column_header=None):
+    """Generate VCF header lines (including the #CHROM line) for headerless records
+
+    contigs maps each contig to the largest position seen on it, prob_fields
+    lists the PROB_* event names and num_columns is the column count of the
+    data lines.
+    """
+    header_lines = ["##fileformat=VCFv4.2"]
+    for chrom, pos in contigs.items():
+        header_lines.append(f"##contig=<ID={chrom},length={pos + 1000}>")
+
+    # Add PROB_ INFO fields (Number=. to allow multiple values)
+    for prob_field in prob_fields:
+        header_lines.append(f"##INFO=<ID=PROB_{prob_field},Number=.,Type=Float>")
+
+    header_lines.extend(FORMAT_HEADER_LINES)
+
+    # Generate column header if not present
+    if not column_header:
+        columns = list(VCF_COLUMNS)
+        if num_columns > 8:
+            num_samples = num_columns - 9
+            sample_names = [f"sample{i + 1}" for i in range(num_samples)]
+            columns.extend(["FORMAT", *sample_names])
+        column_header = "\t".join(columns)
+
+    header_lines.append(column_header)
+    return header_lines
+
+
+def _summary(chrom, pos, ref, alt, events, phreds):
+    """Navigator summary from the events (without PROB_) and PHRED scores of a record"""
+    # Ranked in log space, where probabilities too small for floats still differ
+    log_probs = phred_to_log_probs(phreds)
+    known = ~np.isnan(log_probs)
+    top = int(np.argmax(np.where(known, log_probs, -np.inf))) if known.any() else None
+
+    return {
+        "CHROM": chrom,
+        "POS": pos,
+        "REF": ref,
+        "ALT": alt,
+        "Top Event": None if top is None else events[top],
+        "Probability": None if top is None else float(phred_to_probs(phreds[top])),
+    }
+
+
+def summarize_fields(fields):
+    """Compact summary of a record's tab-split fields for the record navigator"""
+    events = []
+    phreds = []
+    for event, value in _PROB_PATTERN.findall(fields[7]):
+        try:
+            phreds.append(float(value.split(",")[0]))
+        except ValueError:
+            continue
+        events.append(event)
+
+    return _summary(fields[0], int(fields[1]), fields[3], fields[4], events, phreds)
+
+
+def summarize_record(record):
+    """Compact summary of a parsed record (VcfRecord or pysam.VariantRecord)"""
+    events, phreds = event_phreds([record])
+
+    return _summary(
+        record.chrom,
+        record.pos,
+        record.ref,
+        ",".join(record.alts or ["."]),
+        [event[len("PROB_") :] for event in events],
+        phreds[0],
+    )
+
+
+def scan_vcf_text(text):
+    """Split normalized VCF text into header lines, data lines and record summaries.
+
+    All records are visited in a single pass. A header is synthesized if the
+    text does not start with ##fileformat.
+    """
+    header_lines = []
+    data_lines = []
+    summaries = []
+    contigs = {}
+    prob_fields = {}
+
+    for line in text.split("\n"):
+        if line.startswith("#"):
+            header_lines.append(line)
+            continue
+        if not line.strip():
+            continue
+
+        fields = line.split("\t")
+        if len(fields) < 8:
+            raise ValueError(
+                f"VCF record {len(data_lines) + 1} must have at least 8 tab-separated columns"
+            )
+
+        summary = summarize_fields(fields)
+        contigs[summary["CHROM"]] = max(
+            contigs.get(summary["CHROM"], 0), summary["POS"]
+        )
+        prob_fields.update(dict.fromkeys(_PROB_NAME_PATTERN.findall(fields[7])))
+
+        data_lines.append(line)
+        summaries.append(summary)
+
+    if not data_lines:
+        raise ValueError("No VCF data line found")
+
+    if not text.startswith("##fileformat"):
+        column_header = next(
+            (line for line in header_lines if line.startswith("#CHROM")), None
+        )
+        with stage("header synthesis"):
+            header_lines = synthesize_header(
+                contigs, prob_fields, len(data_lines[0].split("\t")), column_header
+            )
+
+    return header_lines, data_lines, summaries
+
+
+def parse_record(header_text, data_line):
+    """Parse a single data line against the given header text (without pysam)"""
+    with stage("parse"):
+        return VcfRecord(header_text, data_line)
+
+
+def read_record(text):
+    """Parse the first VCF record from (normalized) text"""
+    header_lines, data_lines, _ = scan_vcf_text(text)
+    return parse_record("\n".join(header_lines), data_lines[0])
+
+
+def fetch_region(path, region, max_records=10000):
+    """Fetch the records overlapping region (chr:start-end) of an indexed VCF/BCF.
+
+    Only the BGZF blocks addressed by the .tbi/.csi index are read and
+    decoded. Returns the records and whether the region held more than
+    max_records records.
+    """
+    # pysam is only needed for binary and indexed access
+    import pysam
+
+    with pysam.VariantFile(path) as vcf:
+        if vcf.index is None:
+            raise ValueError(f"{path} has no .tbi/.csi index")
+        records = list(itertools.islice(vcf.fetch(region=region), max_records + 1))
+
+    return records[:max_records], len(records) > max_records
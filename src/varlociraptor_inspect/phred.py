@@ -0,0 +1,81 @@
+from typing import Sequence
+
+import numpy as np
+
+# Natural log probability per PHRED unit
+LOG_PROB_PER_PHRED = -np.log(10) / 10
+
+
+def phred_value(value):
+    """First PHRED score of an INFO value (number, string or sequence), or None"""
+    # Get first value if it's a sequence
+    if isinstance(value, Sequence) and not isinstance(value, str):
+        if len(value) == 0:
+            return None
+        value = value[0]
+
+    # Convert to float if it's a string (happens when header is missing)
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            return None
+    return value
+
+
+def phred_to_probs(phred_values):
+    """Convert an array of PHRED scores to probabilities in one array operation"""
+    return np.exp(phred_to_log_probs(phred_values))
+
+
+def phred_to_log_probs(phred_values):
+    """Convert an array of PHRED scores to natural log probabilities.
+
+    Unlike phred_to_probs, very high scores do not underflow to a probability
+    of 0 (only inf gives -inf).
+    """
+    return np.asarray(phred_values, dtype=np.float64) * LOG_PROB_PER_PHRED
+
+
+def log_sum_exp(log_probs, axis=-1):
+    """Natural log of the summed probabilities along an axis, skipping NaN.
+
+    The largest value is factored out before exponentiating, so the sum of
+    probabilities too small for a float is still exact. All NaN gives NaN.
+    """
+    log_probs = np.asarray(log_probs, dtype=np.float64)
+    missing = np.isnan(log_probs)
+    values = np.where(missing, -np.inf, log_probs)
+    peak = np.max(values, axis=axis, keepdims=True, initial=-np.inf)
+    peak[~np.isfinite(peak)] = 0
+    with np.errstate(divide="ignore"):
+        total = np.log(np.sum(np.exp(values - peak), axis=axis, keepdims=True)) + peak
+    total[np.all(missing, axis=axis, keepdims=True)] = np.nan
+    return np.squeeze(total, axis=axis)
+
+
+def normalize_log_probs(log_probs, axis=-1):
+    """Normalize natural log probabilities (e.g. of the events of each record) to sum to 1"""
+    log_probs = np.asarray(log_probs, dtype=np.float64)
+    with np.errstate(invalid="ignore"):
+        return log_probs - np.expand_dims(log_sum_exp(log_probs, axis), axis)
+
+
+def event_phreds(records, events=None):
+    """PHRED scores of the PROB_* events of a batch of records.
+
+    Returns the events (INFO keys, in order of appearance unless given) and a
+    records x events array, NaN where a record has no value.
+    """
+    columns = {} if events is None else {event: {} for event in events}
+    for i, record in enumerate(records):
+        for key, value in record.info.items():
+            if key.startswith("PROB_") and (events is None or key in columns):
+                value = phred_value(value)
+                if value is not None:
+                    columns.setdefault(key, {})[i] = value
+
+    phreds = np.full((len(records), len(columns)), np.nan)
+    for j, values in enumerate(columns.values()):
+        phreds[list(values), j] = list(values.values())
+    return list(columns), phreds
@@ -1,40 +1,97 @@
 import altair as alt
+import numpy as np
 import pandas as pd
-import re
-from typing import Sequence
 
-
-def phred_to_prob(phred_value):
-    """Convert PHRED score to probability"""
-    if phred_value is None:
-        return None
-    return 10 ** (-phred_value / 10)
+from varlociraptor_inspect.afd import decode_afd
+from varlociraptor_inspect.obs import OBS_LABELS, decode_obs, obs_string
+from varlociraptor_inspect.phred import (
+    LOG_PROB_PER_PHRED,
+    event_phreds,
+    phred_to_probs,
+)
+from varlociraptor_inspect.summary import count_bucket_labels
+
+# Decoded OBS column backing each observation metric
+OBS_METRIC_COLUMNS = {
+    "Posterior Odds": "odds",
+    "MAPQ": "mapq",
+    "Strand": "strand",
+    "Read Position": "read_position",
+    "Orientation": "orientation",
+    "Softclip": "softclip",
+    "Indel": "indel",
+    "Edit Distance": "edit_distance",
+}
+OBS_METRICS = list(OBS_METRIC_COLUMNS)
+
+# Samples per row of the compact AFD grid
+COMPACT_COLUMNS = 4
+
+AFD_TYPES = ["Distribution", "ML Estimate"]
+
+ODDS_ORDER = ["None", "Equal", "Barely", "Positive", "Strong", "Very Strong"]
+ODDS_COLORS = ["#AAAAAA", "#999999", "#D4EFF7", "#AFDFEE", "#6CC5E0", "#2DACD2"]
+
+# Define color mappings for categorical variables
+MAPQ_COLORS = {
+    "High MAPQ": "#4575b4",  # Blueish
+    "Low MAPQ": "#d73027",  # Reddish
+}
+
+STRAND_COLORS = {
+    "Forward strand": "#1f77b4",
+    "Reverse strand": "#ff7f0e",
+    "Both strands": "#2ca02c",
+}
+
+READ_POS_COLORS = {
+    "Most common position": "#d62728",
+    "Other position": "#9467bd",
+    "Irrelevant position": "#8c564b",
+}
+
+ORIENTATION_COLORS = {
+    "F1R2 orientation": "#e377c2",
+    "F2R1 orientation": "#7f7f7f",
+    "Unknown orientation": "#bcbd22",
+    "Non-standard orientation": "#17becf",
+}
+
+SOFTCLIP_COLORS = {
+    "Soft clipped": "#ff9896",
+    "No soft clipping": "#c5b0d5",
+}
+
+INDEL_COLORS = {
+    "Contains indel": "#c49c94",
+    "No indel": "#f7b6d2",
+}
+
+# Colors of all metrics sharing the "Category" legend
+OTHER_COLORS = {
+    **STRAND_COLORS,
+    **READ_POS_COLORS,
+    **ORIENTATION_COLORS,
+    **SOFTCLIP_COLORS,
+    **INDEL_COLORS,
+}
+
+
+def event_probabilities_data(record):
+    """Event probabilities from INFO column (PROB_* fields)"""
+    events, phreds = event_phreds([record])
+    # Converted in log space, PHRED inf is a probability of 0
+    return pd.DataFrame(
+        {
+            "Event": [event.replace("PROB_", "") for event in events],
+            "Probability": phred_to_probs(phreds[0]),
+        }
+    )
 
 
 def visualize_event_probabilities(record):
     """Visualize event probabilities from INFO column (PROB_* fields)"""
-    prob_data = []
-
-    for key, value in record.info.items():
-        if key.startswith("PROB_"):
-            event_name = key.replace("PROB_", "")
-
-            # Get first value if it's a sequence
-            if isinstance(value, Sequence) and not isinstance(value, str):
-                if len(value) == 0:
-                    continue
-                value = value[0]
-
-            # Convert to float if it's a string (happens when header is missing)
-            if isinstance(value, str):
-                try:
-                    value = float(value)
-                except ValueError:
-                    continue
-
-            probability = 0.0 if value == float("inf") else phred_to_prob(value)
-            prob_data.append({"Event": event_name, "Probability": probability})
-    df = pd.DataFrame(prob_data)
+    df = event_probabilities_data(record)
 
     return (
         alt.Chart(df)
@@ -51,59 +108,39 @@ def visualize_event_probabilities(record):
     )
 
 
-def visualize_allele_frequency_distribution(record, sample_name):
-    """Visualize allele frequency distribution (AFD field)"""
+def allele_frequency_data(record, sample_name):
+    """Allele frequency distribution points (AFD field) plus the ML estimate.
+
+    Returns None if the sample has no valid distribution.
+    """
     sample = record.samples[sample_name]
 
-    # Get AFD entries - use .get() for safe access
-    afd_entries = sample.get("AFD")
-    if afd_entries is None:
-        afd_entries = []
-    elif isinstance(afd_entries, str):
-        afd_entries = [afd_entries]
-    elif not isinstance(afd_entries, Sequence):
-        afd_entries = [afd_entries]
-
-    afd_data = []
-
-    # Process all distribution points with error handling
-    for entry in afd_entries:
-        if not isinstance(entry, str):
-            continue
-        for part in entry.split(","):
-            if "=" not in part:
-                continue
-            try:
-                freq, phred = part.split("=")
-                freq = float(freq)
-                prob = phred_to_prob(float(phred))
-                afd_data.append(
-                    {
-                        "Allele Frequency": freq,
-                        "Probability": prob,
-                        "Type": "Distribution",
-                    }
-                )
-            except (ValueError, TypeError):
-                # Skip malformed entries
-                continue
+    # Get AFD entries - use .get() for safe access, malformed points are skipped
+    afd = decode_afd(sample.get("AFD"))
+    freqs = afd["freq"]
+    probs = afd["prob"]
 
     # Only render the plot when the posterior distribution is available
-    if not afd_data:
+    if len(freqs) == 0:
         return None
 
     # Take ML estimate from the distribution - the entry with maximum probability
-    ml_entry = max(afd_data, key=lambda d: d["Probability"])
+    ml = np.argmax(probs)
 
-    afd_data.append(
+    return pd.DataFrame(
         {
-            "Allele Frequency": ml_entry["Allele Frequency"],
-            "Probability": ml_entry["Probability"],
-            "Type": "ML Estimate",
+            "Allele Frequency": np.append(freqs, freqs[ml]),
+            "Probability": np.append(probs, probs[ml]),
+            "Type": ["Distribution"] * len(freqs) + ["ML Estimate"],
         }
     )
 
-    df = pd.DataFrame(afd_data)
+
+def visualize_allele_frequency_distribution(record, sample_name):
+    """Visualize allele frequency distribution (AFD field)"""
+    df = allele_frequency_data(record, sample_name)
+    if df is None:
+        return None
 
     return (
         alt.Chart(df)
@@ -114,14 +151,14 @@ def visualize_allele_frequency_distribution(record, sample_name):
             alt.Color(
                 "Type:N",
                 scale=alt.Scale(
-                    domain=["Distribution", "ML Estimate"],
+                    domain=AFD_TYPES,
                     range=["blue", "red"],
                 ),
             ),
             alt.Size(
                 "Type:N",
                 scale=alt.Scale(
-                    domain=["Distribution", "ML Estimate"],
+                    domain=AFD_TYPES,
                     range=[60, 100],
                 ),
                 legend=None,
@@ -129,15 +166,15 @@ def visualize_allele_frequency_distribution(record, sample_name):
             alt.Opacity(
                 "Type:N",
                 scale=alt.Scale(
-                    domain=["Distribution", "ML Estimate"],
+                    domain=AFD_TYPES,
                     range=[0.7, 1.0],
                 ),
                 legend=None,
             ),
             tooltip=[
-                "Allele Frequency",
+                "Allele Frequency:Q",
                 alt.Tooltip("Probability:Q", format=".6f"),
-                "Type",
+                "Type:N",
             ],
         )
         .properties(
@@ -150,309 +187,203 @@ def visualize_allele_frequency_distribution(record, sample_name):
     )
 
 
-def visualize_observations(record, sample_name):
-    """Visualize observations from OBS field"""
-    sample = record.samples[sample_name]
-    obs = sample.get("OBS")
-
-    # Handle OBS - get the string value
-    if obs is None:
-        obs_string = ""
-    elif isinstance(obs, str):
-        obs_string = obs
-    elif isinstance(obs, Sequence):
-        if len(obs) == 0:
-            obs_string = ""
-        else:
-            obs_string = obs[0]
+def sample_obs_string(record, sample_name):
+    """OBS string of a sample ("" if missing)"""
+    return obs_string(record.samples[sample_name].get("OBS"))
+
+
+def observations_data(record, sample_name):
+    """REF and ALT observation panel data from the OBS field.
+
+    Returns the maximum stacked count and one dict per panel with the
+    allele, its rows (None without observations), the edit distance color
+    domain and whether the panel shows the legend.
+    """
+    decoded = decode_obs(sample_obs_string(record, sample_name))
+    counts = decoded["count"]
+
+    alt_mask = decoded["allele"] == 1
+    ref_index = np.flatnonzero(~alt_mask)
+    alt_index = np.flatnonzero(alt_mask)
+
+    max_count = max(int(counts[ref_index].sum()), int(counts[alt_index].sum()))
+
+    # Show legend on right panel if both have data, otherwise on whichever panel has data
+    if len(alt_index) > 0:
+        legend_allele = "ALT"
+    elif len(ref_index) > 0:
+        legend_allele = "REF"
     else:
-        obs_string = str(obs)
-
-    # Handle None or missing values
-    if obs_string is None or obs_string == ".":
-        obs_string = ""
-
-    ref_observations = []
-    alt_observations = []
-
-    # Pattern: COUNT + 2-letter odds + 8 single chars
-    pattern = r"(\d+)([a-zA-Z]{2})(.)(.)(.)(.)(.)(.)(.)(.)"
-    matches = re.findall(pattern, obs_string)
-
-    strand_map = {"+": "Forward strand", "-": "Reverse strand", "*": "Both strands"}
-    read_pos_map = {
-        "^": "Most common position",
-        "*": "Other position",
-        ".": "Irrelevant position",
-    }
-    orientation_map = {
-        ">": "F1R2 orientation",
-        "<": "F2R1 orientation",
-        "*": "Unknown orientation",
-        "!": "Non-standard orientation",
-    }
-    softclip_map = {"$": "Soft clipped", ".": "No soft clipping"}
-    indel_map = {"*": "Contains indel", ".": "No indel"}
-
-    for idx, match in enumerate(matches):
-        count = int(match[0])
-        odds_code = match[1]
-
-        # 8 fields from the match
-        edit_distance_char = match[2]
-        strand = match[5]
-        orientation = match[6]
-        read_position = match[7]
-        softclip = match[8]
-        indel = match[9]
-
-        allele_type = odds_code[0].upper()
-        kass = odds_code[1]
-
-        # Determine MAPQ from case of kass character
-        if kass.isupper():
-            mapq = "High MAPQ"
-        else:
-            mapq = "Low MAPQ"
-
-        kr_names = {
-            "N": "None",
-            "E": "Equal",
-            "B": "Barely",
-            "P": "Positive",
-            "S": "Strong",
-            "V": "Very Strong",
-            "n": "None",
-            "e": "Equal",
-            "b": "Barely",
-            "p": "Positive",
-            "s": "Strong",
-            "v": "Very Strong",
+        legend_allele = None
+
+    panels = []
+    for allele, obs_index in [("REF", ref_index), ("ALT", alt_index)]:
+        panel = {
+            "allele": allele,
+            "data": None,
+            "edit_domain": None,
+            "show_legend": allele == legend_allele,
         }
-
-        # Convert edit distance
-        edit_distance = (
-            0
-            if edit_distance_char == "."
-            else (int(edit_distance_char) if edit_distance_char.isdigit() else 0)
+        if len(obs_index) > 0:
+            panel["data"] = aggregate_observations(decoded, obs_index)
+
+            # Determine edit distance domain
+            edit_values = np.unique(decoded["edit_distance"][obs_index])
+            if len(edit_values) == 1:
+                k = int(edit_values[0])
+                panel["edit_domain"] = [0, k] if k > 0 else [0, 1]
+        panels.append(panel)
+
+    return panels, max_count
+
+
+def aggregate_observations(decoded, obs_index):
+    """Collapse the selected observations to one row per metric and category.
+
+    Counts are summed per category. Each row keeps the index of the first
+    observation of its category, so the stacking order follows the OBS field.
+    """
+    counts = decoded["count"][obs_index]
+    metrics = []
+    categories = []
+    category_counts = []
+    first_index = []
+
+    for metric, column in OBS_METRIC_COLUMNS.items():
+        codes, first, inverse = np.unique(
+            decoded[column][obs_index], return_index=True, return_inverse=True
         )
+        order = np.argsort(first, kind="stable")
+        metrics.append(np.full(len(codes), metric))
+        categories.append(OBS_LABELS[column][codes[order]])
+        category_counts.append(
+            np.bincount(inverse, weights=counts, minlength=len(codes))[order]
+        )
+        first_index.append(obs_index[first[order]])
 
-        obs_entry = {
-            "obs_index": idx,
-            "count": count,
-            "Posterior Odds": kr_names.get(kass, kass.upper()),
-            "MAPQ": mapq,
-            "Strand": strand_map.get(strand, strand),
-            "Read Position": read_pos_map.get(read_position, read_position),
-            "Orientation": orientation_map.get(orientation, orientation),
-            "Softclip": softclip_map.get(softclip, softclip),
-            "Indel": indel_map.get(indel, indel),
-            "Edit Distance": edit_distance,
+    return pd.DataFrame(
+        {
+            "Metric": np.concatenate(metrics),
+            "Category": np.concatenate(categories),
+            "Count": np.concatenate(category_counts).astype(np.int64),
+            "obs_index": np.concatenate(first_index),
         }
+    )
 
-        if allele_type == "A":
-            alt_observations.append(obs_entry)
-        else:
-            ref_observations.append(obs_entry)
-
-    metrics = [
-        "Posterior Odds",
-        "MAPQ",
-        "Strand",
-        "Read Position",
-        "Orientation",
-        "Softclip",
-        "Indel",
-        "Edit Distance",
-    ]
 
-    odds_order = ["None", "Equal", "Barely", "Positive", "Strong", "Very Strong"]
-    odds_colors = ["#AAAAAA", "#999999", "#D4EFF7", "#AFDFEE", "#6CC5E0", "#2DACD2"]
-
-    # Define color mappings for categorical variables
-    mapq_colors = {
-        "High MAPQ": "#4575b4",  # Blueish
-        "Low MAPQ": "#d73027",  # Reddish
-    }
-
-    strand_colors = {
-        "Forward strand": "#1f77b4",
-        "Reverse strand": "#ff7f0e",
-        "Both strands": "#2ca02c",
-    }
-
-    read_pos_colors = {
-        "Most common position": "#d62728",
-        "Other position": "#9467bd",
-        "Irrelevant position": "#8c564b",
-    }
-
-    orientation_colors = {
-        "F1R2 orientation": "#e377c2",
-        "F2R1 orientation": "#7f7f7f",
-        "Unknown orientation": "#bcbd22",
-        "Non-standard orientation": "#17becf",
-    }
-
-    softclip_colors = {
-        "Soft clipped": "#ff9896",
-        "No soft clipping": "#c5b0d5",
-    }
-
-    indel_colors = {
-        "Contains indel": "#c49c94",
-        "No indel": "#f7b6d2",
-    }
-
-    max_count = max(
-        sum(o["count"] for o in ref_observations) or 0,
-        sum(o["count"] for o in alt_observations) or 0,
+def _observation_layers(base, edit_domain, show_legend):
+    """Bar layers of an observation panel, each with its own color scale"""
+    edit_scale = (
+        alt.Scale(scheme="reds", domain=edit_domain)
+        if edit_domain
+        else alt.Scale(scheme="reds")
     )
 
-    def create_panel(observations, allele, show_y_axis=True, show_legend=True):
-        if not observations:
-            return (
-                alt.Chart(pd.DataFrame({"Metric": [], "Count": []}))
-                .mark_bar()
-                .properties(
-                    width=220,
-                    height=400,
-                    title=f"{allele} Allele Observations (No Data)",
-                )
+    odds_layer = (
+        base.transform_filter(alt.datum.Metric == "Posterior Odds")
+        .mark_bar(size=18)
+        .encode(
+            alt.Color(
+                "Category:N",
+                scale=alt.Scale(domain=ODDS_ORDER, range=ODDS_COLORS),
+                legend=alt.Legend(title="Posterior Odds") if show_legend else None,
             )
-
-        rows = []
-        for obs in observations:
-            for metric in metrics:
-                rows.append(
-                    {
-                        "Metric": metric,
-                        "Category": str(obs[metric]),
-                        "Count": obs["count"],
-                        "obs_index": obs["obs_index"],
-                    }
-                )
-
-        df = pd.DataFrame(rows)
-
-        # Determine edit distance domain
-        edit_values = (
-            df[df["Metric"] == "Edit Distance"]["Category"].astype(int).unique()
-        )
-        edit_domain = None
-        if len(edit_values) == 1:
-            k = int(edit_values[0])
-            edit_domain = [0, k] if k > 0 else [0, 1]
-
-        edit_scale = (
-            alt.Scale(scheme="reds", domain=edit_domain)
-            if edit_domain
-            else alt.Scale(scheme="reds")
-        )
-
-        base = alt.Chart(df).encode(
-            alt.X("Metric:N", sort=metrics, title=None),
-            alt.Y(
-                "Count:Q",
-                stack="zero",
-                scale=alt.Scale(domain=[0, max_count]),
-                title="Count" if show_y_axis else None,
-                axis=None if not show_y_axis else alt.Axis(),
-            ),
-            alt.Order("obs_index:Q"),
-            alt.Tooltip(["Metric", "Category", "Count"]),
         )
+    )
 
-        odds_layer = (
-            base.transform_filter(alt.datum.Metric == "Posterior Odds")
-            .mark_bar(size=18)
-            .encode(
-                alt.Color(
-                    "Category:N",
-                    scale=alt.Scale(domain=odds_order, range=odds_colors),
-                    legend=alt.Legend(title="Posterior Odds") if show_legend else None,
-                )
+    mapq_layer = (
+        base.transform_filter(alt.datum.Metric == "MAPQ")
+        .mark_bar(size=18)
+        .encode(
+            alt.Color(
+                "Category:N",
+                scale=alt.Scale(
+                    domain=list(MAPQ_COLORS.keys()),
+                    range=list(MAPQ_COLORS.values()),
+                ),
+                legend=alt.Legend(title="MAPQ") if show_legend else None,
             )
         )
+    )
 
-        mapq_layer = (
-            base.transform_filter(alt.datum.Metric == "MAPQ")
-            .mark_bar(size=18)
-            .encode(
-                alt.Color(
-                    "Category:N",
-                    scale=alt.Scale(
-                        domain=list(mapq_colors.keys()),
-                        range=list(mapq_colors.values()),
-                    ),
-                    legend=alt.Legend(title="MAPQ") if show_legend else None,
-                )
+    edit_layer = (
+        base.transform_filter(alt.datum.Metric == "Edit Distance")
+        .mark_bar(size=18)
+        .encode(
+            alt.Color(
+                "Category:Q",
+                scale=edit_scale,
+                legend=alt.Legend(title="Edit distance") if show_legend else None,
             )
         )
+    )
 
-        edit_layer = (
-            base.transform_filter(alt.datum.Metric == "Edit Distance")
-            .mark_bar(size=18)
-            .encode(
-                alt.Color(
-                    "Category:Q",
-                    scale=edit_scale,
-                    legend=alt.Legend(title="Edit distance") if show_legend else None,
-                )
+    other_layer = (
+        base.transform_filter(
+            (alt.datum.Metric != "Posterior Odds")
+            & (alt.datum.Metric != "MAPQ")
+            & (alt.datum.Metric != "Edit Distance")
+        )
+        .mark_bar(size=18)
+        .encode(
+            alt.Color(
+                "Category:N",
+                scale=alt.Scale(
+                    domain=list(OTHER_COLORS.keys()),
+                    range=list(OTHER_COLORS.values()),
+                ),
+                legend=alt.Legend(title="Category") if show_legend else None,
             )
         )
+    )
 
-        other_layer = (
-            base.transform_filter(
-                (alt.datum.Metric != "Posterior Odds")
-                & (alt.datum.Metric != "MAPQ")
-                & (alt.datum.Metric != "Edit Distance")
-            )
-            .mark_bar(size=18)
-            .encode(
-                alt.Color(
-                    "Category:N",
-                    scale=alt.Scale(
-                        domain=list(strand_colors.keys())
-                        + list(read_pos_colors.keys())
-                        + list(orientation_colors.keys())
-                        + list(softclip_colors.keys())
-                        + list(indel_colors.keys()),
-                        range=list(strand_colors.values())
-                        + list(read_pos_colors.values())
-                        + list(orientation_colors.values())
-                        + list(softclip_colors.values())
-                        + list(indel_colors.values()),
-                    ),
-                    legend=alt.Legend(title="Category") if show_legend else None,
-                )
+    return [odds_layer, mapq_layer, edit_layer, other_layer]
+
+
+def _observation_encoding(chart, max_count, show_y_axis=True):
+    return chart.encode(
+        alt.X("Metric:N", sort=OBS_METRICS, title=None),
+        alt.Y(
+            "Count:Q",
+            stack="zero",
+            scale=alt.Scale(domain=[0, max_count]),
+            title="Count" if show_y_axis else None,
+            axis=None if not show_y_axis else alt.Axis(),
+        ),
+        alt.Order("obs_index:Q"),
+        alt.Tooltip(["Metric:N", "Category:N", "Count:Q"]),
+    )
+
+
+def _observation_panel(panel, max_count, show_y_axis=True):
+    allele = panel["allele"]
+    df = panel["data"]
+
+    if df is None:
+        return (
+            alt.Chart(pd.DataFrame({"Metric": [], "Count": []}))
+            .mark_bar()
+            .properties(
+                width=220,
+                height=400,
+                title=f"{allele} Allele Observations (No Data)",
             )
         )
 
-        return (odds_layer + mapq_layer + edit_layer + other_layer).properties(
-            width=220, height=400, title=f"{allele} Allele Observations"
-        )
+    base = _observation_encoding(alt.Chart(df), max_count, show_y_axis)
+    layers = _observation_layers(base, panel["edit_domain"], panel["show_legend"])
+
+    return alt.layer(*layers).properties(
+        width=220, height=400, title=f"{allele} Allele Observations"
+    )
 
-    has_ref = len(ref_observations) > 0
-    has_alt = len(alt_observations) > 0
 
-    # Show legend on right panel if both have data, otherwise on whichever panel has data
-    if has_ref and has_alt:
-        # Both have data - show legend only on ALT (right side)
-        ref_chart = create_panel(ref_observations, "REF", True, False)
-        alt_chart = create_panel(alt_observations, "ALT", True, True)
-    elif has_ref and not has_alt:
-        # Only REF has data - show legend on REF
-        ref_chart = create_panel(ref_observations, "REF", True, True)
-        alt_chart = create_panel(alt_observations, "ALT", True, False)
-    elif has_alt and not has_ref:
-        # Only ALT has data - show legend on ALT
-        ref_chart = create_panel(ref_observations, "REF", True, False)
-        alt_chart = create_panel(alt_observations, "ALT", True, True)
-    else:
-        # Neither has data
-        ref_chart = create_panel(ref_observations, "REF", True, False)
-        alt_chart = create_panel(alt_observations, "ALT", True, False)
+def visualize_observations(record, sample_name):
+    """Visualize observations from OBS field"""
+    panels, max_count = observations_data(record, sample_name)
+    ref_chart, alt_chart = [
+        _observation_panel(panel, max_count, True) for panel in panels
+    ]
 
     return (
         alt.hconcat(ref_chart, alt_chart, spacing=10)
@@ -461,3 +392,271 @@ def visualize_observations(record, sample_name):
         .configure_view(strokeWidth=0)
         .configure_axis(grid=False)
     )
+
+
+def json_records(df):
+    """DataFrame rows as JSON-compatible dicts (non-finite and missing values become None)"""
+    columns = []
+    for name in df.columns:
+        values = df[name].to_numpy()
+        if values.dtype.kind == "f":
+            invalid = ~np.isfinite(values)
+            values = values.astype(object)
+            values[invalid] = None
+        elif values.dtype.kind == "O":
+            invalid = df[name].isna().to_numpy()
+            if invalid.any():
+                values = values.copy()
+                values[invalid] = None
+        columns.append(values.tolist())
+    return [dict(zip(df.columns, row)) for row in zip(*columns)]
+
+
+def samples_data(record, sample_names):
+    """AFD points and aggregated observations of all samples as one list of rows.
+
+    Rows are tagged with their Sample and Panel ("AFD" or "OBS", observations
+    also with their Allele) and only hold the fields of their panel. Returns
+    the rows, the maximum stacked observation count and the edit distance
+    color domain.
+    """
+    rows = []
+    max_count = 0
+    edit_values = set()
+
+    for sample_name in sample_names:
+        afd = allele_frequency_data(record, sample_name)
+        if afd is not None:
+            rows.extend(
+                {"Sample": sample_name, "Panel": "AFD", **row}
+                for row in json_records(afd)
+            )
+
+        panels, sample_max_count = observations_data(record, sample_name)
+        max_count = max(max_count, sample_max_count)
+        for panel in panels:
+            df = panel["data"]
+            if df is None:
+                continue
+            edit_values.update(df.loc[df["Metric"] == "Edit Distance", "Category"])
+            rows.extend(
+                {
+                    "Sample": sample_name,
+                    "Panel": "OBS",
+                    "Allele": panel["allele"],
+                    **row,
+                }
+                for row in json_records(df)
+            )
+
+    # Same rule as for a single panel, over the observations of all samples
+    edit_domain = None
+    if len(edit_values) == 1:
+        k = int(edit_values.pop())
+        edit_domain = [0, k] if k > 0 else [0, 1]
+
+    return rows, max_count, edit_domain
+
+
+def visualize_samples(record, sample_names):
+    """Visualize AFD and observations of all samples in one chart.
+
+    AFD curves are wrapped into a grid with one cell per sample, observation
+    bars are laid out with one row per sample. Both share a single dataset.
+    Samples without AFD or observations are left out of the respective grid.
+    """
+    rows, max_count, edit_domain = samples_data(record, sample_names)
+    if not rows:
+        return None
+    data = alt.InlineData(values=rows)
+
+    afd_chart = (
+        alt.Chart(data)
+        .transform_filter(alt.datum.Panel == "AFD")
+        .mark_circle()
+        .encode(
+            alt.X("Allele Frequency:Q"),
+            alt.Y("Probability:Q", axis=None),
+            alt.Color(
+                "Type:N",
+                scale=alt.Scale(domain=AFD_TYPES, range=["blue", "red"]),
+            ),
+            alt.Size(
+                "Type:N",
+                scale=alt.Scale(domain=AFD_TYPES, range=[60, 100]),
+                legend=None,
+            ),
+            alt.Opacity(
+                "Type:N",
+                scale=alt.Scale(domain=AFD_TYPES, range=[0.7, 1.0]),
+                legend=None,
+            ),
+            tooltip=[
+                "Allele Frequency:Q",
+                alt.Tooltip("Probability:Q", format=".6f"),
+                "Type:N",
+            ],
+        )
+        .properties(width=180, height=120)
+        .facet(
+            alt.Facet("Sample:N", sort=list(sample_names), title=None),
+            columns=COMPACT_COLUMNS,
+            title="Allele Frequency Distribution (ML Estimate in Red)",
+        )
+    )
+
+    base = _observation_encoding(
+        alt.Chart(data).transform_filter(alt.datum.Panel == "OBS"), max_count
+    )
+    obs_chart = (
+        alt.layer(*_observation_layers(base, edit_domain, True))
+        .properties(width=220, height=200)
+        .facet(
+            row=alt.Row("Sample:N", sort=list(sample_names), title=None),
+            column=alt.Column("Allele:N", sort=["REF", "ALT"], title=None),
+            title="Observations",
+        )
+    )
+
+    return (
+        alt.vconcat(afd_chart, obs_chart, spacing=30)
+        .configure_legend(orient="right")
+        .configure_view(strokeWidth=0)
+        .configure_axis(grid=False)
+    )
+
+
+def unit_histogram_data(histograms, key_name, value_name):
+    """Long-form rows of [0, 1] histograms, one per key, with bin bounds"""
+    rows = []
+    for key, counts in histograms.items():
+        num_bins = len(counts)
+        for i, count in enumerate(counts):
+            rows.append(
+                {
+                    key_name: key,
+                    value_name: i / num_bins,
+                    "End": (i + 1) / num_bins,
+                    "Records": int(count),
+                }
+            )
+    return pd.DataFrame(rows, columns=[key_name, value_name, "End", "Records"])
+
+
+def _unit_histogram(df, key_name, value_name, title):
+    return (
+        alt.Chart(df)
+        .mark_bar()
+        .encode(
+            alt.X(f"{value_name}:Q", bin="binned", scale=alt.Scale(domain=[0, 1])),
+            alt.X2("End:Q"),
+            alt.Y("Records:Q"),
+            tooltip=[
+                alt.Tooltip(f"{key_name}:N"),
+                alt.Tooltip(f"{value_name}:Q", format=".2f"),
+                alt.Tooltip("End:Q", format=".2f"),
+                alt.Tooltip("Records:Q"),
+            ],
+        )
+        .properties(width=400, height=120)
+        .facet(row=alt.Row(f"{key_name}:N", title=None))
+        .properties(title=title)
+    )
+
+
+def visualize_summary_events(summary):
+    """Histograms of the PROB_* event probabilities of all summarized records"""
+    df = unit_histogram_data(summary.events, "Event", "Probability")
+    return _unit_histogram(df, "Event", "Probability", "Event Probabilities")
+
+
+def visualize_summary_allele_frequencies(summary):
+    """Histograms of the ML allele frequency estimates of each sample"""
+    df = unit_histogram_data(summary.ml_af, "Sample", "Allele Frequency")
+    return _unit_histogram(
+        df, "Sample", "Allele Frequency", "Maximum Likelihood Allele Frequencies"
+    )
+
+
+def visualize_summary_observations(summary):
+    """Histograms of the REF and ALT observation counts per record of each sample"""
+    labels = count_bucket_labels()
+    rows = [
+        {
+            "Sample": sample_name,
+            "Allele": allele,
+            "Observations": label,
+            "Records": int(count),
+        }
+        for (sample_name, allele), counts in summary.obs_counts.items()
+        for label, count in zip(labels, counts)
+        if count
+    ]
+    df = pd.DataFrame(rows, columns=["Sample", "Allele", "Observations", "Records"])
+
+    return (
+        alt.Chart(df)
+        .mark_bar()
+        .encode(
+            alt.X("Observations:O", sort=labels),
+            alt.Y("Records:Q"),
+            alt.XOffset("Allele:N"),
+            alt.Color(
+                "Allele:N",
+                scale=alt.Scale(domain=["REF", "ALT"], range=["#AAAAAA", "#2DACD2"]),
+            ),
+            tooltip=[
+                alt.Tooltip("Sample:N"),
+                alt.Tooltip("Allele:N"),
+                alt.Tooltip("Observations:O"),
+                alt.Tooltip("Records:Q"),
+            ],
+        )
+        .properties(width=400, height=120)
+        .facet(row=alt.Row("Sample:N", title=None))
+        .properties(title="Observations per Record")
+    )
+
+
+def expected_fdr_data(fdr):
+    """Expected FDR at each threshold of an fdr.ExpectedFdr"""
+    curve = fdr.curve()
+    return pd.DataFrame(
+        {
+            "Threshold": curve["threshold"],
+            # Probability of the events at the threshold (if all events sum to 1)
+            "Event Probability": -np.expm1(curve["threshold"] * LOG_PROB_PER_PHRED),
+            "Calls": curve["calls"],
+            "Expected False Discoveries": np.exp(curve["log_false_discoveries"]),
+            "Expected FDR": curve["fdr"],
+        }
+    )
+
+
+def visualize_expected_fdr(fdr):
+    """Expected FDR of the records called at each false discovery probability threshold"""
+    df = expected_fdr_data(fdr)
+    # A log scale cannot show an FDR of 0
+    df = df[df["Expected FDR"] > 0]
+
+    return (
+        alt.Chart(df)
+        .mark_line(interpolate="step-before")
+        .encode(
+            alt.X(
+                "Threshold:Q",
+                title="Threshold (PHRED scaled false discovery probability)",
+            ),
+            alt.Y("Expected FDR:Q", scale=alt.Scale(type="log")),
+            tooltip=[
+                alt.Tooltip("Threshold:Q", format=".1f"),
+                alt.Tooltip("Event Probability:Q", format=".6f"),
+                alt.Tooltip("Calls:Q"),
+                alt.Tooltip("Expected False Discoveries:Q", format=".3f"),
+                alt.Tooltip("Expected FDR:Q", format=".3e"),
+            ],
+        )
+        .properties(
+            title=f"Expected FDR ({' or '.join(fdr.events)})", width=400, height=300
+        )
+    )
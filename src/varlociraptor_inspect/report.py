@@ -0,0 +1,141 @@
+"""Merge the manifests of batch rendering runs into one report index.
+
+Usage: python -m varlociraptor_inspect.report reports/
+
+Checks that the manifests of all N slices of a --shard i/N run (or the single
+manifest of an unsharded run) are present, merges their summaries in slice
+order and writes index.html (summary charts and links to all rendered
+records in file order) and index.json.
+"""
+
+import argparse
+import glob
+import html
+import json
+import os
+import sys
+
+import altair as alt
+
+from varlociraptor_inspect import plotting
+from varlociraptor_inspect.batch import HTML_TEMPLATE
+from varlociraptor_inspect.summary import Summary
+
+# Manifest fields that must agree between the slices of one run
+RUN_FIELDS = ["input", "region", "shard_by", "format", "filter"]
+
+
+def load_manifests(output_dir):
+    """Manifests written to output_dir, sorted by slice"""
+    manifests = []
+    for path in glob.glob(os.path.join(output_dir, "manifest*.json")):
+        with open(path) as f:
+            manifests.append(json.load(f))
+    if not manifests:
+        raise ValueError(f"No manifests found in {output_dir}")
+    return sorted(manifests, key=lambda manifest: manifest["shard"] or [0, 0])
+
+
+def check_manifests(manifests):
+    """Raise a ValueError unless the manifests are the complete slices of one run"""
+    for field in RUN_FIELDS:
+        values = {manifest.get(field) for manifest in manifests}
+        if len(values) > 1:
+            raise ValueError(f"Manifests of different runs ({field}: {values})")
+
+    shards = [manifest["shard"] for manifest in manifests]
+    if None in shards:
+        if len(shards) > 1:
+            raise ValueError("Manifests of a sharded and an unsharded run")
+        return
+
+    counts = {count for _, count in shards}
+    if len(counts) > 1:
+        raise ValueError(f"Manifests of runs with different shard counts: {counts}")
+    count = counts.pop()
+    missing = sorted(set(range(1, count + 1)) - {index for index, _ in shards})
+    if missing:
+        raise ValueError(
+            "Missing shards: " + ", ".join(f"{index}/{count}" for index in missing)
+        )
+
+
+def merge_manifests(manifests):
+    """Entries of all rendered records in file order and the merged summary"""
+    summary = Summary()
+    entries = []
+    for manifest in manifests:
+        summary.merge(Summary.from_dict(manifest["summary"]))
+        entries.extend(manifest["records"])
+    # By shard number (of region shards) and record index, not by file name
+    entries.sort(key=lambda entry: (entry.get("shard", 0), entry["index"]))
+    return entries, summary
+
+
+def render_index(title, entries, summary):
+    """Standalone HTML page with the summary charts and links to all records"""
+    sections = [f"  <h2>Summary ({summary.records} records)</h2>"]
+    specs = {}
+    for name, visualize in [
+        ("events", plotting.visualize_summary_events),
+        ("allele_frequencies", plotting.visualize_summary_allele_frequencies),
+        ("observations", plotting.visualize_summary_observations),
+    ]:
+        sections.append(f'  <div id="{name}"></div>')
+        specs[name] = visualize(summary).to_dict()
+
+    sections.append("  <h2>Records</h2>\n  <ol>")
+    for entry in entries:
+        sections.append(
+            f'    <li><a href="{html.escape(entry["file"])}">'
+            f"{html.escape(entry['record'])}</a></li>"
+        )
+    sections.append("  </ol>")
+
+    return HTML_TEMPLATE.format(
+        title=html.escape(title),
+        sections="\n".join(sections),
+        specs=json.dumps(specs),
+        vega_version=alt.VEGA_VERSION,
+        vegalite_version=alt.VEGALITE_VERSION,
+        vegaembed_version=alt.VEGAEMBED_VERSION,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Merge batch rendering runs into one report index."
+    )
+    parser.add_argument("output_dir", help="Output directory of the batch runs")
+    args = parser.parse_args(argv)
+
+    try:
+        manifests = load_manifests(args.output_dir)
+        check_manifests(manifests)
+    except ValueError as e:
+        parser.error(str(e))
+
+    entries, summary = merge_manifests(manifests)
+    title = os.path.basename(manifests[0]["input"])
+
+    with open(os.path.join(args.output_dir, "index.html"), "w") as out:
+        out.write(render_index(title, entries, summary))
+    with open(os.path.join(args.output_dir, "index.json"), "w") as out:
+        json.dump(
+            {
+                "input": manifests[0]["input"],
+                "region": manifests[0]["region"],
+                "records": entries,
+                "summary": summary.to_dict(),
+            },
+            out,
+        )
+
+    print(
+        f"Merged {len(manifests)} manifest(s) with {len(entries)} records",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
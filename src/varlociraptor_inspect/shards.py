@@ -0,0 +1,101 @@
+"""Parallel processing of indexed VCF/BCF files in contig or region shards.
+
+A shard is a (contig, start, stop, first) tuple of 0-based, half-open
+coordinates (stop None for the end of the contig), with first set for the
+first shard of a contig (or region). Each record belongs to the shard
+containing its start position, so shards partition the file without
+duplicating records that span a shard boundary. The first shard also keeps
+the records overlapping its start, like fetching the region does. Every
+worker process opens its own pysam.VariantFile and fetches its shard through
+the index, and results are returned in shard order, so merging them is
+deterministic.
+"""
+
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+_REGION_PATTERN = re.compile(r"^(.+?)(?::([\d,]+)(?:-([\d,]+))?)?$")
+
+
+def parse_region(region):
+    """Split a chr:start-end region into a 0-based, half-open (contig, start, stop)"""
+    match = _REGION_PATTERN.match(region.strip())
+    if match is None:
+        raise ValueError(f"Invalid region: {region}")
+    contig, start, stop = match.groups()
+    start = int(start.replace(",", "")) - 1 if start else 0
+    stop = int(stop.replace(",", "")) if stop else None
+    return contig, max(start, 0), stop
+
+
+def contig_lengths(vcf):
+    """Contigs of an indexed file in header order with their length (or None)"""
+    lengths = {name: contig.length for name, contig in vcf.header.contigs.items()}
+    # Contigs only known to the index come last
+    for name in vcf.index:
+        lengths.setdefault(name, None)
+    return lengths
+
+
+def make_shards(vcf, region=None, shard_size=None):
+    """Shards covering an indexed file (or a region of it).
+
+    Without shard_size, each contig is one shard. Otherwise contigs of known
+    length are split into shard_size bases long shards.
+    """
+    if vcf.index is None:
+        raise ValueError("Sharded processing requires an indexed VCF/BCF file")
+
+    lengths = contig_lengths(vcf)
+    if region:
+        contig, start, stop = parse_region(region)
+        if contig not in lengths:
+            raise ValueError(f"Unknown contig: {contig}")
+        lengths = {contig: lengths[contig]}
+    else:
+        start, stop = 0, None
+
+    shards = []
+    for contig, length in lengths.items():
+        end = stop if stop is not None else length
+        if not shard_size or end is None:
+            shards.append((contig, start, end, True))
+            continue
+        for shard_start in range(start, end, shard_size):
+            shard_stop = min(shard_start + shard_size, end)
+            shards.append((contig, shard_start, shard_stop, shard_start == start))
+    return shards
+
+
+def shard_records(vcf, shard):
+    """Records of an indexed file starting within a shard (or overlapping the
+    start of a first shard)"""
+    contig, start, stop, first = shard
+    if contig not in vcf.index:
+        return
+    for record in vcf.fetch(contig, start, stop):
+        if first or record.start >= start:
+            yield record
+
+
+def _process_shard(args):
+    # pysam is only needed for indexed access
+    import pysam
+
+    path, shard, func, func_args = args
+    with pysam.VariantFile(path) as vcf:
+        return func(vcf, shard, *func_args)
+
+
+def map_shards(path, func, shards, jobs=1, args=()):
+    """Call func(vcf, shard, *args) for each shard in its own worker process.
+
+    func and args must be picklable. Yields the results in shard order.
+    """
+    tasks = [(path, shard, func, args) for shard in shards]
+    if jobs <= 1:
+        yield from map(_process_shard, tasks)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        yield from pool.map(_process_shard, tasks)
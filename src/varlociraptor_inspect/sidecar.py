@@ -0,0 +1,455 @@
+"""Persistent summary index ("sidecar") of a VCF/BCF file.
+
+The sidecar is stored next to the file (calls.bcf.inspect.npz) and holds,
+per record, its offset in the file (as returned by VariantFile.tell), CHROM,
+POS, REF and ALT, the PHRED score and log probability of each PROB_* event
+and the filter fields of each sample (see filters.SAMPLE_FIELDS: ML allele
+frequency, DP and REF/ALT observation counts). Navigating, sorting and filtering only read
+the sidecar, records are decoded when one is opened.
+
+A sidecar is valid for a file of the same size and modification time.
+Otherwise it is updated: records are indexed in segments (runs of records on
+one contig) and, in BGZF compressed files, a segment whose compressed blocks
+are found unchanged (possibly moved) is reused, so only appended blocks and
+changed contigs are indexed again. Blocks are compared by a sampled hash (the
+length and a few evenly spaced windows of the bytes), so checking a segment
+does not read all of it.
+"""
+
+import hashlib
+import json
+import os
+from typing import Any
+
+import numpy as np
+
+from varlociraptor_inspect.filters import SAMPLE_FIELDS, decode_columns
+from varlociraptor_inspect.phred import event_phreds, phred_to_log_probs
+
+SIDECAR_SUFFIX = ".inspect.npz"
+SIDECAR_VERSION = 3
+BATCH_SIZE = 10000
+SAMPLE_WINDOWS = 16
+SAMPLE_WINDOW_SIZE = 4096
+
+
+def sidecar_path(path):
+    return path + SIDECAR_SUFFIX
+
+
+def file_state(path):
+    """Size and modification time identifying a file version"""
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def sampled_hash(f, start, end, windows=SAMPLE_WINDOWS, window_size=SAMPLE_WINDOW_SIZE):
+    """SHA-256 of the length and evenly spaced windows of the bytes start:end of a file.
+
+    Ranges of up to windows * window_size bytes are hashed completely.
+    """
+    length = end - start
+    digest = hashlib.sha256(str(length).encode())
+    if length <= windows * window_size:
+        f.seek(start)
+        digest.update(f.read(length))
+    else:
+        for i in range(windows):
+            f.seek(start + i * (length - window_size) // (windows - 1))
+            digest.update(f.read(window_size))
+    return digest.hexdigest()
+
+
+def is_bgzf(f):
+    """Whether a file is BGZF compressed (a .vcf.gz or .bcf file)"""
+    f.seek(0)
+    header = f.read(16)
+    return (
+        len(header) == 16
+        and header[:2] == b"\x1f\x8b"
+        and header[3] & 4 != 0
+        and header[12:14] == b"BC"
+    )
+
+
+def block_range(f, start, end):
+    """Compressed bytes of the BGZF blocks holding the data between two virtual offsets"""
+    stop = end >> 16
+    if end & 0xFFFF:
+        # The block is shared with the following records, BSIZE is its size - 1
+        f.seek(stop + 16)
+        stop += int.from_bytes(f.read(2), "little") + 1
+    return start >> 16, stop
+
+
+def _pack_strings(strings):
+    """Concatenated UTF-8 bytes and start offsets of strings (see Sidecar.alleles)"""
+    encoded = [string.encode() for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(string) for string in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+class Sidecar:
+    """Columnar summary index of the records of a VCF/BCF file.
+
+    Columns: offset, chrom (index into contigs), pos, log_probs (natural log
+    probabilities, records x events), phreds (the PHRED scores they are
+    derived from), fields (records x samples x SAMPLE_FIELDS) and the packed
+    REF and ALT strings. phreds and fields are float64 like decode_columns,
+    so filters compare the same values. segments are the runs of
+    records on one contig, with their rows, virtual offsets and (for BGZF
+    files) the range and sampled hash of their compressed blocks.
+    """
+
+    def __init__(self, state, layout, contigs, events, samples, segments, columns):
+        self.state = state
+        self.layout = layout
+        self.contigs = contigs
+        self.events = events
+        self.samples = samples
+        self.segments = segments
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.columns["offset"])
+
+    @classmethod
+    def build(cls, path, batch_size=BATCH_SIZE, progress=None, previous=None):
+        """Index all records of a file, calling progress with the records indexed.
+
+        Unchanged segments of a previous sidecar of the file are reused
+        instead of being indexed again.
+        """
+        # pysam is only needed for indexing and reading records
+        import pysam
+
+        state = file_state(path)
+        with pysam.VariantFile(path) as vcf, open(path, "rb") as f:
+            layout = {
+                "header_sha256": hashlib.sha256(str(vcf.header).encode()).hexdigest(),
+                "data_start": vcf.tell(),
+                "bgzf": is_bgzf(f),
+            }
+            if previous is None or previous.layout != layout or not layout["bgzf"]:
+                # Nothing to reuse
+                previous = cls(state, layout, [], [], [], [], {})
+
+            events = [key for key in vcf.header.info if key.startswith("PROB_")]
+            samples = list(vcf.header.samples)
+            contigs = {contig: i for i, contig in enumerate(previous.contigs)}
+            pieces = []
+            segments = []
+            rows = 0
+            indexed = 0
+            next_segment = 0
+
+            def indexed_batch(batch):
+                nonlocal indexed
+                pieces.append(_index_batch(batch, contigs, events, samples))
+                indexed += len(batch)
+                if progress is not None:
+                    progress(indexed)
+
+            cursor = layout["data_start"]
+            while True:
+                vcf.seek(cursor)
+                record = next(vcf, None)
+                if record is None:
+                    break
+
+                segment: dict[str, Any]
+                match = previous.find_segment(f, record.chrom, cursor, next_segment)
+                if match is not None:
+                    next_segment, delta = match
+                    segment = dict(previous.segments[next_segment])
+                    next_segment += 1
+                    start, stop = segment["rows"]
+                    pieces.append(previous.rows(start, stop, delta))
+                    end = segment["end"] + (delta << 16)
+                    segment["range"] = [
+                        segment["range"][0] + delta,
+                        segment["range"][1] + delta,
+                    ]
+                else:
+                    end = _index_run(
+                        vcf, cursor, record.chrom, batch_size, indexed_batch
+                    )
+                    segment = {}
+                    if layout["bgzf"]:
+                        segment["range"] = list(block_range(f, cursor, end))
+                        segment["digest"] = sampled_hash(f, *segment["range"])
+
+                count = sum(len(piece["offset"]) for piece in pieces) - rows
+                segment.update(
+                    contig=record.chrom,
+                    rows=[rows, rows + count],
+                    start=cursor,
+                    end=end,
+                )
+                segments.append(segment)
+                rows += count
+                cursor = end
+
+        columns = _join_pieces(pieces, len(events), len(samples))
+        return cls(state, layout, list(contigs), events, samples, segments, columns)
+
+    def find_segment(self, f, chrom, start, first=0):
+        """Index (from first on) of a segment found unchanged at virtual offset start.
+
+        Returns the index and the distance (in compressed bytes) the segment
+        moved, None if no segment on chrom is found.
+        """
+        for i in range(first, len(self.segments)):
+            segment = self.segments[i]
+            if (
+                segment["contig"] != chrom
+                or segment["start"] & 0xFFFF != start & 0xFFFF
+            ):
+                continue
+            delta = (start >> 16) - (segment["start"] >> 16)
+            begin, stop = segment["range"]
+            if sampled_hash(f, begin + delta, stop + delta) == segment["digest"]:
+                return i, delta
+        return None
+
+    def rows(self, start, stop, delta=0):
+        """Columns of rows start:stop (like _index_batch), moved by delta bytes"""
+        allele_offsets = self.columns["allele_offsets"]
+        piece = {
+            name: self.columns[name][start:stop]
+            for name in ["chrom", "pos", "log_probs", "phreds", "fields"]
+        }
+        # Virtual offsets keep the position within the block in the lower 16 bits
+        piece["offset"] = self.columns["offset"][start:stop] + (delta << 16)
+        piece["alleles"] = self.columns["alleles"][
+            allele_offsets[start] : allele_offsets[stop]
+        ]
+        piece["allele_lengths"] = np.diff(allele_offsets[start : stop + 1])
+        return piece
+
+    @classmethod
+    def read(cls, path):
+        """Sidecar of a file, None if there is none (it may be outdated)"""
+        try:
+            with np.load(sidecar_path(path)) as data:
+                meta = json.loads(data["meta"].item())
+                if meta.get("version") != SIDECAR_VERSION:
+                    return None
+                columns = {key: data[key] for key in data.files if key != "meta"}
+        except (OSError, ValueError, KeyError):
+            return None
+
+        return cls(
+            meta["state"],
+            meta["layout"],
+            meta["contigs"],
+            meta["events"],
+            meta["samples"],
+            meta["segments"],
+            columns,
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Sidecar of a file, None if there is none or it is outdated"""
+        sidecar = cls.read(path)
+        if sidecar is None or sidecar.state != file_state(path):
+            return None
+        return sidecar
+
+    def save(self, path):
+        """Write the sidecar next to the file (atomically replacing an old one)"""
+        meta = {
+            "version": SIDECAR_VERSION,
+            "state": self.state,
+            "layout": self.layout,
+            "contigs": self.contigs,
+            "events": self.events,
+            "samples": self.samples,
+            "segments": self.segments,
+        }
+        target = sidecar_path(path)
+        # np.savez appends .npz to names without it
+        partial = target + ".partial.npz"
+        np.savez(partial, meta=np.array(json.dumps(meta)), **self.columns)
+        os.replace(partial, target)
+
+    def alleles(self, row):
+        """REF and ALT of a record"""
+        start, end = self.columns["allele_offsets"][row : row + 2]
+        return bytes(self.columns["alleles"][start:end]).decode().split("\t")
+
+    def summaries(self, rows):
+        """Navigator summaries (like parsing.summarize_record) of some records"""
+        log_probs = self.columns["log_probs"]
+        summaries = []
+        for row in rows:
+            ref, alt = self.alleles(row)
+            known = ~np.isnan(log_probs[row])
+            top = (
+                int(np.argmax(np.where(known, log_probs[row], -np.inf)))
+                if known.any()
+                else None
+            )
+            summaries.append(
+                {
+                    "CHROM": self.contigs[self.columns["chrom"][row]],
+                    "POS": int(self.columns["pos"][row]),
+                    "REF": ref,
+                    "ALT": alt,
+                    "Top Event": None if top is None else self.events[top][5:],
+                    "Probability": (
+                        None if top is None else float(np.exp(log_probs[row, top]))
+                    ),
+                }
+            )
+        return summaries
+
+    def column(self, name, sample=None):
+        """Log probabilities of a PROB_* event or values of a sample field of all records.
+
+        Log probabilities sort like probabilities, also where these would
+        underflow to 0.
+        """
+        if name in self.events:
+            return self.columns["log_probs"][:, self.events.index(name)]
+        return self.columns["fields"][
+            :, self.samples.index(sample), SAMPLE_FIELDS.index(name)
+        ]
+
+    def filter_columns(self, fields):
+        """Columns of the (field, sample) fields of a filter (see decode_columns)"""
+        columns = {}
+        for name, sample in fields:
+            if name.startswith("PROB_"):
+                if name in self.events:
+                    values = self.columns["phreds"][:, self.events.index(name)]
+                else:
+                    values = np.full(len(self), np.nan)
+                columns[(name, sample)] = values.reshape(-1, 1)
+            else:
+                field = self.columns["fields"][:, :, SAMPLE_FIELDS.index(name)]
+                if sample is not None:
+                    field = field[:, [self.samples.index(sample)]]
+                columns[(name, sample)] = field
+        return columns
+
+    def select(self, record_filter):
+        """Rows of the records passing a filter"""
+        record_filter.check_samples(self.samples)
+        mask = record_filter(self.filter_columns(record_filter.fields))
+        return np.flatnonzero(mask)
+
+    def read_record(self, vcf, row):
+        """Decode a single record of an open VariantFile"""
+        vcf.seek(int(self.columns["offset"][row]))
+        return next(vcf)
+
+
+def _empty_column(name, num_events, num_samples):
+    if name in ("log_probs", "phreds"):
+        return np.empty((0, num_events))
+    if name == "fields":
+        return np.empty((0, num_samples, len(SAMPLE_FIELDS)))
+    return np.empty(0, dtype=np.int64)
+
+
+def _located(vcf, start):
+    """(offset, record) pairs from virtual offset start on, (offset, None) at the end"""
+    vcf.seek(start)
+    while True:
+        offset = vcf.tell()
+        record = next(vcf, None)
+        yield offset, record
+        if record is None:
+            return
+
+
+def _index_run(vcf, start, chrom, batch_size, indexed_batch):
+    """Pass the records from start on up to the first not on chrom to indexed_batch
+    in batches, return the offset following the last one"""
+    batch = []
+    for offset, record in _located(vcf, start):
+        if record is None or record.chrom != chrom:
+            break
+        batch.append((offset, record))
+        if len(batch) == batch_size:
+            indexed_batch(batch)
+            batch = []
+    if batch:
+        indexed_batch(batch)
+    return offset
+
+
+def _join_pieces(pieces, num_events, num_samples):
+    """Concatenate the columns of batches and reused rows"""
+    columns = {}
+    for name in ["offset", "chrom", "pos", "log_probs", "phreds", "fields"]:
+        columns[name] = (
+            np.concatenate([piece[name] for piece in pieces])
+            if pieces
+            else _empty_column(name, num_events, num_samples)
+        )
+    lengths = [piece["allele_lengths"] for piece in pieces]
+    columns["alleles"] = np.concatenate(
+        [np.empty(0, np.uint8)] + [piece["alleles"] for piece in pieces]
+    )
+    columns["allele_offsets"] = np.zeros(sum(map(len, lengths)) + 1, dtype=np.int64)
+    np.cumsum(
+        np.concatenate([np.empty(0, np.int64)] + lengths),
+        out=columns["allele_offsets"][1:],
+    )
+    return columns
+
+
+def _index_batch(batch, contigs, events, samples):
+    """Columns of a batch of (offset, record) pairs"""
+    records = [record for _, record in batch]
+
+    _, phreds = event_phreds(records, events)
+
+    decoded = decode_columns(
+        records,
+        samples,
+        [(name, sample) for sample in samples for name in SAMPLE_FIELDS],
+    )
+    fields = np.empty((len(records), len(samples), len(SAMPLE_FIELDS)))
+    for j, sample in enumerate(samples):
+        for k, name in enumerate(SAMPLE_FIELDS):
+            fields[:, j, k] = decoded[(name, sample)][:, 0]
+
+    alleles, allele_offsets = _pack_strings(
+        f"{record.ref}\t{','.join(record.alts or ['.'])}" for record in records
+    )
+    return {
+        "offset": np.array([offset for offset, _ in batch], dtype=np.int64),
+        "chrom": np.array(
+            [contigs.setdefault(record.chrom, len(contigs)) for record in records],
+            dtype=np.int32,
+        ),
+        "pos": np.array([record.pos for record in records], dtype=np.int64),
+        "log_probs": phred_to_log_probs(phreds),
+        "phreds": phreds,
+        "fields": fields,
+        "alleles": alleles,
+        "allele_lengths": np.diff(allele_offsets),
+    }
+
+
+def load_or_build(path, batch_size=BATCH_SIZE, progress=None):
+    """Sidecar of a file, built (or updated) and saved if missing or outdated.
+
+    Returns the sidecar and whether it was built. Failing to save it (e.g. in
+    a read-only directory) is not an error.
+    """
+    previous = Sidecar.read(path)
+    if previous is not None and previous.state == file_state(path):
+        return previous, False
+
+    sidecar = Sidecar.build(path, batch_size, progress, previous)
+    try:
+        sidecar.save(path)
+    except OSError:
+        pass
+    return sidecar, True
@@ -0,0 +1,342 @@
+"""Vega-Lite specs of the plotting charts, built directly from templates.
+
+The specs are identical to Altair's Chart.to_dict() output for the charts in
+plotting, but skip Altair's object model and jsonschema validation. Pass
+validate=True to build them through Altair instead.
+"""
+
+import hashlib
+import json
+from typing import Any
+
+import altair as alt
+
+from varlociraptor_inspect import plotting
+
+# Altair's default view config
+VIEW_CONFIG = {"continuousWidth": 300, "continuousHeight": 300}
+
+OBS_TOOLTIP = [
+    {"field": "Metric", "type": "nominal"},
+    {"field": "Category", "type": "nominal"},
+    {"field": "Count", "type": "quantitative"},
+]
+
+
+def _dataset(values, datasets):
+    """Add data values to datasets under Altair's content hash name"""
+    if values == [{}]:
+        name = "empty"
+    else:
+        values_json = json.dumps(values, sort_keys=True, default=str)
+        name = "data-" + hashlib.sha256(values_json.encode()).hexdigest()[:32]
+    datasets[name] = values
+    return {"name": name}
+
+
+def _validated(chart):
+    """Spec of an Altair chart, validated against the Vega-Lite schema"""
+    if chart is None:
+        return None
+    # Like `with alt.data_transformers.disable_max_rows()`, whose enabler is
+    # not typed as a context manager
+    active, options = alt.data_transformers.active, alt.data_transformers.options
+    alt.data_transformers.disable_max_rows()
+    try:
+        return chart.to_dict()
+    finally:
+        alt.data_transformers.enable(active, **options)
+
+
+def event_probabilities(record, validate=False):
+    """Spec of plotting.visualize_event_probabilities"""
+    if validate:
+        return _validated(plotting.visualize_event_probabilities(record))
+
+    datasets = {}
+    data = _dataset(
+        plotting.json_records(plotting.event_probabilities_data(record)), datasets
+    )
+    return {
+        "config": {"view": dict(VIEW_CONFIG)},
+        "data": data,
+        "mark": {"type": "bar"},
+        "encoding": {
+            "tooltip": [
+                {"field": "Event", "type": "nominal"},
+                {"field": "Probability", "format": ".6f", "type": "quantitative"},
+            ],
+            "x": {"field": "Event", "type": "nominal"},
+            "y": {"field": "Probability", "type": "quantitative"},
+        },
+        "height": 300,
+        "title": "Event Probabilities",
+        "width": 400,
+        "$schema": alt.SCHEMA_URL,
+        "datasets": datasets,
+    }
+
+
+def _afd_encoding():
+    def type_channel(scale_range, legend=True):
+        channel: dict[str, Any] = {"field": "Type"}
+        if not legend:
+            channel["legend"] = None
+        channel["scale"] = {"domain": list(plotting.AFD_TYPES), "range": scale_range}
+        channel["type"] = "nominal"
+        return channel
+
+    return {
+        "color": type_channel(["blue", "red"]),
+        "opacity": type_channel([0.7, 1.0], legend=False),
+        "size": type_channel([60, 100], legend=False),
+        "tooltip": [
+            {"field": "Allele Frequency", "type": "quantitative"},
+            {"field": "Probability", "format": ".6f", "type": "quantitative"},
+            {"field": "Type", "type": "nominal"},
+        ],
+        "x": {"field": "Allele Frequency", "type": "quantitative"},
+        "y": {"axis": None, "field": "Probability", "type": "quantitative"},
+    }
+
+
+def allele_frequency_distribution(record, sample_name, validate=False):
+    """Spec of plotting.visualize_allele_frequency_distribution (None without AFD)"""
+    if validate:
+        return _validated(
+            plotting.visualize_allele_frequency_distribution(record, sample_name)
+        )
+
+    df = plotting.allele_frequency_data(record, sample_name)
+    if df is None:
+        return None
+
+    datasets = {}
+    data = _dataset(plotting.json_records(df), datasets)
+
+    return {
+        "config": {
+            "view": {**VIEW_CONFIG, "strokeWidth": 0},
+            "axis": {"grid": False},
+        },
+        "data": data,
+        "mark": {"type": "circle"},
+        "encoding": _afd_encoding(),
+        "height": 300,
+        "title": "Allele Frequency Distribution (ML Estimate in Red)",
+        "width": 500,
+        "$schema": alt.SCHEMA_URL,
+        "datasets": datasets,
+    }
+
+
+def _observation_layer(metric_filter, color, max_count, show_y_axis, panel_filter):
+    transform = [{"filter": metric_filter}]
+    if panel_filter:
+        transform.insert(0, {"filter": panel_filter})
+
+    return {
+        "mark": {"type": "bar", "size": 18},
+        "encoding": {
+            "color": color,
+            "order": {"field": "obs_index", "type": "quantitative"},
+            "tooltip": [dict(field) for field in OBS_TOOLTIP],
+            "x": {
+                "field": "Metric",
+                "sort": list(plotting.OBS_METRICS),
+                "title": None,
+                "type": "nominal",
+            },
+            "y": {
+                "axis": {} if show_y_axis else None,
+                "field": "Count",
+                "scale": {"domain": [0, max_count]},
+                "stack": "zero",
+                "title": "Count" if show_y_axis else None,
+                "type": "quantitative",
+            },
+        },
+        "transform": transform,
+    }
+
+
+def _observation_layers(
+    max_count, edit_domain, show_legend, show_y_axis=True, panel_filter=None
+):
+    def color(field_type, scale, title):
+        return {
+            "field": "Category",
+            "legend": {"title": title} if show_legend else None,
+            "scale": scale,
+            "type": field_type,
+        }
+
+    edit_scale = {"scheme": "reds"}
+    if edit_domain:
+        edit_scale = {"domain": list(edit_domain), "scheme": "reds"}
+
+    layers = [
+        (
+            "(datum.Metric === 'Posterior Odds')",
+            color(
+                "nominal",
+                {
+                    "domain": list(plotting.ODDS_ORDER),
+                    "range": list(plotting.ODDS_COLORS),
+                },
+                "Posterior Odds",
+            ),
+        ),
+        (
+            "(datum.Metric === 'MAPQ')",
+            color(
+                "nominal",
+                {
+                    "domain": list(plotting.MAPQ_COLORS.keys()),
+                    "range": list(plotting.MAPQ_COLORS.values()),
+                },
+                "MAPQ",
+            ),
+        ),
+        (
+            "(datum.Metric === 'Edit Distance')",
+            color("quantitative", edit_scale, "Edit distance"),
+        ),
+        (
+            "(((datum.Metric !== 'Posterior Odds') && (datum.Metric !== 'MAPQ'))"
+            " && (datum.Metric !== 'Edit Distance'))",
+            color(
+                "nominal",
+                {
+                    "domain": list(plotting.OTHER_COLORS.keys()),
+                    "range": list(plotting.OTHER_COLORS.values()),
+                },
+                "Category",
+            ),
+        ),
+    ]
+
+    return [
+        _observation_layer(
+            metric_filter, layer_color, max_count, show_y_axis, panel_filter
+        )
+        for metric_filter, layer_color in layers
+    ]
+
+
+def _observation_panel(panel, max_count, datasets, show_y_axis=True):
+    allele = panel["allele"]
+    df = panel["data"]
+
+    if df is None:
+        return {
+            "data": _dataset([], datasets),
+            "mark": {"type": "bar"},
+            "height": 400,
+            "title": f"{allele} Allele Observations (No Data)",
+            "width": 220,
+        }
+
+    return {
+        "layer": _observation_layers(
+            max_count, panel["edit_domain"], panel["show_legend"], show_y_axis
+        ),
+        "data": _dataset(plotting.json_records(df), datasets),
+        "height": 400,
+        "title": f"{allele} Allele Observations",
+        "width": 220,
+    }
+
+
+def observations(record, sample_name, validate=False):
+    """Spec of plotting.visualize_observations"""
+    if validate:
+        return _validated(plotting.visualize_observations(record, sample_name))
+
+    panels, max_count = plotting.observations_data(record, sample_name)
+    datasets = {}
+    hconcat = [_observation_panel(panel, max_count, datasets) for panel in panels]
+
+    return {
+        "config": {
+            "view": {**VIEW_CONFIG, "strokeWidth": 0},
+            "axis": {"grid": False},
+            "legend": {"orient": "right"},
+        },
+        "hconcat": hconcat,
+        "resolve": {"scale": {"y": "shared"}},
+        "spacing": 10,
+        "$schema": alt.SCHEMA_URL,
+        "datasets": datasets,
+    }
+
+
+def samples(record, sample_names, validate=False):
+    """Spec of plotting.visualize_samples (None if no sample has data)"""
+    if validate:
+        return _validated(plotting.visualize_samples(record, sample_names))
+
+    rows, max_count, edit_domain = plotting.samples_data(record, sample_names)
+    if not rows:
+        return None
+
+    datasets = {}
+    data = _dataset(rows, datasets)
+
+    return {
+        "config": {
+            "view": {**VIEW_CONFIG, "strokeWidth": 0},
+            "axis": {"grid": False},
+            "legend": {"orient": "right"},
+        },
+        "vconcat": [
+            {
+                "facet": {
+                    "field": "Sample",
+                    "sort": list(sample_names),
+                    "title": None,
+                    "type": "nominal",
+                },
+                "spec": {
+                    "mark": {"type": "circle"},
+                    "encoding": _afd_encoding(),
+                    "height": 120,
+                    "transform": [{"filter": "(datum.Panel === 'AFD')"}],
+                    "width": 180,
+                },
+                "columns": plotting.COMPACT_COLUMNS,
+                "title": "Allele Frequency Distribution (ML Estimate in Red)",
+            },
+            {
+                "facet": {
+                    "column": {
+                        "field": "Allele",
+                        "sort": ["REF", "ALT"],
+                        "title": None,
+                        "type": "nominal",
+                    },
+                    "row": {
+                        "field": "Sample",
+                        "sort": list(sample_names),
+                        "title": None,
+                        "type": "nominal",
+                    },
+                },
+                "spec": {
+                    "layer": _observation_layers(
+                        max_count,
+                        edit_domain,
+                        True,
+                        panel_filter="(datum.Panel === 'OBS')",
+                    ),
+                    "height": 200,
+                    "width": 220,
+                },
+                "title": "Observations",
+            },
+        ],
+        "data": data,
+        "spacing": 30,
+        "$schema": alt.SCHEMA_URL,
+        "datasets": datasets,
+    }
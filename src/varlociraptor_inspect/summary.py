@@ -0,0 +1,210 @@
+"""Constant-memory, mergeable summaries of whole Varlociraptor callsets.
+
+Records are streamed in batches through the vectorized PHRED, AFD and OBS
+decoders and only fixed-size histograms are kept, so memory does not grow
+with the number of records. Summaries of separate parts of a callset can be
+merged.
+"""
+
+import itertools
+
+import numpy as np
+
+from varlociraptor_inspect.afd import decode_afd_batch, ml_estimates
+from varlociraptor_inspect.obs import decode_obs_batch, obs_string
+from varlociraptor_inspect.phred import event_phreds, phred_to_probs
+from varlociraptor_inspect.shards import make_shards, map_shards, shard_records
+
+# Equally wide bins over [0, 1] for event probabilities and ML allele frequencies
+PROB_BINS = 50
+AF_BINS = 50
+
+# Observation counts are binned by powers of two: 0, 1, 2-3, 4-7, ...
+COUNT_BUCKETS = 32
+
+BATCH_SIZE = 10000
+
+
+def unit_bins(values, num_bins):
+    """Histogram of values in [0, 1] over num_bins equally wide bins (NaN skipped)"""
+    values = values[~np.isnan(values)]
+    index = np.clip((values * num_bins).astype(np.int64), 0, num_bins - 1)
+    return np.bincount(index, minlength=num_bins)
+
+
+def count_buckets(counts):
+    """Histogram of non-negative counts over power-of-two buckets"""
+    counts = np.asarray(counts, dtype=np.float64)
+    bucket = np.zeros(len(counts), dtype=np.int64)
+    positive = counts > 0
+    bucket[positive] = np.floor(np.log2(counts[positive])).astype(np.int64) + 1
+    return np.bincount(np.minimum(bucket, COUNT_BUCKETS - 1), minlength=COUNT_BUCKETS)
+
+
+def count_bucket_labels():
+    labels = ["0", "1"]
+    for k in range(1, COUNT_BUCKETS - 2):
+        labels.append(f"{2**k}-{2 ** (k + 1) - 1}")
+    labels.append(f">={2 ** (COUNT_BUCKETS - 2)}")
+    return labels
+
+
+def _add(histograms, key, counts):
+    if key in histograms:
+        histograms[key] += counts
+    else:
+        histograms[key] = counts.astype(np.int64)
+
+
+class Summary:
+    """Histograms of event probabilities, ML allele frequencies and observation counts.
+
+    events maps each PROB_ event to its probability histogram and
+    event_sums to the summed probabilities (the expected number of records
+    with the event). ml_af maps each sample to its ML allele frequency
+    histogram and obs_counts maps (sample, "REF"/"ALT") to the histogram of
+    observation counts per record.
+    """
+
+    def __init__(self):
+        self.records = 0
+        self.events = {}
+        self.event_sums = {}
+        self.ml_af = {}
+        self.obs_counts = {}
+
+    def add_records(self, records):
+        """Add a batch of records (pysam.VariantRecord or VcfRecord)"""
+        afds: dict[str, list] = {}
+        obs: dict[str, list[str]] = {}
+
+        keys, phreds = event_phreds(records)
+        for key, probs in zip(keys, phred_to_probs(phreds).T):
+            event = key[len("PROB_") :]
+            _add(self.events, event, unit_bins(probs, PROB_BINS))
+            self.event_sums[event] = self.event_sums.get(event, 0.0) + float(
+                np.nansum(probs)
+            )
+
+        for record in records:
+            self.records += 1
+            for sample_name, sample in record.samples.items():
+                afds.setdefault(sample_name, []).append(sample.get("AFD"))
+                obs.setdefault(sample_name, []).append(obs_string(sample.get("OBS")))
+
+        for sample_name, afd_values in afds.items():
+            columns = decode_afd_batch(afd_values)
+            ml = ml_estimates(columns, len(afd_values))
+            _add(
+                self.ml_af,
+                sample_name,
+                unit_bins(columns["freq"][ml[ml >= 0]], AF_BINS),
+            )
+
+        for sample_name, obs_strings in obs.items():
+            columns = decode_obs_batch(obs_strings)
+            alt_counts = columns["count"] * (columns["allele"] == 1)
+            total = np.bincount(
+                columns["index"], weights=columns["count"], minlength=len(obs_strings)
+            )
+            alt_total = np.bincount(
+                columns["index"], weights=alt_counts, minlength=len(obs_strings)
+            )
+            _add(
+                self.obs_counts, (sample_name, "REF"), count_buckets(total - alt_total)
+            )
+            _add(self.obs_counts, (sample_name, "ALT"), count_buckets(alt_total))
+
+        return self
+
+    def merge(self, other):
+        """Add the aggregates of another summary to this one"""
+        self.records += other.records
+        for event, counts in other.events.items():
+            _add(self.events, event, counts)
+        for event, total in other.event_sums.items():
+            self.event_sums[event] = self.event_sums.get(event, 0.0) + total
+        for sample_name, counts in other.ml_af.items():
+            _add(self.ml_af, sample_name, counts)
+        for key, counts in other.obs_counts.items():
+            _add(self.obs_counts, key, counts)
+        return self
+
+    def to_dict(self):
+        """JSON-compatible representation (see from_dict)"""
+        return {
+            "records": self.records,
+            "events": {event: counts.tolist() for event, counts in self.events.items()},
+            "event_sums": dict(self.event_sums),
+            "ml_af": {name: counts.tolist() for name, counts in self.ml_af.items()},
+            "obs_counts": [
+                [sample_name, allele, counts.tolist()]
+                for (sample_name, allele), counts in self.obs_counts.items()
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        summary = cls()
+        summary.records = data["records"]
+        summary.events = {
+            event: np.array(counts, dtype=np.int64)
+            for event, counts in data["events"].items()
+        }
+        summary.event_sums = dict(data["event_sums"])
+        summary.ml_af = {
+            name: np.array(counts, dtype=np.int64)
+            for name, counts in data["ml_af"].items()
+        }
+        summary.obs_counts = {
+            (sample_name, allele): np.array(counts, dtype=np.int64)
+            for sample_name, allele, counts in data["obs_counts"]
+        }
+        return summary
+
+
+def summarize_records(records, summary=None, batch_size=BATCH_SIZE, progress=None):
+    """Stream records into a summary, batch_size records at a time.
+
+    progress is called with the number of records summarized so far after
+    each batch.
+    """
+    summary = Summary() if summary is None else summary
+    iterator = iter(records)
+    while batch := list(itertools.islice(iterator, batch_size)):
+        summary.add_records(batch)
+        if progress is not None:
+            progress(summary.records)
+    return summary
+
+
+def summarize_shard(vcf, shard, batch_size=BATCH_SIZE):
+    return summarize_records(shard_records(vcf, shard), batch_size=batch_size)
+
+
+def summarize_vcf(
+    path, region=None, batch_size=BATCH_SIZE, progress=None, jobs=1, shard_size=None
+):
+    """Summarize all records of a VCF/BCF file (or of a region, given an index).
+
+    With jobs > 1 or a shard_size, an indexed file is summarized in contig (or
+    shard_size bases long) shards on jobs worker processes, and progress is
+    called after each shard.
+    """
+    # pysam is only needed for binary and indexed access
+    import pysam
+
+    with pysam.VariantFile(path) as vcf:
+        if jobs <= 1 and not shard_size:
+            records = vcf.fetch(region=region) if region else vcf
+            return summarize_records(records, batch_size=batch_size, progress=progress)
+        shards = make_shards(vcf, region, shard_size)
+
+    summary = Summary()
+    for shard_summary in map_shards(
+        path, summarize_shard, shards, jobs, args=(batch_size,)
+    ):
+        summary.merge(shard_summary)
+        if progress is not None:
+            progress(summary.records)
+    return summary
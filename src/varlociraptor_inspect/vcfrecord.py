@@ -0,0 +1,108 @@
+"""Pure-Python parser of single VCF data lines.
+
+VcfRecord mirrors the parts of pysam.VariantRecord used by plotting (chrom,
+pos, ref, alts, info and samples), so text records can be inspected without
+loading pysam (e.g. in the stlite browser build).
+"""
+
+import functools
+import re
+
+_FIELD_PATTERN = re.compile(r"##(INFO|FORMAT)=<(.*)>")
+_ATTRIBUTE_PATTERN = re.compile(r'(\w+)=("(?:[^"\\]|\\.)*"|[^,]*)')
+
+_VALUE_CONVERTERS = {"Integer": int, "Float": float}
+
+# Undeclared fields are kept as strings
+_UNDECLARED = ("1", "String")
+
+
+@functools.lru_cache(maxsize=64)
+def header_fields(header_text):
+    """(Number, Type) of each INFO and FORMAT field declared in header text.
+
+    Returns the INFO fields, the FORMAT fields and the sample names of the
+    #CHROM line.
+    """
+    fields = {"INFO": {}, "FORMAT": {}}
+    samples = []
+
+    for line in header_text.split("\n"):
+        if line.startswith("#CHROM"):
+            samples = line.split("\t")[9:]
+            continue
+        match = _FIELD_PATTERN.match(line)
+        if match is None:
+            continue
+        attributes = dict(_ATTRIBUTE_PATTERN.findall(match.group(2)))
+        if "ID" in attributes:
+            fields[match.group(1)][attributes["ID"]] = (
+                attributes.get("Number", "."),
+                attributes.get("Type", "String"),
+            )
+
+    return fields["INFO"], fields["FORMAT"], samples
+
+
+def convert_value(value, number, value_type):
+    """Convert a VCF text value like pysam does for the given Number and Type"""
+    if value_type == "Flag":
+        return True
+
+    convert = _VALUE_CONVERTERS.get(value_type, str)
+    values = tuple(None if v == "." else convert(v) for v in value.split(","))
+
+    if number == "1":
+        return values[0]
+    return values
+
+
+class VcfRecord:
+    """A VCF record parsed from a tab-separated data line"""
+
+    def __init__(self, header_text, data_line):
+        info_fields, format_fields, sample_names = header_fields(header_text)
+        fields = data_line.split("\t")
+
+        if len(fields) < 8:
+            raise ValueError("VCF record must have at least 8 tab-separated columns")
+
+        self.line = data_line
+        self.chrom = fields[0]
+        self.pos = int(fields[1])
+        self.id = None if fields[2] == "." else fields[2]
+        self.ref = fields[3]
+        self.alts = None if fields[4] == "." else tuple(fields[4].split(","))
+        self.qual = None if fields[5] == "." else float(fields[5])
+        self.filter = [] if fields[6] == "." else fields[6].split(";")
+
+        self.info = {}
+        if fields[7] != ".":
+            for entry in fields[7].split(";"):
+                key, has_value, value = entry.partition("=")
+                number, value_type = info_fields.get(key, _UNDECLARED)
+                if not has_value:
+                    value_type = "Flag"
+                self.info[key] = convert_value(value, number, value_type)
+
+        if len(sample_names) < len(fields) - 9:
+            raise ValueError(
+                f"VCF record has {len(fields) - 9} sample columns, "
+                f"but the header names {len(sample_names)}"
+            )
+
+        self.samples = {}
+        format_keys = fields[8].split(":") if len(fields) > 8 else []
+        sample_fields = fields[9:] + ["."] * (len(sample_names) - len(fields) + 9)
+        for sample_name, sample_field in zip(sample_names, sample_fields):
+            sample = {}
+            for key, value in zip(format_keys, sample_field.split(":")):
+                # Missing values are left out, so sample.get(key) is None
+                if value == ".":
+                    continue
+                number, value_type = format_fields.get(key, _UNDECLARED)
+                sample[key] = convert_value(value, number, value_type)
+            self.samples[sample_name] = sample
+
+    def __str__(self):
+        return self.line + "\n"
@@ -1,178 +1,585 @@
-import streamlit as st
-import pysam
-import tempfile
+import contextlib
+import gzip
+import importlib.util
 import os
-import re
-from varlociraptor_inspect import plotting
+import time
+
+import streamlit as st
+
+# pandas, pysam and altair (through parsing and specs) are imported on first
+# use, so the page renders before they are loaded
+from varlociraptor_inspect.cache import LRUCache, cache_budget, content_key, json_size
+from varlociraptor_inspect.instrumentation import (
+    StageRecorder,
+    diagnostics_enabled,
+    stage,
+)
+
+# Records with more samples start in the compact multi-sample view
+COMPACT_VIEW_SAMPLES = 4
+
+# Samples plotted by default in the per-sample view, others are picked on demand
+PICKED_SAMPLES = 2
+
+# Records listed in the navigator of the file browser
+NAVIGATOR_ROWS = 1000
+
+
+@st.cache_resource
+def render_cache():
+    """Record summary and chart spec cache shared by all sessions on this server"""
+    return LRUCache(cache_budget())
+
+
+def cached_stage(name, key, build, payload=False):
+    """Get a render cache entry as a timed stage, building it on a miss.
+
+    With payload=True, the JSON size of the entry (e.g. a chart spec sent to
+    the browser) is recorded as well.
+    """
+    built = []
+
+    def timed_build():
+        built.append(True)
+        return build()
+
+    with stage(name) as timing:
+        value = render_cache().get_or_build(key, timed_build)
+        if timing.active:
+            timing.set(cached=not built)
+            if payload:
+                timing.set(payload_bytes=json_size(value))
+    return value
+
+
+def normalize_and_scan(record_text):
+    from varlociraptor_inspect import parsing
+
+    with stage("normalize_whitespace"):
+        text = parsing.normalize_whitespace(record_text)
+    return parsing.scan_vcf_text(text)
+
+
+def scan_records(record_text):
+    """Normalize and index pasted or uploaded VCF text (cached across reruns)"""
+    return cached_stage(
+        "scan",
+        ("scan", content_key(record_text)),
+        lambda: normalize_and_scan(record_text),
+    )
+
+
+def read_upload(uploaded_file):
+    """Decode an uploaded plain or gzip/BGZF compressed VCF file to text"""
+    data = uploaded_file.getvalue()
+    if data[:2] == b"\x1f\x8b":
+        data = gzip.decompress(data)
+    return data.decode("utf-8")
+
+
+def select_record(summaries):
+    """Show the record table and a selector, return the selected record index"""
+    import pandas as pd
+
+    st.header(f"Records ({len(summaries)})")
+    st.dataframe(
+        pd.DataFrame(summaries),
+        width="stretch",
+        height=250,
+        column_config={
+            "Probability": st.column_config.NumberColumn(format="%.6f"),
+        },
+    )
+
+    return st.selectbox(
+        "Record to inspect",
+        range(len(summaries)),
+        format_func=lambda idx: (
+            f"{idx + 1}: {summaries[idx]['CHROM']}:{summaries[idx]['POS']} "
+            f"{summaries[idx]['REF']}>{summaries[idx]['ALT']}"
+        ),
+    )
+
+
+def filter_input():
+    """Filter expression input, returns the compiled filter (None if empty)"""
+    expression = st.text_input(
+        "Filter",
+        placeholder="e.g. PROB_SOMATIC < 3 and ML_AF[tumor] > 0.1",
+        help="Fields: PROB_<EVENT>, ML_AF, DP, REF_OBS, ALT_OBS, REF_FWD, "
+        "REF_REV, ALT_FWD, ALT_REV (sample fields take the sample as "
+        "index, e.g. DP[tumor]), combined with and, or, not",
+    )
+    if not expression:
+        return None
 
+    from varlociraptor_inspect.filters import compile_filter
 
-def normalize_whitespace(text):
-    """Normalize whitespace in VCF records - replace multiple spaces with single tabs"""
-    lines = []
-    for line in text.split("\n"):
-        if line.startswith("#"):
-            # Header lines - keep as is
-            lines.append(line)
+    return compile_filter(expression)
+
+
+def filter_lines(record_text, header_lines, data_lines, record_filter):
+    """Indices of the records passing a filter (cached across reruns)"""
+    from varlociraptor_inspect.filters import filter_records
+    from varlociraptor_inspect.vcfrecord import VcfRecord, header_fields
+
+    header_text = "\n".join(header_lines)
+    sample_names = header_fields(header_text)[2]
+    record_filter.check_samples(sample_names)
+
+    def build():
+        passing = filter_records(
+            record_filter,
+            enumerate(data_lines),
+            sample_names,
+            key=lambda item: VcfRecord(header_text, item[1]),
+        )
+        return [idx for idx, _ in passing]
+
+    return cached_stage(
+        "filter",
+        ("filter", content_key(record_text), record_filter.expression),
+        build,
+    )
+
+
+def render_record(header_text, data_line, record=None):
+    """Render event probabilities and per-sample plots for a single record.
+
+    The record summary and all chart specs are cached by the content of the
+    record, so it is only parsed (unless already given) and plotted on a miss.
+    """
+    from varlociraptor_inspect import parsing, specs
+
+    key = content_key(header_text, data_line)
+
+    def load_record():
+        nonlocal record
+        if record is None:
+            record = parsing.parse_record(header_text, data_line)
+        return record
+
+    summary = cached_stage(
+        "record summary",
+        (key, "summary"),
+        lambda: {
+            "chrom": load_record().chrom,
+            "pos": load_record().pos,
+            "samples": list(load_record().samples.keys()),
+        },
+    )
+    sample_names = summary["samples"]
+
+    st.success(
+        f"Successfully parsed VCF record at {summary['chrom']}:{summary['pos']} with {len(sample_names)} sample(s)"
+    )
+
+    # Display Event Probabilities
+    st.header("Event Probabilities")
+    spec1 = cached_stage(
+        "chart: event probabilities",
+        (key, "events"),
+        lambda: specs.event_probabilities(load_record()),
+        payload=True,
+    )
+    st.vega_lite_chart(spec1, width="stretch")
+
+    # Only show sample plots if samples exist
+    if not sample_names:
+        st.warning("No sample columns found. Only Event Probabilities are shown.")
+        return
+
+    compact = len(sample_names) > 1 and st.toggle(
+        "Compact multi-sample view",
+        value=len(sample_names) > COMPACT_VIEW_SAMPLES,
+        help="Draw all samples in a single chart",
+    )
+    if compact:
+        st.divider()
+        st.header(f"Samples ({len(sample_names)})")
+        spec = cached_stage(
+            "chart: all samples",
+            (key, "samples"),
+            lambda: specs.samples(load_record(), sample_names),
+            payload=True,
+        )
+        if spec is None:
+            st.warning(
+                "No sample has an allele frequency distribution or observations."
+            )
         else:
-            # Data lines - replace multiple spaces with single tab
-            normalized = "\t".join(line.split())
-            lines.append(normalized)
-    return "\n".join(lines)
+            st.vega_lite_chart(spec)
+        return
 
+    # Only the picked samples are plotted, the others on demand
+    picked = sample_names
+    if len(sample_names) > PICKED_SAMPLES:
+        picked = st.multiselect(
+            "Samples",
+            sample_names,
+            default=sample_names[:PICKED_SAMPLES],
+            help="Charts are only built for the selected samples",
+        )
 
-def main_view():
-    st.set_page_config(
-        page_title="Varlociraptor Inspect",
+    for sample_name in picked:
+        render_sample(key, load_record, sample_names.index(sample_name), sample_name)
+
+
+def render_sample(key, load_record, idx, sample_name):
+    """Render the allele frequency distribution and observations of a sample"""
+    from varlociraptor_inspect import specs
+
+    st.divider()
+    st.header(f"Sample {idx + 1}: {sample_name}")
+
+    st.subheader("Allele Frequency Distribution")
+    spec2 = cached_stage(
+        f"chart: allele frequency distribution ({sample_name})",
+        (key, "afd", sample_name),
+        lambda: specs.allele_frequency_distribution(load_record(), sample_name),
+        payload=True,
     )
-    st.title("Varlociraptor Inspect")
-    st.text("Visual inspection of Varlociraptor VCF records.")
+    if spec2 is None:
+        st.warning(
+            "AF field is missing or invalid. Cannot display allele frequency distribution."
+        )
+    else:
+        st.vega_lite_chart(spec2, width="stretch")
+
+    st.subheader("Observations")
+    spec3 = cached_stage(
+        f"chart: observations ({sample_name})",
+        (key, "obs", sample_name),
+        lambda: specs.observations(load_record(), sample_name),
+        payload=True,
+    )
+    st.vega_lite_chart(spec3, width="stretch")
 
-    # Load record from text input
+
+def text_input_view():
+    """Inspect records pasted as text or uploaded as a VCF file"""
     record_text = st.text_area(
-        "Paste your Varlociraptor VCF record here (including header lines starting with #)",
+        "Paste your Varlociraptor VCF record(s) here (including header lines starting with #)",
         height=200,
     )
+    uploaded_file = st.file_uploader("Or upload a VCF file", type=["vcf", "gz", "txt"])
+    try:
+        record_filter = filter_input()
+    except ValueError as e:
+        st.error(f"Invalid filter: {str(e)}")
+        return
+
+    if uploaded_file is not None:
+        try:
+            record_text = read_upload(uploaded_file)
+        except (OSError, UnicodeDecodeError) as e:
+            st.error(f"Error reading uploaded file: {str(e)}")
+            return
 
     if record_text:
         try:
-            # Normalize whitespace first
-            record_text = normalize_whitespace(record_text)
-
-            # Check if header is included
-            if not record_text.startswith("##fileformat"):
-                # No header - generate from the data line
-                lines = record_text.strip().split("\n")
-
-                # Find the column header line (#CHROM) and data line
-                column_header = None
-                data_line = None
-
-                for line in lines:
-                    if line.startswith("#CHROM"):
-                        column_header = line
-                    elif not line.startswith("#") and line.strip():
-                        data_line = line
-                        break
-
-                if data_line:
-                    fields = data_line.split("\t")
-
-                    if len(fields) < 8:
-                        raise ValueError(
-                            "VCF record must have at least 8 tab-separated columns"
-                        )
+            header_lines, data_lines, summaries = scan_records(record_text)
 
-                    chrom = fields[0]
-                    pos = int(fields[1])
-                    info_field = fields[7] if len(fields) > 7 else ""
+            indices = range(len(data_lines))
+            if record_filter is not None:
+                try:
+                    indices = filter_lines(
+                        record_text, header_lines, data_lines, record_filter
+                    )
+                except ValueError as e:
+                    st.error(f"Invalid filter: {str(e)}")
+                    return
+                if not indices:
+                    st.warning("No records pass the filter.")
+                    return
 
-                    # Extract all PROB_ fields from INFO column
-                    prob_fields = re.findall(r"PROB_(\w+)=", info_field)
+            # Only the selected record is parsed and plotted
+            idx = indices[0]
+            if len(indices) > 1:
+                idx = indices[select_record([summaries[i] for i in indices])]
+            render_record("\n".join(header_lines), data_lines[idx])
 
-                    # Generate VCF header
-                    header_lines = [
-                        "##fileformat=VCFv4.2",
-                        f"##contig=<ID={chrom},length={pos + 1000}>",
-                    ]
+        except Exception as e:
+            st.error(f"Error parsing VCF record: {str(e)}")
 
-                    # Add PROB_ INFO fields (Number=. to allow multiple values)
-                    for prob_field in prob_fields:
-                        header_lines.append(
-                            f"##INFO=<ID=PROB_{prob_field},Number=.,Type=Float>"
-                        )
 
-                    # Add standard Varlociraptor FORMAT fields
-                    format_fields = [
-                        "##FORMAT=<ID=DP,Number=1,Type=Integer>",
-                        "##FORMAT=<ID=AF,Number=1,Type=Float>",
-                        "##FORMAT=<ID=AFD,Number=.,Type=String>",
-                        "##FORMAT=<ID=OBS,Number=1,Type=String>",
-                        "##FORMAT=<ID=HINTS,Number=.,Type=String>",
-                    ]
-                    header_lines.extend(format_fields)
-
-                    # Generate column header if not present
-                    if not column_header:
-                        columns = [
-                            "#CHROM",
-                            "POS",
-                            "ID",
-                            "REF",
-                            "ALT",
-                            "QUAL",
-                            "FILTER",
-                            "INFO",
-                        ]
-
-                        if len(fields) > 8:
-                            num_samples = len(fields) - 9
-                            sample_names = [
-                                f"sample{i + 1}" for i in range(num_samples)
-                            ]
-                            columns.extend(["FORMAT", *sample_names])
-
-                        column_header = "\t".join(columns)
-
-                    # Assemble complete VCF
-                    record_text = (
-                        "\n".join(header_lines)
-                        + "\n"
-                        + column_header
-                        + "\n"
-                        + data_line
-                    )
+def indexed_file_view():
+    """Inspect a region of a local bgzipped VCF or BCF file through its index"""
+    path = st.text_input("Path to an indexed .vcf.gz or .bcf file")
+    region = st.text_input("Region (chr:start-end)")
+    try:
+        record_filter = filter_input()
+    except ValueError as e:
+        st.error(f"Invalid filter: {str(e)}")
+        return
 
-            # Write to temp file
-            tmp_fd, tmp_path = tempfile.mkstemp(suffix=".vcf", text=True)
-            try:
-                with os.fdopen(tmp_fd, "w") as tmp:
-                    tmp.write(record_text)
+    if path and region:
+        from varlociraptor_inspect import parsing
+        from varlociraptor_inspect.filters import filter_records
+
+        try:
+            with stage("fetch region"):
+                records, truncated = parsing.fetch_region(path, region)
+        except (OSError, ValueError) as e:
+            st.error(f"Error fetching region: {str(e)}")
+            return
 
-                # Parse with context manager
-                with pysam.VariantFile(tmp_path) as vcf:
-                    record = next(vcf)
-                    sample_names = list(record.samples.keys())
+        if not records:
+            st.warning(f"No records found in {region}.")
+            return
+        if truncated:
+            st.warning(f"Showing only the first {len(records)} records in {region}.")
 
-                    st.success(
-                        f"Successfully parsed VCF record at {record.chrom}:{record.pos} with {len(sample_names)} sample(s)"
+        if record_filter is not None:
+            try:
+                with stage("filter"):
+                    records = list(
+                        filter_records(
+                            record_filter, records, list(records[0].header.samples)
+                        )
                     )
+            except ValueError as e:
+                st.error(f"Invalid filter: {str(e)}")
+                return
+            if not records:
+                st.warning(f"No records in {region} pass the filter.")
+                return
 
-                    # Display Event Probabilities
-                    st.header("Event Probabilities")
-                    chart1 = plotting.visualize_event_probabilities(record)
-                    st.altair_chart(chart1, use_container_width=True)
+        try:
+            summaries = [parsing.summarize_record(record) for record in records]
+            idx = select_record(summaries) if len(records) > 1 else 0
 
-                    # Only show sample plots if samples exist
-                    if not sample_names:
-                        st.warning(
-                            "No sample columns found. Only Event Probabilities are shown."
-                        )
-                    else:
-                        # Display plots for each sample
-                        for idx, sample_name in enumerate(sample_names, 1):
-                            st.divider()
-                            st.header(f"Sample {idx}: {sample_name}")
-
-                            st.subheader("Allele Frequency Distribution")
-                            chart2 = plotting.visualize_allele_frequency_distribution(
-                                record, sample_name
-                            )
-                            if chart2 is None:
-                                st.warning(
-                                    "AF field is missing or invalid. Cannot display allele frequency distribution."
-                                )
-                            else:
-                                st.altair_chart(chart2, use_container_width=True)
-
-                            st.subheader("Observations")
-                            chart3 = plotting.visualize_observations(
-                                record, sample_name
-                            )
-                            st.altair_chart(chart3, use_container_width=True)
-            finally:
-                # Clean up temp file
-                if os.path.exists(tmp_path):
-                    os.unlink(tmp_path)
+            record = records[idx]
+            render_record(str(record.header), str(record).rstrip("\n"), record)
 
         except Exception as e:
             st.error(f"Error parsing VCF record: {str(e)}")
+
+
+def summary_view():
+    """Summarize all records of a local VCF or BCF file (or of a region)"""
+    from varlociraptor_inspect import plotting
+    from varlociraptor_inspect.summary import Summary, summarize_vcf
+
+    path = st.text_input("Path to a .vcf, .vcf.gz or .bcf file")
+    region = st.text_input("Region (optional, needs an index)")
+    if not path:
+        return
+
+    try:
+        stat = os.stat(path)
+    except OSError as e:
+        st.error(f"Error reading file: {str(e)}")
+        return
+
+    # Summaries are cached until the file changes
+    key = ("summary", os.path.abspath(path), stat.st_size, stat.st_mtime_ns, region)
+    data = render_cache().get(key)
+    if data is None:
+        if not st.button("Summarize"):
+            return
+        progress = st.empty()
+        try:
+            with stage("summarize"):
+                summary = summarize_vcf(
+                    path,
+                    region or None,
+                    progress=lambda n: progress.text(f"Summarized {n:,} records"),
+                )
+        except (OSError, ValueError) as e:
+            st.error(f"Error summarizing file: {str(e)}")
+            return
+        progress.empty()
+        data = summary.to_dict()
+        render_cache().put(key, data, json_size(data))
+
+    summary = Summary.from_dict(data)
+    st.header(f"Summary ({summary.records:,} records)")
+    if not summary.records:
+        return
+
+    st.dataframe(
+        [
+            {"Event": event, "Expected records": total}
+            for event, total in summary.event_sums.items()
+        ],
+        hide_index=True,
+        column_config={
+            "Expected records": st.column_config.NumberColumn(format="%.1f"),
+        },
+    )
+
+    for name, visualize in [
+        ("events", plotting.visualize_summary_events),
+        ("allele frequencies", plotting.visualize_summary_allele_frequencies),
+        ("observations", plotting.visualize_summary_observations),
+    ]:
+        spec = cached_stage(
+            f"chart: summary {name}",
+            (key, name),
+            lambda: visualize(summary).to_dict(),
+            payload=True,
+        )
+        st.vega_lite_chart(spec)
+
+
+def load_sidecar(path):
+    """Sidecar index of a file, built with a progress message if missing or outdated.
+
+    Loaded sidecars are kept in the render cache until the file changes.
+    """
+    from varlociraptor_inspect.sidecar import file_state, load_or_build
+
+    state = file_state(path)
+    key = ("sidecar", os.path.abspath(path), state["size"], state["mtime_ns"])
+    sidecar = render_cache().get(key)
+    if sidecar is None:
+        progress = st.empty()
+        with stage("load sidecar") as timing:
+            sidecar, built = load_or_build(
+                path,
+                progress=lambda n: progress.text(f"Indexed {n:,} records"),
+            )
+            if timing.active:
+                timing.set(built=built)
+        progress.empty()
+        size = sum(column.nbytes for column in sidecar.columns.values())
+        render_cache().put(key, sidecar, size)
+    return sidecar
+
+
+def file_browser_view():
+    """Navigate, sort and filter all records of a local VCF or BCF file.
+
+    Only the sidecar index is read until a record is opened.
+    """
+    import numpy as np
+
+    path = st.text_input("Path to a .vcf, .vcf.gz or .bcf file")
+    try:
+        record_filter = filter_input()
+    except ValueError as e:
+        st.error(f"Invalid filter: {str(e)}")
+        return
+    if not path:
+        return
+
+    try:
+        sidecar = load_sidecar(path)
+    except (OSError, ValueError) as e:
+        st.error(f"Error indexing file: {str(e)}")
+        return
+
+    rows = np.arange(len(sidecar))
+    if record_filter is not None:
+        try:
+            with stage("filter"):
+                rows = sidecar.select(record_filter)
+        except ValueError as e:
+            st.error(f"Invalid filter: {str(e)}")
+            return
+    if len(rows) == 0:
+        st.warning("No records found.")
+        return
+
+    sort_keys: dict[str, tuple[str, str | None] | None] = {"Position": None}
+    for event in sidecar.events:
+        sort_keys[f"Probability of {event[len('PROB_') :]}"] = (event, None)
+    for sample_name in sidecar.samples:
+        sort_keys[f"ML allele frequency of {sample_name}"] = ("ML_AF", sample_name)
+    sort_key = sort_keys[st.selectbox("Sort by", list(sort_keys))]
+    if sort_key is not None:
+        values = sidecar.column(*sort_key)
+        # Descending, records without a value last
+        rows = rows[np.argsort(-values[rows], kind="stable")]
+
+    if len(rows) > NAVIGATOR_ROWS:
+        st.caption(f"Showing the first {NAVIGATOR_ROWS} of {len(rows):,} records.")
+    shown = rows[:NAVIGATOR_ROWS]
+
+    try:
+        summaries = sidecar.summaries(shown)
+        idx = select_record(summaries) if len(shown) > 1 else 0
+
+        # pysam is only needed to read the opened record
+        import pysam
+
+        with stage("read record"), pysam.VariantFile(path) as vcf:
+            record = sidecar.read_record(vcf, shown[idx])
+        render_record(str(record.header), str(record).rstrip("\n"), record)
+
+    except Exception as e:
+        st.error(f"Error parsing VCF record: {str(e)}")
+
+
+def diagnostics_panel(recorder, mode):
+    """Show the stage timings of this rerun and emit them as log lines"""
+    import pandas as pd
+
+    total_ms = (time.perf_counter() - recorder.start) * 1e3
+    recorder.log(mode=mode)
+
+    with st.expander(f"Diagnostics ({total_ms:.1f} ms)"):
+        stages = recorder.sorted_stages()
+        if not stages:
+            st.text("No stages ran in this rerun.")
+            return
+
+        st.dataframe(
+            pd.DataFrame(stages),
+            width="stretch",
+            hide_index=True,
+            column_config={
+                "start_ms": st.column_config.NumberColumn("Start [ms]", format="%.2f"),
+                "ms": st.column_config.NumberColumn("Duration [ms]", format="%.2f"),
+                "payload_bytes": st.column_config.NumberColumn("Payload [bytes]"),
+            },
+        )
+        cache = render_cache()
+        st.text(
+            f"Render cache: {len(cache)} entries, {cache.size / 1024**2:.1f} MB, "
+            f"{cache.hits} hits, {cache.misses} misses"
+        )
+
+
+def main_view():
+    st.set_page_config(
+        page_title="Varlociraptor Inspect",
+    )
+    st.title("Varlociraptor Inspect")
+    st.text("Visual inspection of Varlociraptor VCF records.")
+
+    show_diagnostics = st.sidebar.toggle(
+        "Diagnostics",
+        value=diagnostics_enabled(),
+        help="Time each processing stage of this page",
+    )
+
+    # Indexed access needs pysam, which the browser build does not install
+    mode = "Paste or upload"
+    if importlib.util.find_spec("pysam") is not None:
+        mode = st.radio(
+            "Input",
+            [
+                "Paste or upload",
+                "Indexed VCF/BCF file",
+                "Browse VCF/BCF file",
+                "Genome-wide summary",
+            ],
+            horizontal=True,
+            label_visibility="collapsed",
+        )
+
+    recorder = StageRecorder() if show_diagnostics else contextlib.nullcontext()
+    with recorder:
+        if mode == "Paste or upload":
+            text_input_view()
+        elif mode == "Indexed VCF/BCF file":
+            indexed_file_view()
+        elif mode == "Browse VCF/BCF file":
+            file_browser_view()
+        else:
+            summary_view()
+
+    if show_diagnostics:
+        diagnostics_panel(recorder, mode)
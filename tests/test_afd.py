@@ -0,0 +1,67 @@
+import random
+
+import numpy as np
+import pytest
+
+import synthetic
+from varlociraptor_inspect.afd import decode_afd, decode_afd_batch, ml_estimates
+
+
+def split_points(afd):
+    """(freq, phred) of the well-formed points of an AFD value, point by point"""
+    entries = [afd] if isinstance(afd, str) else afd or []
+    points = []
+    for entry in entries:
+        if not isinstance(entry, str):
+            continue
+        for part in entry.split(","):
+            try:
+                freq, phred = part.split("=")
+                points.append((float(freq), float(phred)))
+            except ValueError:
+                continue
+    return points
+
+
+AFDS = [
+    "0=10,0.5=0,1=inf",
+    "0.25=3",
+    ("0=1", "0.5=2,1=3"),
+    # Malformed points are skipped
+    "0=1,x=2,0.5=y,1==3,=,0.75",
+    "0=1,,1=2",
+    "",
+    None,
+    (),
+    (None, "1=0"),
+]
+
+
+@pytest.mark.parametrize("afd", AFDS)
+def test_decode_afd(afd):
+    points = split_points(afd)
+    decoded = decode_afd(afd)
+    np.testing.assert_array_equal(decoded["freq"], [freq for freq, _ in points])
+    np.testing.assert_array_equal(decoded["phred"], [phred for _, phred in points])
+    np.testing.assert_allclose(
+        decoded["prob"], [10 ** (-phred / 10) for _, phred in points]
+    )
+
+
+def test_decode_afd_batch():
+    rng = random.Random(0)
+    afds = AFDS + [synthetic.afd_string(rng, rng.random(), 50) for _ in range(20)]
+    decoded = decode_afd_batch(afds)
+    for i, afd in enumerate(afds):
+        np.testing.assert_array_equal(
+            decoded["freq"][decoded["index"] == i], decode_afd(afd)["freq"]
+        )
+
+
+def test_ml_estimates():
+    afds = ["0=10,0.5=0,1=inf", None, "0=3,0.5=1,1=1", "x=1", "1=inf"]
+    decoded = decode_afd_batch(afds)
+    ml = ml_estimates(decoded, len(afds))
+    freqs = np.append(decoded["freq"], np.nan)[ml]
+    # Ties resolve to the first point, also for probabilities of 0
+    np.testing.assert_array_equal(freqs, [0.5, np.nan, 0.5, np.nan, 1])
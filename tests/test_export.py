@@ -0,0 +1,117 @@
+import random
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet as pq
+import pysam
+import pytest
+
+import synthetic
+from bench_obs import regex_observations
+from varlociraptor_inspect.afd import decode_afd
+from varlociraptor_inspect.export import SCHEMAS, export_vcf
+from varlociraptor_inspect.obs import obs_string
+
+NUM_RECORDS = 25
+CHUNK_SIZE = 7
+
+
+@pytest.fixture
+def path(tmp_path):
+    rng = random.Random(0)
+    lines = synthetic.header_lines(num_samples=2)
+    lines.extend(
+        synthetic.record_line(
+            rng, num_observations=rng.randrange(4), afd_points=5, pos=1000 + i
+        )
+        for i in range(NUM_RECORDS)
+    )
+    # A record without events and a missing sample
+    lines.append(
+        "\t".join(
+            ["chr1", "2000", ".", "A", "G,T", ".", ".", "."]
+            + ["AF:AFD:OBS:DP", "0.5:0=1,0.5=0:2AS0..+>^.*:2", "."]
+        )
+    )
+    path = tmp_path / "calls.vcf"
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+
+def read_tables(output_dir, output_format):
+    tables = {}
+    for name in SCHEMAS:
+        if output_format == "parquet":
+            tables[name] = pq.read_table(output_dir / f"{name}.parquet")
+        else:
+            with pa.ipc.open_stream(output_dir / f"{name}.arrows") as reader:
+                tables[name] = reader.read_all()
+    return tables
+
+
+@pytest.mark.parametrize("output_format", ["parquet", "arrow"])
+def test_export(tmp_path, path, output_format):
+    output_dir = tmp_path / "tables"
+    assert (
+        export_vcf(
+            path, str(output_dir), output_format=output_format, chunk_size=CHUNK_SIZE
+        )
+        == NUM_RECORDS + 1
+    )
+    tables = read_tables(output_dir, output_format)
+    for name, table in tables.items():
+        assert table.schema.remove_metadata() == SCHEMAS[name]
+    if output_format == "parquet":
+        metadata = pq.ParquetFile(output_dir / "records.parquet").metadata
+        assert metadata.num_row_groups == 4
+
+    records = tables["records"].to_pylist()
+    events = tables["events"].to_pylist()
+    afd = tables["afd"].to_pylist()
+    obs = tables["obs"].to_pylist()
+
+    with pysam.VariantFile(path) as vcf:
+        sample_names = list(vcf.header.samples)
+        for i, record in enumerate(vcf):
+            assert records[i] == {
+                "record": i,
+                "chrom": record.chrom,
+                "pos": record.pos,
+                "ref": record.ref,
+                "alt": ",".join(record.alts or ["."]),
+            }
+
+            phreds = {
+                key[len("PROB_") :]: value[0]
+                for key, value in record.info.items()
+                if key.startswith("PROB_")
+            }
+            record_events = [row for row in events if row["record"] == i]
+            assert {row["event"]: row["phred"] for row in record_events} == phreds
+            for row in record_events:
+                assert row["prob"] == pytest.approx(10 ** (-row["phred"] / 10))
+
+            for sample_name in sample_names:
+                sample = record.samples[sample_name]
+                decoded = decode_afd(sample.get("AFD"))
+                points = [
+                    row
+                    for row in afd
+                    if row["record"] == i and row["sample"] == sample_name
+                ]
+                np.testing.assert_array_equal(
+                    [row["freq"] for row in points], decoded["freq"]
+                )
+                assert sum(row["ml"] for row in points) == (1 if points else 0)
+
+                observations = regex_observations(obs_string(sample.get("OBS")))
+                rows = [
+                    row
+                    for row in obs
+                    if row["record"] == i and row["sample"] == sample_name
+                ]
+                assert [(row["count"], row["allele"]) for row in rows] == [
+                    (observation["count"], observation["Allele"])
+                    for observation in observations
+                ]
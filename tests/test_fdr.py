@@ -0,0 +1,102 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+import synthetic
+from varlociraptor_inspect import parsing
+from varlociraptor_inspect.fdr import (
+    BUCKET_WIDTH,
+    NUM_BUCKETS,
+    ExpectedFdr,
+    expected_fdr_records,
+)
+
+EVENTS = ["SOMATIC_TUMOR_HIGH", "SOMATIC_TUMOR_LOW"]
+HEADER = "\n".join(synthetic.header_lines(num_samples=0, num_events=4))
+
+
+def record(info):
+    return parsing.parse_record(HEADER, f"chr1\t1000\t.\tA\tC\t.\t.\t{info}")
+
+
+def synthetic_records(num_records, seed=0):
+    rng = random.Random(seed)
+    return [
+        parsing.parse_record(
+            HEADER, synthetic.record_line(rng, num_samples=0, pos=1000 + i)
+        )
+        for i in range(num_records)
+    ]
+
+
+def false_phreds(records):
+    """PHRED scaled false discovery probability of each record, from its
+    normalized event probabilities"""
+    phreds = []
+    for record in records:
+        probs = {
+            key[len("PROB_") :]: 10 ** (-value[0] / 10)
+            for key, value in record.info.items()
+            if key.startswith("PROB_")
+        }
+        false = sum(p for event, p in probs.items() if event not in EVENTS)
+        phreds.append(-10 * math.log10(false / sum(probs.values())))
+    return phreds
+
+
+def test_thresholds_are_rounded():
+    # Centers of all buckets, e.g. 13.15 in bucket 13.1 (131 * 0.1 is
+    # 13.100000000000001)
+    centers = (np.arange(NUM_BUCKETS) + 0.5) * BUCKET_WIDTH
+    fdr = ExpectedFdr(EVENTS).add_log_probs(-centers / 10 * np.log(10))
+    thresholds = fdr.curve()["threshold"]
+    assert thresholds[131] == 13.1
+    assert thresholds.tolist() == [bucket / 10 for bucket in range(NUM_BUCKETS)]
+
+
+def test_curve_matches_records():
+    records = synthetic_records(500)
+    phreds = np.array(false_phreds(records))
+    probs = 10 ** (-phreds / 10)
+    curve = expected_fdr_records(EVENTS, records, batch_size=64).curve()
+
+    assert curve["calls"][0] == len(records)
+    for threshold, calls, fdr in zip(curve["threshold"], curve["calls"], curve["fdr"]):
+        # Records with a false discovery probability of at most the threshold
+        called = phreds >= threshold - 1e-9
+        assert calls == called.sum()
+        assert fdr == pytest.approx(probs[called].mean())
+
+
+def test_merge():
+    records = synthetic_records(300)
+    expected = expected_fdr_records(EVENTS, records).curve()
+    merged = ExpectedFdr(EVENTS)
+    for part in [records[:50], records[50:]]:
+        merged.merge(expected_fdr_records(EVENTS, part))
+    curve = merged.curve()
+    np.testing.assert_array_equal(curve["threshold"], expected["threshold"])
+    np.testing.assert_array_equal(curve["calls"], expected["calls"])
+    np.testing.assert_allclose(curve["fdr"], expected["fdr"])
+
+
+def test_confident_calls_do_not_underflow():
+    fdr = ExpectedFdr(EVENTS).add_records(
+        [
+            record("PROB_SOMATIC_TUMOR_HIGH=0;PROB_GERMLINE=4000;PROB_ABSENT=5000"),
+            record("PROB_SOMATIC_TUMOR_LOW=0;PROB_GERMLINE=4000"),
+            # Records without events are skipped, missing events are 0
+            record("."),
+            record("PROB_SOMATIC_TUMOR_HIGH=0"),
+        ]
+    )
+    assert fdr.records == 3
+    curve = fdr.curve()
+    assert curve["threshold"].tolist() == [999.9]
+    assert curve["calls"].tolist() == [3]
+    # Two records with probability about 1e-400, one with 0
+    assert curve["log_false_discoveries"][0] == pytest.approx(
+        np.log(2) - 400 * np.log(10), rel=1e-6
+    )
@@ -0,0 +1,148 @@
+import numpy as np
+import pytest
+
+import synthetic
+from varlociraptor_inspect.filters import (
+    compile_filter,
+    decode_columns,
+    filter_records,
+)
+from varlociraptor_inspect.vcfrecord import VcfRecord
+
+SAMPLES = ["sample1", "sample2"]
+HEADER = "\n".join(synthetic.header_lines(num_samples=2, num_events=2))
+
+# pos, INFO, sample1, sample2 (AF:AFD:OBS:DP)
+LINES = [
+    (
+        1000,
+        "PROB_SOMATIC_TUMOR_HIGH=1;PROB_SOMATIC_TUMOR_LOW=7",
+        "0.5:0=20,0.5=0,1=10:3rS0..+>^.*2aS0..-<*$.:10",
+        "0:0=0,0.5=5:.:5",
+    ),
+    (
+        1100,
+        "PROB_SOMATIC_TUMOR_HIGH=20;PROB_SOMATIC_TUMOR_LOW=0.1",
+        "1:0=10,1=0:4aS0..*>^.*:3",
+        ".",
+    ),
+    (1200, "PROB_SOMATIC_TUMOR_LOW=inf", "0:0=0,1=10:.:.", "1:0=10,1=0:1AV0..+>^.*:8"),
+]
+RECORDS = [
+    VcfRecord(
+        HEADER,
+        "\t".join(["chr1", str(pos), ".", "A", "C", ".", ".", info])
+        + "\tAF:AFD:OBS:DP\t"
+        + "\t".join(samples),
+    )
+    for pos, info, *samples in LINES
+]
+
+
+def passing(expression):
+    return [
+        record.pos
+        for record in filter_records(compile_filter(expression), RECORDS, SAMPLES)
+    ]
+
+
+@pytest.mark.parametrize(
+    "expression, message",
+    [
+        ("ML_AF >", "Invalid filter expression"),
+        ("ML_AF", "Expected a condition"),
+        ("1 < 2", "Comparison without a field"),
+        ("min(1, 2) < 3", "Comparison without a field"),
+        ("ML_AF is None", "Unsupported comparison"),
+        ("ML_AF > 'high'", "Unsupported expression"),
+        ("ML_AF ** 2 > 0", "Unsupported expression"),
+        ("abs(DP, 1) > 0", "abs takes one argument"),
+        ("QUAL > 10", "Unknown field: QUAL"),
+        ("PROB_ABSENT[sample1] > 1", "PROB_ABSENT is not a sample field"),
+    ],
+)
+def test_invalid_expressions(expression, message):
+    with pytest.raises(ValueError, match=message):
+        compile_filter(expression)
+
+
+def test_fields():
+    record_filter = compile_filter(
+        'PROB_SOMATIC_TUMOR_LOW < 3 or ML_AF[sample1] > DP["sample2"] / max(DP, 1)'
+    )
+    assert record_filter.fields == {
+        ("PROB_SOMATIC_TUMOR_LOW", None),
+        ("ML_AF", "sample1"),
+        ("DP", "sample2"),
+        ("DP", None),
+    }
+
+
+def test_unknown_sample():
+    with pytest.raises(ValueError, match="Unknown sample"):
+        passing("DP[tumor] > 1")
+
+
+def test_decode_columns():
+    columns = decode_columns(
+        RECORDS, SAMPLES, {("ML_AF", None), ("DP", "sample2"), ("ALT_REV", None)}
+    )
+    np.testing.assert_array_equal(
+        columns[("ML_AF", None)], [[0.5, 0], [1, np.nan], [0, 1]]
+    )
+    np.testing.assert_array_equal(columns[("DP", "sample2")], [[5], [np.nan], [8]])
+    np.testing.assert_array_equal(columns[("ALT_REV", None)], [[2, 0], [4, 0], [0, 0]])
+
+
+@pytest.mark.parametrize(
+    "expression, expected",
+    [
+        ("PROB_SOMATIC_TUMOR_HIGH < 3", [1000]),
+        # Missing values never pass, also not negated comparisons
+        ("PROB_SOMATIC_TUMOR_HIGH != 1", [1100]),
+        ("not PROB_SOMATIC_TUMOR_HIGH == 1", [1100, 1200]),
+        ("PROB_SOMATIC_TUMOR_LOW > 100", [1200]),
+        # Without a sample, any sample may pass
+        ("ML_AF == 1", [1100, 1200]),
+        ("ML_AF[sample1] == 1", [1100]),
+        ('ML_AF["sample2"] == 1', [1200]),
+        ("0 < ML_AF[sample1] < 1", [1000]),
+        ("0 <= ML_AF[sample2] <= 0.5 < DP[sample2]", [1000]),
+        ("DP[sample1] > 5 or DP[sample2] > 5", [1000, 1200]),
+        ("DP[sample1] > 1 and ML_AF[sample1] > 0.8", [1100]),
+        ("REF_OBS[sample1] == 3 and REF_FWD[sample1] == 3", [1000]),
+        ("ALT_FWD[sample1] == 4 and ALT_REV[sample1] == 4", [1100]),
+        ("ALT_OBS[sample2] == 1", [1200]),
+        ("DP[sample1] - DP[sample2] == 5", [1000]),
+        ("DP[sample2] / DP[sample1] > 0.4", [1000]),
+        ("-DP[sample1] * 2 < -10", [1000]),
+        ("min(DP[sample1], DP[sample2]) >= 5", [1000]),
+        ("max(DP[sample1], DP[sample2], 9) == 10", [1000]),
+        ("abs(ML_AF[sample1] - ML_AF[sample2]) == 1", [1200]),
+    ],
+)
+def test_filter_records(expression, expected):
+    assert passing(expression) == expected
+
+
+def test_filter_records_batches_keep_order():
+    record_filter = compile_filter("DP > 4")
+    items = list(enumerate(RECORDS * 3))
+    for batch_size in [1, 2, 100]:
+        assert [
+            index
+            for index, _ in filter_records(
+                record_filter, items, SAMPLES, batch_size, key=lambda item: item[1]
+            )
+        ] == [0, 2, 3, 5, 6, 8]
+
+
+def test_decode_columns_dp_strings():
+    """DP of a header without a FORMAT line for it is kept as a string"""
+    header = HEADER.replace("##FORMAT=<ID=DP,Number=1,Type=Integer>\n", "")
+    records = [
+        VcfRecord(header, f"chr1\t1000\t.\tA\tC\t.\t.\t.\tDP\t{dp}\t{dp}")
+        for dp in ["7", ".", "high"]
+    ]
+    columns = decode_columns(records, SAMPLES, {("DP", "sample1")})
+    np.testing.assert_array_equal(columns[("DP", "sample1")], [[7], [np.nan], [np.nan]])
@@ -0,0 +1,110 @@
+import random
+
+import numpy as np
+import pytest
+
+import synthetic
+from bench_obs import regex_observations
+from varlociraptor_inspect.obs import (
+    OBS_LABELS,
+    decode_obs,
+    decode_obs_batch,
+    obs_labels,
+    obs_string,
+)
+
+# Decoded column of each field of the former decoding
+COLUMNS = {
+    "Posterior Odds": "odds",
+    "MAPQ": "mapq",
+    "Strand": "strand",
+    "Read Position": "read_position",
+    "Orientation": "orientation",
+    "Softclip": "softclip",
+    "Indel": "indel",
+}
+
+
+def assert_matches_former(obs):
+    decoded = decode_obs(obs)
+    expected = regex_observations(obs)
+
+    assert decoded["count"].tolist() == [o["count"] for o in expected]
+    assert decoded["index"].tolist() == [0] * len(expected)
+    assert obs_labels(decoded, "allele").tolist() == [o["Allele"] for o in expected]
+    assert decoded["edit_distance"].tolist() == [o["Edit Distance"] for o in expected]
+    for field, column in COLUMNS.items():
+        assert obs_labels(decoded, column).tolist() == [o[field] for o in expected]
+
+
+def test_synthetic_strings_match_former_decoding():
+    rng = random.Random(1)
+    for num_observations in [1, 10, 200]:
+        assert_matches_former(synthetic.obs_string(rng, num_observations))
+
+
+def test_unknown_codes_match_former_decoding():
+    # Unknown odds, strand, orientation, read position, softclip and indel codes
+    assert_matches_former("3RxZ..?~%x&#12akQ..+>^$*")
+
+
+@pytest.mark.parametrize("obs", ["", "."])
+def test_missing_values_decode_to_no_observations(obs):
+    decoded = decode_obs(obs_string(obs))
+    assert all(len(column) == 0 for column in decoded.values())
+    assert set(decoded) == {"index", "count", "allele", "edit_distance", *OBS_LABELS}
+
+
+def test_obs_string_normalizes_values():
+    assert obs_string(None) == ""
+    assert obs_string(".") == ""
+    assert obs_string(("2RS..+>^.*",)) == "2RS..+>^.*"
+    assert obs_string(()) == ""
+
+
+def test_non_ascii_codes_decode_as_unknown():
+    decoded = decode_obs("2RSé..+>^.*4AV0..→>^$.")
+    assert decoded["count"].tolist() == [2, 4]
+    assert obs_labels(decoded, "strand").tolist() == ["Forward strand", "?"]
+    # The fields after a non-ASCII character are not shifted
+    assert obs_labels(decoded, "orientation").tolist() == ["F1R2 orientation"] * 2
+    assert obs_labels(decoded, "softclip").tolist() == [
+        "No soft clipping",
+        "Soft clipped",
+    ]
+    assert decoded["edit_distance"].tolist() == [0, 0]
+
+
+def test_batch_decoding_concatenates_strings():
+    rng = random.Random(2)
+    strings = [synthetic.obs_string(rng, n) for n in [3, 0, 5]]
+    strings[1] = ""
+    batch = decode_obs_batch(strings)
+    assert batch["index"].tolist() == [0] * 3 + [2] * 5
+    for name, column in batch.items():
+        if name == "index":
+            continue
+        single = [decode_obs(string)[name] for string in strings]
+        assert np.array_equal(column, np.concatenate(single))
+
+
+def test_obs_labels():
+    decoded = decode_obs("2RS0..+>^.*1aE3..-<*$.7Rn0..*!.$*")
+    assert obs_labels(decoded, "allele").tolist() == ["REF", "ALT", "REF"]
+    assert obs_labels(decoded, "mapq").tolist() == [
+        "High MAPQ",
+        "High MAPQ",
+        "Low MAPQ",
+    ]
+    assert obs_labels(decoded, "odds").tolist() == ["Strong", "Equal", "None"]
+    assert obs_labels(decoded, "strand").tolist() == [
+        "Forward strand",
+        "Reverse strand",
+        "Both strands",
+    ]
+    assert obs_labels(decoded, "read_position").tolist() == [
+        "Most common position",
+        "Other position",
+        "Irrelevant position",
+    ]
+    assert obs_labels(decoded, "edit_distance").tolist() == ["0", "3", "0"]
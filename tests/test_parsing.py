@@ -0,0 +1,48 @@
+import pytest
+
+import synthetic
+from varlociraptor_inspect import parsing
+
+HEADER = "\n".join(synthetic.header_lines(num_samples=0, num_events=2))
+
+
+@pytest.mark.parametrize(
+    "info, top_event, probability",
+    [
+        (
+            "PROB_SOMATIC_TUMOR_HIGH=10;PROB_SOMATIC_TUMOR_LOW=20",
+            "SOMATIC_TUMOR_HIGH",
+            0.1,
+        ),
+        (
+            "PROB_SOMATIC_TUMOR_HIGH=inf;PROB_SOMATIC_TUMOR_LOW=0",
+            "SOMATIC_TUMOR_LOW",
+            1,
+        ),
+        # Probabilities below the smallest float
+        (
+            "PROB_SOMATIC_TUMOR_HIGH=4000;PROB_SOMATIC_TUMOR_LOW=3500",
+            "SOMATIC_TUMOR_LOW",
+            0,
+        ),
+        (
+            "PROB_SOMATIC_TUMOR_HIGH=.;PROB_SOMATIC_TUMOR_LOW=3",
+            "SOMATIC_TUMOR_LOW",
+            0.5,
+        ),
+        ("PROB_SOMATIC_TUMOR_HIGH=inf", "SOMATIC_TUMOR_HIGH", 0),
+        (".", None, None),
+    ],
+)
+def test_summaries(info, top_event, probability):
+    line = f"chr1\t1000\t.\tA\tC,G\t.\t.\t{info}"
+    expected = {
+        "CHROM": "chr1",
+        "POS": 1000,
+        "REF": "A",
+        "ALT": "C,G",
+        "Top Event": top_event,
+        "Probability": pytest.approx(probability, rel=0.01),
+    }
+    assert parsing.summarize_fields(line.split("\t")) == expected
+    assert parsing.summarize_record(parsing.parse_record(HEADER, line)) == expected
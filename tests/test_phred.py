@@ -0,0 +1,104 @@
+import math
+
+import numpy as np
+import pytest
+
+import synthetic
+from varlociraptor_inspect import parsing
+from varlociraptor_inspect.phred import (
+    event_phreds,
+    log_sum_exp,
+    normalize_log_probs,
+    phred_to_log_probs,
+    phred_to_probs,
+    phred_value,
+)
+
+PHREDS = [0, 0.1, 3.0103, 10, 20, 100, 300, 4000, np.inf, np.nan]
+
+
+def test_phred_to_probs():
+    np.testing.assert_allclose(
+        phred_to_probs(PHREDS), [10 ** (-phred / 10) for phred in PHREDS], rtol=1e-12
+    )
+
+
+def test_phred_to_log_probs():
+    log_probs = phred_to_log_probs(PHREDS)
+    np.testing.assert_allclose(
+        log_probs[:-2], [-phred / 10 * math.log(10) for phred in PHREDS[:-2]]
+    )
+    # Finite where the probability underflows to 0
+    assert phred_to_probs([4000])[0] == 0
+    assert np.isfinite(log_probs[PHREDS.index(4000)])
+    assert log_probs[-2] == -np.inf and np.isnan(log_probs[-1])
+
+
+@pytest.mark.parametrize(
+    "log_probs, expected",
+    [
+        ([np.log(0.25), np.log(0.5)], np.log(0.75)),
+        ([np.log(0.25), np.nan], np.log(0.25)),
+        ([np.nan, np.nan], np.nan),
+        ([-np.inf, -np.inf], -np.inf),
+        # Like all NaN
+        ([], np.nan),
+        # 2e-400 and 1e-400, too small for floats
+        ([np.log(2) - 921.034, -921.034], np.log(3) - 921.034),
+    ],
+)
+def test_log_sum_exp(log_probs, expected):
+    np.testing.assert_allclose(log_sum_exp(np.array(log_probs)), expected)
+
+
+def test_log_sum_exp_axis():
+    log_probs = np.log([[0.1, 0.2], [0.3, 0.4]])
+    np.testing.assert_allclose(log_sum_exp(log_probs, axis=0), np.log([0.4, 0.6]))
+    np.testing.assert_allclose(log_sum_exp(log_probs, axis=1), np.log([0.3, 0.7]))
+
+
+def test_normalize_log_probs():
+    # PHRED scores rounded to one decimal and far below float precision
+    log_probs = phred_to_log_probs([[3, 3, np.nan], [4000, 4003.0103, 5000]])
+    normalized = normalize_log_probs(log_probs)
+    np.testing.assert_allclose(
+        np.exp(normalized), [[0.5, 0.5, np.nan], [2 / 3, 1 / 3, 0]], atol=1e-12
+    )
+    assert np.all(np.isnan(normalize_log_probs([[np.nan, np.nan]])))
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [(3.0, 3.0), ((7.0,), 7.0), ((), None), ("5", 5.0), ("x", None), (None, None)],
+)
+def test_phred_value(value, expected):
+    assert phred_value(value) == expected
+
+
+def test_event_phreds():
+    header = "\n".join(synthetic.header_lines(num_samples=0, num_events=3))
+    records = [
+        parsing.parse_record(header, f"chr1\t{1000 + i}\t.\tA\tC\t.\t.\t{info}")
+        for i, info in enumerate(
+            [
+                "PROB_SOMATIC_TUMOR_LOW=2;PROB_SOMATIC_TUMOR_HIGH=1",
+                ".",
+                "PROB_SOMATIC_NORMAL=inf;PROB_SOMATIC_TUMOR_HIGH=.",
+            ]
+        )
+    ]
+    events, phreds = event_phreds(records)
+    assert events == [
+        "PROB_SOMATIC_TUMOR_LOW",
+        "PROB_SOMATIC_TUMOR_HIGH",
+        "PROB_SOMATIC_NORMAL",
+    ]
+    np.testing.assert_array_equal(
+        phreds, [[2, 1, np.nan], [np.nan, np.nan, np.nan], [np.nan, np.nan, np.inf]]
+    )
+
+    events, phreds = event_phreds(records, ["PROB_SOMATIC_NORMAL", "PROB_ABSENT"])
+    assert events == ["PROB_SOMATIC_NORMAL", "PROB_ABSENT"]
+    np.testing.assert_array_equal(
+        phreds, [[np.nan, np.nan], [np.nan, np.nan], [np.inf, np.nan]]
+    )
@@ -0,0 +1,173 @@
+import random
+from typing import Any
+
+import pytest
+
+import synthetic
+from bench_obs import regex_observations
+from varlociraptor_inspect import parsing, plotting, specs
+
+HEADER = "\n".join(synthetic.header_lines(num_samples=2))
+
+
+def obs_record(obs):
+    line = "\t".join(
+        ["chr1", "1000", ".", "A", "T", ".", ".", "PROB_GERMLINE=1"] + ["OBS", obs, "."]
+    )
+    return parsing.parse_record(HEADER, line)
+
+
+def expected_panels(obs):
+    """Observation panels (with their rows) and the maximum count, aggregated
+    observation by observation"""
+    observations = regex_observations(obs)
+    alleles = {observation["Allele"] for observation in observations}
+    legend_allele = "ALT" if "ALT" in alleles else "REF" if alleles else None
+
+    panels = []
+    totals = []
+    for allele in ["REF", "ALT"]:
+        selected = [item for item in observations if item["Allele"] == allele]
+        rows = []
+        for metric in plotting.OBS_METRICS:
+            counts: dict[str, int] = {}
+            first: dict[str, int] = {}
+            for observation in selected:
+                category = str(observation[metric])
+                counts[category] = counts.get(category, 0) + int(observation["count"])
+                first.setdefault(category, int(observation["obs_index"]))
+            rows.extend(
+                (metric, category, count, first[category])
+                for category, count in counts.items()
+            )
+        edit_distances = {observation["Edit Distance"] for observation in selected}
+        edit_domain = None
+        if len(edit_distances) == 1:
+            edit_domain = [0, max(int(edit_distances.pop()), 1)]
+        panels.append(
+            {
+                "allele": allele,
+                "rows": rows or None,
+                "edit_domain": edit_domain,
+                "show_legend": allele == legend_allele,
+            }
+        )
+        totals.append(sum(int(observation["count"]) for observation in selected))
+    return panels, max(totals)
+
+
+def panel_rows(data):
+    """(Metric, Category, Count, obs_index) rows of panel data (None without)"""
+    if data is None:
+        return None
+    columns = data[["Metric", "Category", "Count", "obs_index"]]
+    return list(columns.itertuples(index=False, name=None))
+
+
+@pytest.mark.parametrize(
+    "obs",
+    [
+        "3AP2..-<*.*29rB3..-**$.3av3..*!.$*33RN0..*<*..",
+        "2rN.++>^.*",
+        "5AS0..+>^.*",
+        "",
+    ]
+    + [synthetic.obs_string(random.Random(seed), 40) for seed in range(5)],
+)
+def test_observations_data(obs):
+    panels, max_count = plotting.observations_data(obs_record(obs), "sample1")
+    expected, expected_max_count = expected_panels(obs)
+    assert max_count == expected_max_count
+    for panel, expected_panel in zip(panels, expected):
+        assert panel_rows(panel.pop("data")) == expected_panel.pop("rows")
+        assert panel == expected_panel
+
+
+def samples_record(samples):
+    """Record with the given AFD:OBS sample columns"""
+    header = "\n".join(synthetic.header_lines(num_samples=len(samples)))
+    line = "\t".join(
+        ["chr1", "1000", ".", "A", "T", ".", ".", "PROB_GERMLINE=1", "AFD:OBS"]
+        + samples
+    )
+    return parsing.parse_record(header, line), [
+        f"sample{i + 1}" for i in range(len(samples))
+    ]
+
+
+def test_samples_data():
+    rng = random.Random(0)
+    record, sample_names = samples_record(
+        [
+            f"{synthetic.afd_string(rng, 0.3, 5)}:{synthetic.obs_string(rng, 10)}",
+            # AFD only, observations only and neither
+            f"{synthetic.afd_string(rng, 0.6, 3)}:.",
+            f".:{synthetic.obs_string(rng, 3)}",
+            ".",
+        ]
+    )
+    rows, max_count, _ = plotting.samples_data(record, sample_names)
+
+    expected_max_count = 0
+    for sample_name in sample_names:
+        sample_rows = [row for row in rows if row["Sample"] == sample_name]
+        afd = plotting.allele_frequency_data(record, sample_name)
+        assert [row for row in sample_rows if row["Panel"] == "AFD"] == (
+            []
+            if afd is None
+            else [
+                {"Sample": sample_name, "Panel": "AFD", **row}
+                for row in plotting.json_records(afd)
+            ]
+        )
+
+        panels, panel_max_count = plotting.observations_data(record, sample_name)
+        expected_max_count = max(expected_max_count, panel_max_count)
+        for panel in panels:
+            obs_rows = [
+                {
+                    key: value
+                    for key, value in row.items()
+                    if key not in ["Sample", "Panel", "Allele"]
+                }
+                for row in sample_rows
+                if row["Panel"] == "OBS" and row["Allele"] == panel["allele"]
+            ]
+            data = panel["data"]
+            assert obs_rows == ([] if data is None else plotting.json_records(data))
+    assert max_count == expected_max_count
+    assert {row["Sample"] for row in rows} == {"sample1", "sample2", "sample3"}
+
+
+@pytest.mark.parametrize(
+    "samples, edit_domain",
+    [
+        # One edit distance over all samples
+        (["0=1:2AP2..-<*.*", "0=1:3rB2..-**$."], [0, 2]),
+        (["0=1:2AP0..-<*.*", "."], [0, 1]),
+        (["0=1:2AP2..-<*.*", "0=1:3rB1..-**$."], None),
+    ],
+)
+def test_samples_edit_domain(samples, edit_domain):
+    record, sample_names = samples_record(samples)
+    assert plotting.samples_data(record, sample_names)[2] == edit_domain
+
+
+def test_visualize_samples_without_data():
+    record, sample_names = samples_record([".", "."])
+    assert plotting.visualize_samples(record, sample_names) is None
+
+
+def test_samples_spec_shares_one_dataset():
+    rng = random.Random(1)
+    record, sample_names = samples_record(
+        [
+            f"{synthetic.afd_string(rng, 0.5, 5)}:{synthetic.obs_string(rng, 5)}"
+            for _ in range(6)
+        ]
+    )
+    spec: Any = specs.samples(record, sample_names)
+    assert len(spec["datasets"]) == 1
+    afd_facet, obs_facet = spec["vconcat"]
+    assert afd_facet["facet"]["sort"] == sample_names
+    assert obs_facet["facet"]["row"]["sort"] == sample_names
@@ -0,0 +1,84 @@
+import json
+import random
+
+import pysam
+import pytest
+
+import synthetic
+from varlociraptor_inspect import batch, report
+
+NUM_RECORDS = 30
+
+
+@pytest.fixture
+def path(tmp_path):
+    """Indexed VCF with NUM_RECORDS records 100 bases apart on two contigs"""
+    rng = random.Random(0)
+    lines = synthetic.header_lines(
+        num_samples=2, contigs=[("chr1", 10_000), ("chr2", 10_000)]
+    )
+    lines.extend(
+        synthetic.record_line(
+            rng,
+            num_observations=5,
+            afd_points=5,
+            chrom=f"chr{1 + i * 2 // NUM_RECORDS}",
+            pos=100 + 100 * i,
+        )
+        for i in range(NUM_RECORDS)
+    )
+    text = tmp_path / "calls.vcf"
+    text.write_text("\n".join(lines) + "\n")
+    path = str(tmp_path / "calls.vcf.gz")
+    pysam.tabix_compress(str(text), path)
+    pysam.tabix_index(path, preset="vcf")
+    return path
+
+
+def record_positions(path):
+    with pysam.VariantFile(path) as vcf:
+        return [(record.chrom, record.pos) for record in vcf]
+
+
+def merged_positions(output_dir):
+    """(chrom, pos) of the records of index.json, from their file names"""
+    with open(output_dir / "index.json") as f:
+        index = json.load(f)
+    positions = []
+    for entry in index["records"]:
+        chrom, pos = entry["file"].rsplit(".", 1)[0].split("_")[-2:]
+        positions.append((chrom, int(pos)))
+    return positions, index["summary"]
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        # 100 region shards of 200 bases, 16 of them with records
+        ["--shard-size", "200", "--shard-by", "region"],
+        ["--shard-by", "index"],
+    ],
+)
+def test_merge_slices_in_file_order(tmp_path, path, options):
+    output_dir = tmp_path / "out"
+    for i in range(1, 13):
+        batch.main(
+            [path, "-o", str(output_dir), "--format", "json", "-j", "1"]
+            + ["--shard", f"{i}/12", *options]
+        )
+    report.main([str(output_dir)])
+
+    positions, summary = merged_positions(output_dir)
+    assert positions == record_positions(path)
+    assert summary["records"] == NUM_RECORDS
+
+
+def test_missing_slice(tmp_path, path):
+    output_dir = tmp_path / "out"
+    for i in [1, 3]:
+        batch.main(
+            [path, "-o", str(output_dir), "--format", "json", "-j", "1"]
+            + ["--shard", f"{i}/3"]
+        )
+    with pytest.raises(ValueError, match="Missing shards: 2/3"):
+        report.check_manifests(report.load_manifests(str(output_dir)))
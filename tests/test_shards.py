@@ -0,0 +1,53 @@
+import random
+
+import pysam
+import pytest
+
+import synthetic
+from varlociraptor_inspect.shards import make_shards, shard_records
+from varlociraptor_inspect.summary import summarize_vcf
+
+# 200 bp deletions at 100 (overlapping the region start) and at 475 (spanning
+# shard boundaries)
+DELETIONS = {100: 200, 475: 200}
+REGION = "chr1:200-1000"
+
+
+@pytest.fixture
+def path(tmp_path):
+    """Indexed VCF with records every 25 bases and the DELETIONS"""
+    rng = random.Random(0)
+    lines = synthetic.header_lines(num_samples=2)
+    for pos in range(100, 1500, 25):
+        fields = synthetic.record_line(rng, num_observations=5, pos=pos).split("\t")
+        if pos in DELETIONS:
+            fields[3] = fields[4] + "A" * DELETIONS[pos]
+        lines.append("\t".join(fields))
+    text = tmp_path / "calls.vcf"
+    text.write_text("\n".join(lines) + "\n")
+    path = str(tmp_path / "calls.vcf.gz")
+    pysam.tabix_compress(str(text), path)
+    pysam.tabix_index(path, preset="vcf")
+    return path
+
+
+def test_shards_partition_region(path):
+    with pysam.VariantFile(path) as vcf:
+        expected = [record.pos for record in vcf.fetch(region=REGION)]
+        shards = make_shards(vcf, REGION, shard_size=100)
+        sharded = [
+            record.pos for shard in shards for record in shard_records(vcf, shard)
+        ]
+    assert 100 in expected and 475 in expected
+    assert sharded == expected
+
+
+@pytest.mark.parametrize("jobs, shard_size", [(1, 100), (2, None), (2, 300)])
+def test_sharded_summary_matches_serial(path, jobs, shard_size):
+    serial = summarize_vcf(path, REGION)
+    sharded = summarize_vcf(path, REGION, jobs=jobs, shard_size=shard_size)
+    assert sharded.records == serial.records == 34
+    serial, sharded = serial.to_dict(), sharded.to_dict()
+    # Sums of probabilities differ in the order of their additions
+    assert sharded.pop("event_sums") == pytest.approx(serial.pop("event_sums"))
+    assert sharded == serial
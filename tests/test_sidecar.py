@@ -0,0 +1,179 @@
+import os
+import random
+
+import numpy as np
+import pysam
+import pytest
+
+import synthetic
+from varlociraptor_inspect.filters import compile_filter, filter_records
+from varlociraptor_inspect.parsing import summarize_record
+from varlociraptor_inspect.sidecar import Sidecar, load_or_build
+
+CONTIGS = [(f"chr{i}", 100_000_000) for i in range(1, 5)]
+# Empty BGZF block ending a file
+EOF_BLOCK = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+
+def write_vcf(path, num_records, seed=0, afd_points=11, chrom="chr1", start=1000):
+    """bgzipped synthetic VCF (AFDs over a grid of afd_points frequencies)"""
+    rng = random.Random(seed)
+    lines = synthetic.header_lines(num_samples=2, contigs=CONTIGS)
+    lines.extend(
+        synthetic.record_line(
+            rng,
+            num_observations=5,
+            afd_points=afd_points,
+            chrom=chrom,
+            pos=start + 10 * i,
+        )
+        for i in range(num_records)
+    )
+    text = path.with_suffix("")
+    text.write_text("\n".join(lines) + "\n")
+    pysam.tabix_compress(str(text), str(path), force=True)
+    return str(path)
+
+
+def concat(paths, path):
+    """Concatenate the BGZF blocks of files with the same header (like
+    bcftools concat --naive), keeping the header of the first one"""
+    parts = []
+    for i, part in enumerate(paths):
+        with pysam.VariantFile(part) as vcf:
+            data_start = vcf.tell() >> 16
+        with open(part, "rb") as f:
+            data = f.read()
+        assert data.endswith(EOF_BLOCK)
+        parts.append(data[0 if i == 0 else data_start : -len(EOF_BLOCK)])
+    with open(path, "wb") as f:
+        f.write(b"".join(parts) + EOF_BLOCK)
+    return str(path)
+
+
+def assert_same(sidecar, expected):
+    assert sidecar.segments == expected.segments
+    assert [sidecar.contigs[i] for i in sidecar.columns["chrom"]] == [
+        expected.contigs[i] for i in expected.columns["chrom"]
+    ]
+    for name in ["offset", "pos", "log_probs", "fields", "alleles", "allele_offsets"]:
+        np.testing.assert_array_equal(sidecar.columns[name], expected.columns[name])
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "ML_AF <= 0.3",
+        "ML_AF[sample1] == 0.3",
+        "ML_AF > 0.1",
+        "ML_AF[sample2] >= 0.7 and ML_AF[sample1] < 0.5",
+        "ALT_FWD[sample1] > REF_REV[sample1]",
+    ],
+)
+def test_select_matches_filter_records(tmp_path, expression):
+    path = write_vcf(tmp_path / "calls.vcf.gz", 300)
+    sidecar = Sidecar.build(path)
+    record_filter = compile_filter(expression)
+    with pysam.VariantFile(path) as vcf:
+        expected = [
+            row
+            for row, _ in filter_records(
+                record_filter, enumerate(vcf), sidecar.samples, key=lambda item: item[1]
+            )
+        ]
+    assert expected
+    np.testing.assert_array_equal(sidecar.select(record_filter), expected)
+
+
+def test_select_prob_values(tmp_path):
+    """The PHRED scores of the file select exactly their records"""
+    path = write_vcf(tmp_path / "calls.vcf.gz", 100)
+    sidecar = Sidecar.build(path)
+    for event in sidecar.events:
+        with pysam.VariantFile(path) as vcf:
+            phreds = np.array([record.info[event][0] for record in vcf])
+        for phred in phreds[np.isfinite(phreds)].tolist():
+            selected = sidecar.select(compile_filter(f"{event} == {phred!r}"))
+            np.testing.assert_array_equal(selected, np.flatnonzero(phreds == phred))
+
+
+def test_summaries_match_records(tmp_path):
+    path = write_vcf(tmp_path / "calls.vcf.gz", 100)
+    sidecar = Sidecar.build(path)
+    with pysam.VariantFile(path) as vcf:
+        expected = [summarize_record(record) for record in vcf]
+    assert sidecar.summaries(range(100)) == expected
+
+
+@pytest.fixture
+def contigs(tmp_path):
+    """Write a BCF of 200 records on a contig, return its path"""
+
+    def write(chrom, seed=0, start=1000):
+        path = str(tmp_path / f"{chrom}.bcf")
+        vcf = write_vcf(
+            tmp_path / f"{chrom}.vcf.gz", 200, seed, chrom=chrom, start=start
+        )
+        # pysam starts the records of a BCF in a new block
+        with pysam.VariantFile(vcf) as records:
+            with pysam.VariantFile(path, "wb", header=records.header) as out:
+                for record in records:
+                    out.write(record)
+        return path
+
+    return write
+
+
+def update(path):
+    """load_or_build a sidecar, return it and the number of records indexed"""
+    indexed = [0]
+    sidecar, _ = load_or_build(path, batch_size=50, progress=indexed.append)
+    assert_same(sidecar, Sidecar.build(path))
+    return sidecar, indexed[-1]
+
+
+def test_incremental_update(tmp_path, contigs):
+    path = str(tmp_path / "calls.bcf")
+    parts = [contigs(chrom) for chrom in ["chr1", "chr2", "chr3"]]
+    concat(parts, path)
+    assert update(path)[1] == 600
+
+    # Unchanged
+    sidecar, built = load_or_build(path)
+    assert not built and len(sidecar) == 600
+
+    os.utime(path, ns=(0, 0))
+    assert update(path)[1] == 0
+
+    # Appended contig
+    parts.append(contigs("chr4"))
+    concat(parts, path)
+    sidecar, indexed = update(path)
+    assert indexed == 200 and len(sidecar) == 800
+
+    # Regenerated contig, moving the following ones
+    parts[1] = contigs("chr2", seed=1, start=5000)
+    concat(parts, path)
+    sidecar, indexed = update(path)
+    assert indexed == 200 and sidecar.columns["pos"][200] == 5000
+
+    # Removed contig
+    del parts[1]
+    concat(parts, path)
+    sidecar, indexed = update(path)
+    assert indexed == 0 and [segment["contig"] for segment in sidecar.segments] == [
+        "chr1",
+        "chr3",
+        "chr4",
+    ]
+    with pysam.VariantFile(path) as vcf:
+        record = sidecar.read_record(vcf, 250)
+        assert (record.chrom, record.pos) == ("chr3", 1500)
+
+
+def test_plain_vcf_is_indexed_again(tmp_path, contigs):
+    path = str(tmp_path / "chr1.vcf")
+    contigs("chr1")
+    assert update(path)[1] == 200
+    os.utime(path, ns=(0, 0))
+    assert update(path)[1] == 200
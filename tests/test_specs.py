@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+import synthetic
+from varlociraptor_inspect import parsing, specs
+
+SAMPLES = ["sample1", "sample2"]
+HEADER = "\n".join(synthetic.header_lines(num_samples=2))
+
+
+def record(seed, num_observations, afd_points):
+    rng = random.Random(seed)
+    line = synthetic.record_line(
+        rng, num_observations=num_observations, afd_points=afd_points
+    )
+    return parsing.parse_record(HEADER, line)
+
+
+RECORDS = [
+    record(0, 1, 2),
+    record(1, 20, 11),
+    record(2, 200, 50),
+    # No observations and a missing sample
+    parsing.parse_record(
+        HEADER,
+        "\t".join(
+            ["chr1", "1000", ".", "A", "T", ".", ".", "PROB_GERMLINE=0.5"]
+            + ["AF:AFD:OBS:DP", "0:0=0,1=7.5:.:0", "."]
+        ),
+    ),
+]
+
+CHARTS = {
+    "events": lambda record, validate: specs.event_probabilities(record, validate),
+    "afd": lambda record, validate: specs.allele_frequency_distribution(
+        record, "sample1", validate
+    ),
+    "obs": lambda record, validate: specs.observations(record, "sample1", validate),
+    "samples": lambda record, validate: specs.samples(record, SAMPLES, validate),
+}
+
+
+@pytest.mark.parametrize("chart", CHARTS)
+@pytest.mark.parametrize("index", range(len(RECORDS)))
+def test_specs_match_altair(chart, index):
+    spec = CHARTS[chart](RECORDS[index], False)
+    assert spec == CHARTS[chart](RECORDS[index], True)
@@ -0,0 +1,141 @@
+import json
+import random
+
+import numpy as np
+import pytest
+
+import synthetic
+from varlociraptor_inspect import parsing, report
+from varlociraptor_inspect.summary import (
+    AF_BINS,
+    COUNT_BUCKETS,
+    PROB_BINS,
+    Summary,
+    count_bucket_labels,
+    count_buckets,
+    summarize_records,
+    unit_bins,
+)
+
+HEADER = "\n".join(synthetic.header_lines(num_samples=2, num_events=2))
+
+# INFO, sample1, sample2 (AFD:OBS)
+LINES = [
+    (
+        "PROB_SOMATIC_TUMOR_HIGH=0;PROB_SOMATIC_TUMOR_LOW=inf",
+        "0=10,0.5=0,1=20:3rS0..+>^.*2aS0..-<*$.",
+        "0=0:.",
+    ),
+    ("PROB_SOMATIC_TUMOR_HIGH=3.0103", "1=0:4aS0..*>^.*", "."),
+]
+RECORDS = [
+    parsing.parse_record(
+        HEADER,
+        "\t".join(["chr1", str(1000 + i), ".", "A", "C", ".", ".", info, "AFD:OBS"])
+        + "\t"
+        + "\t".join(samples),
+    )
+    for i, (info, *samples) in enumerate(LINES)
+]
+
+
+def synthetic_records(num_records, seed=0):
+    rng = random.Random(seed)
+    header = "\n".join(synthetic.header_lines(num_samples=2))
+    return [
+        parsing.parse_record(
+            header,
+            synthetic.record_line(rng, num_observations=20, afd_points=11, pos=pos),
+        )
+        for pos in range(num_records)
+    ]
+
+
+def histogram(num_bins, **counts):
+    """Histogram with the given counts at bin_<i> bins"""
+    expected = np.zeros(num_bins, dtype=np.int64)
+    for name, count in counts.items():
+        expected[int(name[len("bin_") :])] = count
+    return expected.tolist()
+
+
+def test_unit_bins():
+    values = np.array([0, 0.0199, 0.02, 0.5, 1, np.nan])
+    np.testing.assert_array_equal(
+        unit_bins(values, 50), histogram(50, bin_0=2, bin_1=1, bin_25=1, bin_49=1)
+    )
+
+
+def test_count_buckets():
+    counts = count_buckets([0, 1, 2, 3, 4, 7, 8, 2**40])
+    np.testing.assert_array_equal(
+        counts,
+        histogram(COUNT_BUCKETS, bin_0=1, bin_1=1, bin_2=2, bin_3=2, bin_4=1, bin_31=1),
+    )
+    labels = count_bucket_labels()
+    assert len(labels) == COUNT_BUCKETS
+    assert labels[:5] == ["0", "1", "2-3", "4-7", "8-15"]
+    assert labels[-1] == f">={2**30}"
+
+
+def test_add_records():
+    data = Summary().add_records(RECORDS).to_dict()
+    assert data["records"] == 2
+    assert data["events"] == {
+        "SOMATIC_TUMOR_HIGH": histogram(PROB_BINS, bin_49=1, bin_24=1),
+        "SOMATIC_TUMOR_LOW": histogram(PROB_BINS, bin_0=1),
+    }
+    assert data["event_sums"] == pytest.approx(
+        {"SOMATIC_TUMOR_HIGH": 1.5, "SOMATIC_TUMOR_LOW": 0}, abs=1e-4
+    )
+    # ML allele frequencies of samples with an AFD
+    assert data["ml_af"] == {
+        "sample1": histogram(AF_BINS, bin_25=1, bin_49=1),
+        "sample2": histogram(AF_BINS, bin_0=1),
+    }
+    # REF and ALT observation counts per record (sample2: none, missing)
+    assert data["obs_counts"] == [
+        ["sample1", "REF", histogram(COUNT_BUCKETS, bin_0=1, bin_2=1)],
+        ["sample1", "ALT", histogram(COUNT_BUCKETS, bin_2=1, bin_3=1)],
+        ["sample2", "REF", histogram(COUNT_BUCKETS, bin_0=2)],
+        ["sample2", "ALT", histogram(COUNT_BUCKETS, bin_0=2)],
+    ]
+
+
+def assert_same(summary, expected):
+    summary, expected = summary.to_dict(), expected.to_dict()
+    # Sums of probabilities differ in the order of their additions
+    assert summary.pop("event_sums") == pytest.approx(expected.pop("event_sums"))
+    assert summary == expected
+
+
+def test_batches_and_merges():
+    records = synthetic_records(100)
+    expected = summarize_records(records)
+    for batch_size in [1, 7, 1000]:
+        assert_same(summarize_records(records, batch_size=batch_size), expected)
+
+    merged = Summary()
+    for part in [records[:10], records[10:60], records[60:]]:
+        merged.merge(summarize_records(part))
+    assert_same(merged, expected)
+
+    # JSON round trip, like manifests
+    data = json.loads(json.dumps(expected.to_dict()))
+    assert Summary.from_dict(data).to_dict() == expected.to_dict()
+
+
+def test_merge_manifests():
+    """Manifests of --shard i/3 slices by record index"""
+    records = synthetic_records(30)
+    manifests = [
+        {
+            "shard": [i + 1, 3],
+            "records": [{"file": f"{j}.json", "index": j} for j in range(i, 30, 3)],
+            "summary": summarize_records(records[i::3]).to_dict(),
+        }
+        for i in range(3)
+    ]
+    entries, summary = report.merge_manifests(manifests)
+    assert [entry["file"] for entry in entries] == [f"{j}.json" for j in range(30)]
+    assert_same(summary, summarize_records(records))